@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Simple script to process pending queue in batches.
-Usage: python3 process_pending_batch.py --batch-size 10 --max-batches 1
+Usage: python3 process_pending_batch.py --batch-size 10 --max-batches 1 [--concurrency 4] [--scrape-engine batch] [--cache-mode refresh] [--pipeline] [--index-backend sqlite] [--journal]
 """
 
 import sys
@@ -17,6 +17,14 @@ def main():
     parser.add_argument('--batch-size', type=int, default=50, help='Batch size')
     parser.add_argument('--max-batches', type=int, default=1, help='Max batches to process')
     parser.add_argument('--dry-run', action='store_true', help='Dry run mode')
+    parser.add_argument('--concurrency', type=int, default=1, help='Concurrent Firecrawl scrapes')
+    parser.add_argument('--scrape-engine', choices=['scrape', 'batch'], default='scrape', help='Per-URL scrapes or one Firecrawl batch-scrape job per batch')
+    parser.add_argument('--cache-mode', choices=['use', 'refresh', 'off'], default='use', help='Firecrawl response cache mode')
+    parser.add_argument('--pipeline', action='store_true', help='Write shards and index checkpoints in the background while scraping')
+    parser.add_argument('--index-backend', choices=['json', 'sqlite'], help='URL index storage backend (default: site config, else json)')
+    parser.add_argument('--journal', action='store_true', default=None, help='Journal index changes instead of rewriting the index file')
+    parser.add_argument('--export-index-json', action='store_true', help='Write the JSON URL index after processing')
+    parser.add_argument('--export-manifest', action='store_true', help='Write the shard manifest after processing')
     args = parser.parse_args()
     
     # Get Firecrawl API key
@@ -32,7 +40,13 @@ def main():
         batch_size=args.batch_size,
         max_batches=args.max_batches,
         dry_run=args.dry_run,
-        disable_discovery=True  # Don't discover new URLs
+        disable_discovery=True,  # Don't discover new URLs
+        concurrency=args.concurrency,
+        scrape_engine=args.scrape_engine,
+        cache_mode=args.cache_mode,
+        pipeline=args.pipeline,
+        index_backend=args.index_backend,
+        journal=args.journal
     )
     
     print(f"Pending queue has {len(updater.pending_queue)} items")
@@ -41,6 +55,11 @@ def main():
     # Process queue
     result = updater.process_queue_batch(args.batch_size)
     
+    if args.export_index_json:
+        updater.url_index.export_json(updater.index_file, updater.storage_compression)
+    if args.export_manifest:
+        updater.export_manifest()
+    
     # Print results
     print("\nResults:")
     print(json.dumps(result, indent=2))
@@ -8,28 +8,40 @@ on the site, then adds any missing ones to the pending queue.
 
 import os
 import sys
-import json
 import requests
-from datetime import datetime
 
-def load_existing_urls(site_output_dir):
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+DOMAIN = "mydiy.ie"
+SITE_NAME = "mydiy-ie"
+
+def open_updater(api_key, output_dir="out"):
+    """
+    Open the site's index and pending queue the way the updater does: with the
+    site's storage compression and queue config, preferring the sqlite stores
+    when a run has already created them.
+    """
+    site_output_dir = os.path.join(output_dir, SITE_NAME)
+    index_db = os.path.join(site_output_dir, f"llms-{SITE_NAME}-index.db")
+    work_queue_db = os.path.join(site_output_dir, "work-queue.db")
+    return AgnosticLLMsUpdater(
+        firecrawl_api_key=api_key,
+        domain=DOMAIN,
+        output_dir=output_dir,
+        disable_discovery=True,
+        index_backend="sqlite" if os.path.exists(index_db) else None,
+        queue_backend="sqlite" if os.path.exists(work_queue_db) else None
+    )
+
+def load_existing_urls(updater):
     """Load all URLs we already know about (scraped + queued)."""
-    existing = set()
-    
-    # Load from manifest (already scraped)
-    manifest_file = os.path.join(site_output_dir, "llms-mydiy-ie-manifest.json")
-    if os.path.exists(manifest_file):
-        with open(manifest_file, 'r') as f:
-            manifest = json.load(f)
-            existing.update(manifest.keys())
+    # Already scraped: the URL index, with any journal entries not yet compacted into it
+    # (the manifest file is only written with --export-manifest)
+    existing = set(updater.existing_urls)
     
     # Load from queue (waiting to be scraped)
-    queue_file = os.path.join(site_output_dir, "pending-queue.json")
-    if os.path.exists(queue_file):
-        with open(queue_file, 'r') as f:
-            data = json.load(f)
-            for item in data.get('pending', []):
-                existing.add(item.get('normalized_url', ''))
+    existing.update(entry["normalized_url"] for entry in updater.pending_queue.as_list() if entry.get("normalized_url"))
     
     return existing
 
@@ -69,37 +81,20 @@ def get_all_product_urls(api_key):
     print(f"✓ Found {len(product_urls)} total products on site")
     return product_urls
 
-def add_missing_to_queue(missing_urls, queue_file):
+def add_missing_to_queue(missing_urls, queue):
     """Add missing URLs to the pending queue."""
-    # Load existing queue
-    if os.path.exists(queue_file):
-        with open(queue_file, 'r') as f:
-            data = json.load(f)
-            queue = data.get('pending', [])
-    else:
-        queue = []
-    
     # Add missing URLs
     print(f"\n📝 Adding {len(missing_urls)} missing products to queue...")
     for url in missing_urls:
-        entry = {
-            "url": url,
-            "normalized_url": url,
-            "metadata": {
-                "attempts": 0,
-                "category_shard_key": "uncategorized",  # Will be categorized during scrape
-                "source_category": "site_map_discovery"
-            },
-            "discovered_at": datetime.now().isoformat()
-        }
-        queue.append(entry)
-    
-    # Save updated queue
-    os.makedirs(os.path.dirname(queue_file), exist_ok=True)
-    tmp_path = f"{queue_file}.tmp"
-    with open(tmp_path, 'w', encoding='utf-8') as f:
-        json.dump({"pending": queue}, f, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, queue_file)
+        queue.enqueue(url, url, {
+            "attempts": 0,
+            "priority": "backfill",  # Shares batches with, rather than delays, new discoveries
+            "category_shard_key": "uncategorized",  # Will be categorized during scrape
+            "source_category": "site_map_discovery"
+        })
+    
+    # Save updated queue (a no-op for the sqlite queue, which writes as it goes)
+    queue.save()
     
     print(f"✓ Queue updated: {len(queue)} total products ready to scrape")
 
@@ -114,12 +109,11 @@ def main():
         print("❌ Error: FIRECRAWL_API_KEY not found in environment")
         sys.exit(1)
     
-    site_output_dir = "out/mydiy-ie"
-    queue_file = os.path.join(site_output_dir, "pending-queue.json")
+    updater = open_updater(api_key)
     
     # Step 1: Load existing URLs
     print("📂 Loading existing products...")
-    existing_urls = load_existing_urls(site_output_dir)
+    existing_urls = load_existing_urls(updater)
     print(f"✓ Found {len(existing_urls)} products already known")
     
     # Step 2: Get all product URLs from site
@@ -150,7 +144,7 @@ def main():
     
     # Step 5: Add missing URLs to queue
     if missing_urls:
-        add_missing_to_queue(missing_urls, queue_file)
+        add_missing_to_queue(missing_urls, updater.pending_queue)
         print("\n✅ SUCCESS! All missing products added to queue")
     else:
         print("\n✅ No missing products - queue is already complete!")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Convert a Site's JSON State Files Between Compression Formats
+
+Rewrites the URL index, manifest and queue files (pending, retry, discovery
+frontier) in out/<domain> as plain JSON, gzip (.gz) or zstd (.zst). The
+contents are copied byte-for-byte, only the container changes, and the old
+variant is removed. The updater reads any variant, so this only needs to run
+to shrink existing files right away (or to make them readable without
+decompressing); set "storage": {"compression": ...} in the site config so
+later runs keep the format.
+
+Usage:
+    python3 scripts/convert_storage_compression.py --domain jgengineering-ie --to gzip [--dry-run]
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import json_storage
+from json_storage import COMPRESSIONS
+
+STATE_FILES = ["pending-queue.json", "retry-queue.json", "dead-letter-queue.json", "discovery-frontier.json"]
+
+
+def state_files(base_path: Path, domain: str):
+    """Base names of the site's JSON state files (without compression suffix)."""
+    names = [f"llms-{domain}-index.json", f"llms-{domain}-manifest.json"] + STATE_FILES
+    return [base_path / name for name in names]
+
+
+def convert_site(domain: str, compression: str, dry_run: bool = False, output_dir: str = "out") -> bool:
+    """Convert every existing state file of a site to the given compression."""
+
+    base_path = Path(output_dir) / domain
+    if not base_path.is_dir():
+        print(f"❌ Site directory not found: {base_path}")
+        return False
+
+    try:
+        json_storage.check_compression(compression)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+
+    print(f"🔍 Converting {domain} state files to {compression}")
+    print("=" * 80)
+
+    total_before = total_after = converted = 0
+    for path in state_files(base_path, domain):
+        stored = json_storage.find_stored(str(path))
+        if stored is None:
+            continue
+        target = json_storage.stored_path(str(path), compression)
+        size_before = os.path.getsize(stored)
+        total_before += size_before
+        if stored == target:
+            print(f"   ✓ {os.path.basename(stored)} already {compression} ({size_before:,} bytes)")
+            total_after += size_before
+            continue
+        if dry_run:
+            print(f"   → {os.path.basename(stored)} would become {os.path.basename(target)}")
+            continue
+
+        text = json_storage.read_text(str(path))
+        with json_storage.atomic_writer(str(path), compression) as f:
+            f.write(text)
+        size_after = os.path.getsize(target)
+        total_after += size_after
+        converted += 1
+        print(f"   ✓ {os.path.basename(stored)} → {os.path.basename(target)} "
+              f"({size_before:,} → {size_after:,} bytes)")
+
+    if dry_run:
+        print("\n⚠️  DRY RUN MODE - No changes will be made")
+        return True
+
+    print(f"\n✅ Converted {converted} files ({total_before:,} → {total_after:,} bytes)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a site\'s JSON state files between compression formats')
+    parser.add_argument('--domain', type=str, required=True,
+                       help='Site directory under out/ (e.g. jgengineering-ie)')
+    parser.add_argument('--to', dest='compression', choices=list(COMPRESSIONS), required=True,
+                       help='Target format: none, gzip or zstd')
+    parser.add_argument('--output-dir', type=str, default='out',
+                       help='Output directory holding the site directories (default: out)')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Show what would be converted without making changes')
+
+    args = parser.parse_args()
+
+    if not convert_site(args.domain, args.compression, dry_run=args.dry_run, output_dir=args.output_dir):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
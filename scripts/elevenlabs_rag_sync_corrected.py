@@ -27,6 +27,10 @@ from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
 
+# Add the scripts directory to the path to import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from http_client import PooledHTTPClient
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -45,6 +49,9 @@ class ElevenLabsRAGSync:
         
         if not self.api_key:
             raise ValueError("ELEVENLABS_API_KEY environment variable is required")
+        
+        # Pooled keep-alive session; RAG status polling makes many small requests
+        self.http = PooledHTTPClient(self.base_url, headers={"xi-api-key": self.api_key})
     
     def _load_config(self) -> Dict:
         """Load the ElevenLabs agents configuration."""
@@ -98,10 +105,7 @@ class ElevenLabsRAGSync:
     def _get_agent_knowledge_base(self, agent_id: str) -> Tuple[List[Dict], Dict]:
         """Get current knowledge base from ElevenLabs agent and return both docs and full config."""
         try:
-            get_url = f"{self.base_url}/agents/{agent_id}"
-            headers = {"xi-api-key": self.api_key}
-            
-            response = requests.get(get_url, headers=headers, timeout=10)
+            response = self.http.get(f"agents/{agent_id}", endpoint_type="status")
             
             if response.status_code != 200:
                 logger.warning(f"Failed to get agent config: {response.status_code}")
@@ -142,17 +146,13 @@ class ElevenLabsRAGSync:
     def _trigger_rag_indexing(self, document_id: str) -> bool:
         """Manually trigger RAG indexing for a document."""
         try:
-            index_url = f"{self.base_url}/knowledge-base/documents/{document_id}/compute-rag-index"
-            headers = {
-                "xi-api-key": self.api_key,
-                "Content-Type": "application/json"
-            }
+            index_path = f"knowledge-base/documents/{document_id}/compute-rag-index"
             
             payload = {
                 "model": "e5_mistral_7b_instruct"  # Default embedding model
             }
             
-            response = requests.post(index_url, headers=headers, json=payload, timeout=30)
+            response = self.http.post(index_path, json=payload)
             
             if response.status_code in [200, 201, 202]:
                 logger.info(f"Successfully triggered RAG indexing for document {document_id}")
@@ -174,12 +174,11 @@ class ElevenLabsRAGSync:
         self._trigger_rag_indexing(document_id)
         
         # Then poll for completion
-        status_url = f"{self.base_url}/knowledge-base/documents/{document_id}/compute-rag-index"
-        headers = {"xi-api-key": self.api_key}
+        status_path = f"knowledge-base/documents/{document_id}/compute-rag-index"
         
         while time.time() - start_time < max_wait_time:
             try:
-                response = requests.get(status_url, headers=headers, timeout=10)
+                response = self.http.get(status_path, endpoint_type="status")
                 if response.status_code == 200:
                     status_data = response.json()
                     status = status_data.get('status', 'unknown')
@@ -272,10 +271,9 @@ class ElevenLabsRAGSync:
                 
                 try:
                     # Check individual document status
-                    status_url = f"{self.base_url}/knowledge-base/documents/{doc_id}/compute-rag-index"
-                    headers = {"xi-api-key": self.api_key}
+                    status_path = f"knowledge-base/documents/{doc_id}/compute-rag-index"
                     
-                    response = requests.get(status_url, headers=headers, timeout=10)
+                    response = self.http.get(status_path, endpoint_type="status")
                     if response.status_code == 200:
                         status_data = response.json()
                         status = status_data.get('status', 'unknown')
@@ -339,7 +337,6 @@ class ElevenLabsRAGSync:
             return None
         
         # Upload to ElevenLabs knowledge base
-        upload_url = f"{self.base_url}/knowledge-base/file"
         
         try:
             # Prepare file data for multipart upload
@@ -347,15 +344,13 @@ class ElevenLabsRAGSync:
                 'file': (filename, content, 'text/plain')
             }
             
-            headers = {"xi-api-key": self.api_key}
-            
             # Use longer timeout for large files
             file_size_mb = file_path.stat().st_size / (1024 * 1024)
             timeout = 60 if file_size_mb > 1 else 30  # 60 seconds for files > 1MB
             
-            response = requests.post(
-                upload_url,
-                headers=headers,
+            response = self.http.post(
+                "knowledge-base/file",
+                endpoint_type="upload",
                 files=files,
                 timeout=timeout
             )
@@ -394,17 +389,9 @@ class ElevenLabsRAGSync:
                 }
             }
             
-            update_url = f"{self.base_url}/agents/{agent_id}"
-            update_headers = {
-                "xi-api-key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            
-            update_response = requests.patch(
-                update_url,
-                headers=update_headers,
-                json=update_payload,
-                timeout=60
+            update_response = self.http.patch(
+                f"agents/{agent_id}",
+                json=update_payload
             )
             
             if update_response.status_code == 200:
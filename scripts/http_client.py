@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP Client for Firecrawl and ElevenLabs API Calls
+
+Wraps a requests.Session so every call to the same API reuses keep-alive
+connections instead of paying a fresh TCP + TLS handshake per request. The
+client is also the single place where auth headers are attached and where
+default timeouts are chosen per endpoint type.
+
+Usage:
+  client = PooledHTTPClient("https://api.firecrawl.dev/v2", headers, pool_size=8)
+  response = client.post("scrape", endpoint_type="scrape", json=payload)
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Default timeouts (seconds) per endpoint type
+DEFAULT_TIMEOUTS: Dict[str, float] = {
+    "map": 90,       # Site structure discovery can be slow
+    "scrape": 60,    # Page rendering + extraction
+    "upload": 60,    # Knowledge base file uploads
+    "update": 60,    # Agent configuration updates
+    "status": 10,    # Small status polls
+    "delete": 30,
+    "default": 30,
+}
+
+
+class PooledHTTPClient:
+    """requests.Session with sized keep-alive pools, shared headers and per-endpoint timeouts."""
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        pool_size: int = 10,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = max(int(pool_size), 1)
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def url(self, path: str) -> str:
+        """Resolve a path against the base URL (absolute URLs pass through)."""
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def timeout_for(self, endpoint_type: str) -> float:
+        return self.timeouts.get(endpoint_type, self.timeouts["default"])
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        endpoint_type: str = "default",
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """Send a request over the pooled session using the endpoint type's timeout."""
+        if timeout is None:
+            timeout = self.timeout_for(endpoint_type)
+        return self.session.request(method, self.url(path), timeout=timeout, **kwargs)
+
+    def get(self, path: str, endpoint_type: str = "default", **kwargs: Any) -> requests.Response:
+        return self.request("GET", path, endpoint_type, **kwargs)
+
+    def post(self, path: str, endpoint_type: str = "default", **kwargs: Any) -> requests.Response:
+        return self.request("POST", path, endpoint_type, **kwargs)
+
+    def patch(self, path: str, endpoint_type: str = "update", **kwargs: Any) -> requests.Response:
+        return self.request("PATCH", path, endpoint_type, **kwargs)
+
+    def delete(self, path: str, endpoint_type: str = "delete", **kwargs: Any) -> requests.Response:
+        return self.request("DELETE", path, endpoint_type, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "PooledHTTPClient":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Append-Only Journal for URL Index Changes
+
+Saving the URL index rewrites the whole file, so a one-URL webhook update
+pays for the whole catalog. With --journal, each product upsert or removal
+is instead appended as one JSON line to llms-<site>-journal.jsonl and
+fsynced:
+
+  {"op": "put", "url": "...", "record": {...}}
+  {"op": "del", "url": "..."}
+
+On load, the journal is replayed on top of the index snapshot (the manifest
+is derived from the index, so it follows). Every entry sets the final state
+of one URL, so replaying over a snapshot that already contains some of the
+entries gives the same result. Once compact_every entries have built up,
+the updater writes the snapshot and truncates the journal.
+
+A crash can only cut off the line being written. replay() skips that
+partial last line, so at most one record is lost. read_entries() and
+append_entries() are shared with the pending/retry queue journals.
+
+Journal settings are configured per site in config/site_configs.json:
+
+  "journal": {
+    "enabled": false,
+    "compact_every": 500
+  }
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, MutableMapping
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_CONFIG: Dict[str, Any] = {
+    "enabled": False,
+    "compact_every": 500,
+}
+
+
+def read_entries(path: str) -> List[Dict[str, Any]]:
+    """
+    Parse a JSONL journal. A torn last line (crash mid-append) is dropped and
+    cut off the file so the next append starts on a clean line; a bad line
+    anywhere else raises ValueError.
+    """
+    if not os.path.exists(path):
+        return []
+
+    entries = []
+    valid_bytes = 0
+    with open(path, 'rb') as f:
+        lines = f.readlines()
+    for line_number, line in enumerate(lines, 1):
+        try:
+            if not line.endswith(b"\n"):
+                raise ValueError("unterminated entry")
+            entries.append(json.loads(line))
+        except ValueError:
+            if line_number == len(lines):
+                logger.warning(f"Dropping incomplete last journal entry in {os.path.basename(path)}")
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+                break
+            raise ValueError(f"Corrupt journal entry at {path}:{line_number}")
+        valid_bytes += len(line)
+    return entries
+
+
+def append_entries(path: str, entries: List[Dict[str, Any]]) -> None:
+    """Append entries to a JSONL journal with a single write and fsync."""
+    data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class IndexJournal:
+    """JSONL log of index mutations, fsynced per entry and replayed on load."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Entries written since the last compaction (replayed ones included)
+        self.entries = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.entries += 1
+
+    def record_put(self, url: str, record: Dict[str, Any]) -> None:
+        """Log an index upsert."""
+        self._append({"op": "put", "url": url, "record": record})
+
+    def record_delete(self, url: str) -> None:
+        """Log the removal of url from the index."""
+        self._append({"op": "del", "url": url})
+
+    def replay(self, url_index: MutableMapping[str, Dict[str, Any]]) -> int:
+        """Apply the journal to url_index in place; returns entries applied."""
+        applied = 0
+        for entry in read_entries(self.path):
+            if entry["op"] == "put":
+                url_index[entry["url"]] = entry["record"]
+            elif entry["op"] == "del":
+                url_index.pop(entry["url"], None)
+            applied += 1
+
+        self.entries = applied
+        if applied:
+            logger.info(f"Replayed {applied} journal entries from {os.path.basename(self.path)}")
+        return applied
+
+    def truncate(self) -> None:
+        """Drop all entries; call only after the index snapshot has been saved."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.entries = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
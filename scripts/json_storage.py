@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Optionally Compressed JSON State Files
+
+The URL index, the exported manifest and the queue files (pending, retry,
+discovery frontier) are large, repetitive JSON. They can be stored
+compressed, configured per site in config/site_configs.json:
+
+  "storage": {
+    "index_backend": "json",
+    "compression": "gzip"      # "none" (default), "gzip" or "zstd"
+  }
+
+or with --compression. A compressed file keeps its name plus a suffix
+(llms-<site>-index.json.gz, pending-queue.json.zst). Loading finds whichever
+variant exists, so a site can switch formats at any time. Saving writes the
+configured variant and removes the others, so a stale copy is never read
+back. scripts/convert_storage_compression.py converts a site's files in one go.
+
+gzip output carries no timestamp, so an unchanged file saves to identical
+bytes and git sees no change. zstd needs the optional `zstandard` package.
+"""
+
+import gzip
+import io
+import json
+import os
+from contextlib import contextmanager
+from typing import IO, Any, Dict, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional; only needed for "zstd"
+    zstandard = None
+
+COMPRESSIONS: Dict[str, str] = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def check_compression(compression: str) -> str:
+    """Validate a compression name, raising ValueError for unknown or unavailable ones."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package (pip install zstandard)")
+    return compression
+
+
+def stored_path(path: str, compression: str = "none") -> str:
+    """The on-disk name of path in the given compression."""
+    return path + COMPRESSIONS[compression]
+
+
+def find_stored(path: str) -> Optional[str]:
+    """The existing variant of path (newest if several exist), or None."""
+    found = [path + suffix for suffix in COMPRESSIONS.values() if os.path.exists(path + suffix)]
+    if not found:
+        return None
+    return max(found, key=os.path.getmtime)
+
+
+def exists(path: str) -> bool:
+    return find_stored(path) is not None
+
+
+def _read_bytes(stored: str) -> bytes:
+    with open(stored, 'rb') as f:
+        data = f.read()
+    if stored.endswith(COMPRESSIONS["gzip"]):
+        return gzip.decompress(data)
+    if stored.endswith(COMPRESSIONS["zstd"]):
+        if zstandard is None:
+            raise ValueError(f"{os.path.basename(stored)} is zstd-compressed; install 'zstandard' to read it")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def read_text(path: str) -> str:
+    """Decompressed contents of whichever variant of path exists (FileNotFoundError if none)."""
+    stored = find_stored(path)
+    if stored is None:
+        raise FileNotFoundError(path)
+    return _read_bytes(stored).decode('utf-8')
+
+
+def read_json(path: str) -> Any:
+    """Load JSON from whichever variant of path exists (FileNotFoundError if none)."""
+    return json.loads(read_text(path))
+
+
+def remove(path: str) -> None:
+    """Remove every variant of path."""
+    for suffix in COMPRESSIONS.values():
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def atomic_writer(path: str, compression: str = "none") -> Iterator[IO[str]]:
+    """
+    Text stream that replaces path's configured variant atomically on exit
+    (temp file, fsync, rename) and then removes the other variants.
+    """
+    target = stored_path(path, check_compression(compression))
+    tmp_path = f"{target}.tmp"
+    raw = open(tmp_path, 'wb')
+    try:
+        if compression == "gzip":
+            binary: IO[bytes] = gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0)
+        elif compression == "zstd":
+            binary = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+        else:
+            binary = raw
+        text = io.TextIOWrapper(binary, encoding='utf-8', newline='')
+        yield text
+        text.flush()
+        text.detach()
+        if binary is not raw:
+            # Writes the gzip trailer / ends the zstd frame
+            binary.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+    except BaseException:
+        raw.close()
+        os.remove(tmp_path)
+        raise
+    raw.close()
+    os.replace(tmp_path, target)
+    for suffix in COMPRESSIONS.values():
+        if path + suffix != target and os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def write_json_atomic(path: str, data: Any, compression: str = "none", **dump_kwargs: Any) -> None:
+    """Write JSON via a temp file + rename so readers never see a half-written file."""
+    with atomic_writer(path, compression) as f:
+        json.dump(data, f, **dump_kwargs)
@@ -30,11 +30,11 @@ Examples:
   python3 scripts/knowledge_base_manager_agnostic.py delete --domain jgengineering.ie --count 10
   python3 scripts/knowledge_base_manager_agnostic.py assign --domain jgengineering.ie
   python3 scripts/knowledge_base_manager_agnostic.py sync --domain mydiy.ie
+  python3 scripts/knowledge_base_manager_agnostic.py sync --domain mydiy.ie --changes-file shard-changes.json
 """
 
 import os
 import json
-import requests
 import time
 import logging
 import sys
@@ -47,6 +47,7 @@ from pathlib import Path
 # Add the scripts directory to the path to import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from site_config_manager import SiteConfigManager
+from http_client import PooledHTTPClient
 
 # Configure logging
 logging.basicConfig(
@@ -61,6 +62,8 @@ class AgnosticElevenLabsKnowledgeBaseManager:
         self.api_key = self._get_api_key()
         self.base_url = "https://api.elevenlabs.io/v1/convai"
         self.headers = {"xi-api-key": self.api_key}
+        # Pooled keep-alive session for all ElevenLabs calls (many small deletes/status polls)
+        self.http = PooledHTTPClient(self.base_url, headers=self.headers)
         self.config = self._load_config()
         self.sync_state_file = Path("config/elevenlabs_sync_state.json")
         self.sync_state = self._load_sync_state()
@@ -310,8 +313,49 @@ class AgnosticElevenLabsKnowledgeBaseManager:
                 llms_files.append(file_path)
         return sorted(llms_files)
     
-    def upload_files(self, domain: str, force: bool = False) -> Dict[str, Any]:
-        """Upload LLMs.txt files to ElevenLabs knowledge base for a domain."""
+    def _load_changes(self, changes_file: str, domain_dir: Path) -> Tuple[List[Path], List[str]]:
+        """
+        Read an updater --changes-file: the domain's shard files with new
+        contents (written or added) and the names of deleted ones.
+        """
+        with open(changes_file, 'r', encoding='utf-8') as f:
+            changes = json.load(f)
+
+        def in_domain(path: str) -> bool:
+            return Path(path).parent.name == domain_dir.name
+
+        changed = [
+            domain_dir / Path(path).name for path in changes.get("written_files", [])
+            if in_domain(path) and (domain_dir / Path(path).name).is_file()
+        ]
+        deleted = [Path(path).name for path in changes.get("deleted_files", []) if in_domain(path)]
+        return sorted(set(changed)), sorted(set(deleted))
+
+    def _remove_deleted_files(self, normalized_domain: str, filenames: List[str]) -> int:
+        """Delete the documents of shard files that no longer exist and drop their sync state."""
+        removed = 0
+        domain_state = self.sync_state.get(normalized_domain, {})
+        for filename in filenames:
+            entry = domain_state.get(filename)
+            if not entry:
+                continue
+            document_id = entry.get('document_id')
+            if document_id and not self._delete_document(document_id):
+                logger.warning(f"⚠️  Failed to delete document for removed file {filename}: {document_id}")
+                continue
+            logger.info(f"🗑️  Deleted document for removed file: {filename} (ID: {document_id})")
+            del domain_state[filename]
+            removed += 1
+        return removed
+
+    def upload_files(self, domain: str, force: bool = False, changes_file: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Upload LLMs.txt files to ElevenLabs knowledge base for a domain.
+
+        With changes_file (written by update_llms_agnostic.py --changes-file),
+        only the files it lists as written or added are hashed and uploaded,
+        and documents of files it lists as deleted are removed.
+        """
         # Normalize domain key to ensure consistency
         normalized_domain = self._normalize_domain_key(domain)
         logger.info(f"Uploading files for domain: {domain} (normalized: {normalized_domain})")
@@ -345,9 +389,14 @@ class AgnosticElevenLabsKnowledgeBaseManager:
             return {"error": f"Domain directory not found: {domain_dir}"}
         
         # Get LLMs files
-        llms_files = self._get_llms_files(domain_dir)
-        if not llms_files:
-            return {"error": f"No LLMs.txt files found in {domain_dir}"}
+        deleted_files: List[str] = []
+        if changes_file:
+            llms_files, deleted_files = self._load_changes(changes_file, domain_dir)
+            logger.info(f"Changes file lists {len(llms_files)} changed and {len(deleted_files)} deleted files")
+        else:
+            llms_files = self._get_llms_files(domain_dir)
+            if not llms_files:
+                return {"error": f"No LLMs.txt files found in {domain_dir}"}
         
         # Initialize sync state for normalized domain if not exists
         if normalized_domain not in self.sync_state:
@@ -357,6 +406,7 @@ class AgnosticElevenLabsKnowledgeBaseManager:
         skipped_count = 0
         error_count = 0
         uploaded_files = []
+        removed_count = self._remove_deleted_files(normalized_domain, deleted_files)
         
         for file_path in llms_files:
             try:
@@ -413,9 +463,9 @@ class AgnosticElevenLabsKnowledgeBaseManager:
                         'name': file_path.stem  # Use filename without extension as name
                     }
                     
-                    response = requests.post(
-                        f"{self.base_url}/knowledge-base/file",
-                        headers=self.headers,
+                    response = self.http.post(
+                        "knowledge-base/file",
+                        endpoint_type="upload",
                         files=files,
                         data=data
                     )
@@ -475,6 +525,7 @@ class AgnosticElevenLabsKnowledgeBaseManager:
             "uploaded_count": uploaded_count,
             "skipped_count": skipped_count,
             "error_count": error_count,
+            "removed_count": removed_count,
             "total_files": len(llms_files),
             "uploaded_files": uploaded_files
         }
@@ -500,9 +551,8 @@ class AgnosticElevenLabsKnowledgeBaseManager:
                 
                 logger.info(f"Fetching page with cursor: {cursor}")
                 
-                response = requests.get(
-                    f"{self.base_url}/knowledge-base",
-                    headers=self.headers,
+                response = self.http.get(
+                    "knowledge-base",
                     params=params
                 )
                 
@@ -581,10 +631,7 @@ class AgnosticElevenLabsKnowledgeBaseManager:
         
         for doc_id in documents_to_remove:
             try:
-                response = requests.delete(
-                    f"{self.base_url}/knowledge-base/{doc_id}",
-                    headers=self.headers
-                )
+                response = self.http.delete(f"knowledge-base/{doc_id}")
                 
                 if response.status_code == 200:
                     removed_count += 1
@@ -702,11 +749,9 @@ class AgnosticElevenLabsKnowledgeBaseManager:
             params = {'force': 'true'} if force else {}
             
             # Use the original base URL for delete operations
-            response = requests.delete(
-                f"{self.base_url}/knowledge-base/{document_id}",
-                headers=self.headers,
-                params=params,
-                timeout=30
+            response = self.http.delete(
+                f"knowledge-base/{document_id}",
+                params=params
             )
             
             if response.status_code in [200, 204]:
@@ -737,11 +782,9 @@ class AgnosticElevenLabsKnowledgeBaseManager:
                 if cursor:
                     params['cursor'] = cursor
                 
-                response = requests.get(
-                    f"{self.base_url}/knowledge-base",
-                    headers=self.headers,
-                    params=params,
-                    timeout=30
+                response = self.http.get(
+                    "knowledge-base",
+                    params=params
                 )
                 
                 if response.status_code != 200:
@@ -779,11 +822,7 @@ class AgnosticElevenLabsKnowledgeBaseManager:
             logger.info(f"Fetching documents for agent: {agent_id}")
             
             # Get agent configuration to find assigned documents
-            response = requests.get(
-                f"{self.base_url}/agents/{agent_id}",
-                headers=self.headers,
-                timeout=30
-            )
+            response = self.http.get(f"agents/{agent_id}")
             
             if response.status_code != 200:
                 raise Exception(f"Failed to get agent: {response.status_code} - {response.text}")
@@ -865,19 +904,11 @@ class AgnosticElevenLabsKnowledgeBaseManager:
                 }
             }
             
-            update_url = f"{self.base_url}/agents/{agent_id}"
-            update_headers = {
-                "xi-api-key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            
             logger.info(f"Updating agent {agent_id} with all {len(knowledge_base)} documents")
             
-            update_response = requests.patch(
-                update_url,
-                headers=update_headers,
-                json=update_payload,
-                timeout=60
+            update_response = self.http.patch(
+                f"agents/{agent_id}",
+                json=update_payload
             )
             
             if update_response.status_code == 200:
@@ -909,12 +940,12 @@ class AgnosticElevenLabsKnowledgeBaseManager:
                 "error": f"Error assigning documents: {e}"
             }
     
-    def sync_domain(self, domain: str, force: bool = False) -> Dict[str, Any]:
+    def sync_domain(self, domain: str, force: bool = False, changes_file: Optional[str] = None) -> Dict[str, Any]:
         """Sync domain: upload files and assign to agent."""
         logger.info(f"Syncing domain: {domain}")
         
         # Upload files
-        upload_result = self.upload_files(domain, force)
+        upload_result = self.upload_files(domain, force, changes_file)
         if "error" in upload_result:
             return upload_result
         
@@ -940,10 +971,7 @@ class AgnosticElevenLabsKnowledgeBaseManager:
         logger.info("Getting knowledge base statistics")
         
         try:
-            response = requests.get(
-                f"{self.base_url}/knowledge-base/stats",
-                headers=self.headers
-            )
+            response = self.http.get("knowledge-base/stats", endpoint_type="status")
             
             if response.status_code == 200:
                 return response.json()
@@ -967,6 +995,7 @@ def main():
     upload_parser = subparsers.add_parser('upload', help='Upload files to knowledge base')
     upload_parser.add_argument('--domain', required=True, help='Domain to upload files for')
     upload_parser.add_argument('--force', action='store_true', help='Force upload even if file unchanged')
+    upload_parser.add_argument('--changes-file', help='Only upload/remove the shard files listed by update_llms_agnostic.py --changes-file')
     
     # List command
     list_parser = subparsers.add_parser('list', help='List documents in knowledge base')
@@ -998,6 +1027,7 @@ def main():
     sync_parser = subparsers.add_parser('sync', help='Sync domain (upload + assign)')
     sync_parser.add_argument('--domain', required=True, help='Domain to sync')
     sync_parser.add_argument('--force', action='store_true', help='Force upload even if file unchanged')
+    sync_parser.add_argument('--changes-file', help='Only upload/remove the shard files listed by update_llms_agnostic.py --changes-file')
     
     # Stats command
     subparsers.add_parser('stats', help='Show knowledge base statistics')
@@ -1012,7 +1042,7 @@ def main():
         manager = AgnosticElevenLabsKnowledgeBaseManager()
         
         if args.command == 'upload':
-            result = manager.upload_files(args.domain, args.force)
+            result = manager.upload_files(args.domain, args.force, args.changes_file)
         elif args.command == 'list':
             result = manager.list_documents(args.domain, args.sort_by, args.sort_direction)
         elif args.command == 'remove':
@@ -1030,7 +1060,7 @@ def main():
         elif args.command == 'assign':
             result = manager.assign_documents(args.domain)
         elif args.command == 'sync':
-            result = manager.sync_domain(args.domain, args.force)
+            result = manager.sync_domain(args.domain, args.force, args.changes_file)
         elif args.command == 'stats':
             result = manager.get_stats()
         
@@ -5,10 +5,20 @@ Migrate MyDIY.ie Index Format
 This script migrates the old index format (with "shard" field) to the new format
 (with "shard_key" field) for consistency across all products.
 
+The updater derives the manifest from the index's shard keys. With
+--adopt-manifest, shard placements that were only ever made in the manifest
+file (e.g. hand-split shards) are copied into the index first, so they survive.
+
+With --structure-products, records whose "markdown" holds product JSON are
+rewritten to keep it as a structured "product" object. Only records that
+render back to identical shard text are converted.
+
 Usage:
-    python3 scripts/migrate_index_format.py [--dry-run] [--domain mydiy-ie]
+    python3 scripts/migrate_index_format.py [--dry-run] [--domain mydiy-ie] [--adopt-manifest]
+    python3 scripts/migrate_index_format.py [--dry-run] [--domain mydiy-ie] --structure-products
 """
 
+import os
 import json
 import sys
 import argparse
@@ -16,6 +26,9 @@ from pathlib import Path
 from datetime import datetime
 import shutil
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from product_store import content_fields, write_index_json
+
 def migrate_index(domain: str, dry_run: bool = False):
     """Migrate index format from old to new structure."""
     
@@ -34,7 +47,7 @@ def migrate_index(domain: str, dry_run: bool = False):
     with open(index_file, 'r') as f:
         index = json.load(f)
     
-    print(f"\n📊 Current state:")
+    print("\n📊 Current state:")
     print(f"   Total entries: {len(index)}")
     
     # Analyze current structure
@@ -67,15 +80,15 @@ def migrate_index(domain: str, dry_run: bool = False):
     
     # Check if migration needed
     if stats['has_old_shard'] == 0 and stats['has_both'] == 0:
-        print(f"\n✅ No migration needed - all entries already use 'shard_key'")
+        print("\n✅ No migration needed - all entries already use 'shard_key'")
         return True
     
-    print(f"\n🔄 Migration plan:")
+    print("\n🔄 Migration plan:")
     print(f"   Will migrate: {stats['has_old_shard']} entries")
     print(f"   Will clean up: {stats['has_both']} entries (remove duplicate 'shard' field)")
     
     if dry_run:
-        print(f"\n⚠️  DRY RUN MODE - No changes will be made")
+        print("\n⚠️  DRY RUN MODE - No changes will be made")
         return True
     
     # Confirm migration
@@ -91,7 +104,7 @@ def migrate_index(domain: str, dry_run: bool = False):
     shutil.copy2(index_file, backup_file)
     
     # Perform migration
-    print(f"\n🔄 Migrating entries...")
+    print("\n🔄 Migrating entries...")
     migrated_index = {}
     
     for url, data in index.items():
@@ -125,16 +138,16 @@ def migrate_index(domain: str, dry_run: bool = False):
             migrated_index[url] = data
     
     # Save migrated index
-    print(f"💾 Saving migrated index...")
+    print("💾 Saving migrated index...")
     with open(index_file, 'w') as f:
         json.dump(migrated_index, f, indent=2)
     
     # Validate migration
-    print(f"\n✅ Migration complete!")
+    print("\n✅ Migration complete!")
     print(f"   Migrated: {stats['migrated']} entries")
     
     # Re-analyze
-    print(f"\n📊 Post-migration state:")
+    print("\n📊 Post-migration state:")
     stats_after = {'has_shard_key': 0, 'has_old_shard': 0, 'has_neither': 0}
     
     for url, data in migrated_index.items():
@@ -151,7 +164,7 @@ def migrate_index(domain: str, dry_run: bool = False):
     print(f"   Entries with neither: {stats_after['has_neither']}")
     
     if stats_after['has_old_shard'] == 0:
-        print(f"\n✅ SUCCESS - All entries now use 'shard_key' format")
+        print("\n✅ SUCCESS - All entries now use 'shard_key' format")
     else:
         print(f"\n⚠️  WARNING - {stats_after['has_old_shard']} entries still have old format")
     
@@ -160,6 +173,119 @@ def migrate_index(domain: str, dry_run: bool = False):
     
     return True
 
+def adopt_manifest(domain: str, dry_run: bool = False):
+    """Copy shard placements from the manifest file into the index's shard_key fields."""
+    
+    base_path = Path(f"out/{domain}")
+    index_file = base_path / f"llms-{domain}-index.json"
+    manifest_file = base_path / f"llms-{domain}-manifest.json"
+    
+    if not index_file.exists() or not manifest_file.exists():
+        print(f"❌ Index or manifest not found in {base_path}")
+        return False
+    
+    print(f"🔍 Adopting manifest shard placements for {domain}")
+    print("=" * 80)
+    
+    with open(index_file, 'r') as f:
+        index = json.load(f)
+    with open(manifest_file, 'r') as f:
+        manifest = json.load(f)
+    
+    # URLs listed under more than one shard are ambiguous; leave them to the index
+    placements = {}
+    for shard_key, urls in manifest.items():
+        for url in urls:
+            placements.setdefault(url, []).append(shard_key)
+    
+    changes = {}
+    ambiguous = 0
+    for url, shards in placements.items():
+        if url not in index or not isinstance(index[url], dict):
+            continue
+        if len(shards) > 1:
+            ambiguous += 1
+            continue
+        current = index[url].get('shard_key') or index[url].get('shard')
+        if current != shards[0]:
+            changes[url] = shards[0]
+    
+    print(f"\n   Index entries moved to their manifest shard: {len(changes)}")
+    print(f"   URLs in several manifest shards (skipped): {ambiguous}")
+    
+    if not changes:
+        print("\n✅ Index already matches the manifest")
+        return True
+    
+    if dry_run:
+        print("\n⚠️  DRY RUN MODE - No changes will be made")
+        return True
+    
+    backup_file = index_file.with_suffix('.json.backup')
+    print(f"\n💾 Creating backup: {backup_file.name}")
+    shutil.copy2(index_file, backup_file)
+    
+    for url, shard_key in changes.items():
+        index[url]['shard_key'] = shard_key
+        index[url].pop('shard', None)
+    
+    with open(index_file, 'w') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    
+    print(f"\n✅ Updated {len(changes)} index entries")
+    return True
+
+def structure_products(domain: str, dry_run: bool = False):
+    """Convert records' product JSON strings into structured "product" objects."""
+    
+    base_path = Path(f"out/{domain}")
+    index_file = base_path / f"llms-{domain}-index.json"
+    
+    if not index_file.exists():
+        print(f"❌ Index file not found: {index_file}")
+        return False
+    
+    print(f"🔍 Structuring product records for {domain}")
+    print("=" * 80)
+    
+    size_before = index_file.stat().st_size
+    with open(index_file, 'r') as f:
+        index = json.load(f)
+    
+    converted = {}
+    for url, data in index.items():
+        if not isinstance(data, dict) or 'markdown' not in data:
+            continue
+        fields = content_fields(data.get('markdown') or '')
+        if 'product' in fields:
+            # "product" takes the place of "markdown", so the key order is unchanged
+            converted[url] = {
+                ('product' if key == 'markdown' else key): (fields['product'] if key == 'markdown' else value)
+                for key, value in data.items()
+            }
+    
+    print(f"\n   Records with product JSON: {len(converted)}")
+    print(f"   Records kept as text: {sum(1 for data in index.values() if isinstance(data, dict) and 'markdown' in data) - len(converted)}")
+    
+    if not converted:
+        print("\n✅ Nothing to convert")
+        return True
+    
+    if dry_run:
+        print("\n⚠️  DRY RUN MODE - No changes will be made")
+        return True
+    
+    backup_file = index_file.with_suffix('.json.backup')
+    print(f"\n💾 Creating backup: {backup_file.name}")
+    shutil.copy2(index_file, backup_file)
+    
+    index.update(converted)
+    write_index_json(str(index_file), index)
+    
+    print(f"\n✅ Converted {len(converted)} records "
+          f"({size_before:,} → {index_file.stat().st_size:,} bytes)")
+    return True
+
 def main():
     parser = argparse.ArgumentParser(description='Migrate index format from old to new structure')
     parser.add_argument('--domain', type=str, default='mydiy-ie',
@@ -167,9 +293,19 @@ def main():
     parser.add_argument('--dry-run', action='store_true',
                        help='Show what would be migrated without making changes')
     
+    parser.add_argument('--adopt-manifest', action='store_true',
+                       help='Copy shard placements from the manifest file into the index')
+    parser.add_argument('--structure-products', action='store_true',
+                       help='Store product JSON as structured "product" objects instead of strings')
+    
     args = parser.parse_args()
     
-    success = migrate_index(args.domain, dry_run=args.dry_run)
+    if args.adopt_manifest:
+        success = adopt_manifest(args.domain, dry_run=args.dry_run)
+    elif args.structure_products:
+        success = structure_products(args.domain, dry_run=args.dry_run)
+    else:
+        success = migrate_index(args.domain, dry_run=args.dry_run)
     
     if not success:
         sys.exit(1)
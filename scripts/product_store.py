@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Product Store Backends for the URL Index
+
+The updater keeps its URL index (normalized URL -> title, product fields,
+shard key, updated_at) in a ProductStore. Both backends behave like a dict, so existing
+code keeps using url_index[url], `in`, get() and del.
+
+  json    llms-<site>-index.json, loaded whole at startup and rewritten on
+          save() (the original format; other scripts read this file)
+  sqlite  llms-<site>-index.db, one row per URL, indexed by shard. Every
+          assignment or delete is its own transaction, so startup and save
+          cost do not grow with the catalog. The first open imports an
+          existing JSON index, and export_json() writes the JSON format on
+          demand for tools that still need it.
+
+The backend is chosen per site in config/site_configs.json
+("storage": {"index_backend": "sqlite"}) or with --index-backend.
+
+The shard manifest is not stored separately: store.manifest is derived from
+the records' shard keys on first use and kept in step by every assignment
+and delete. export_manifest() writes llms-<site>-manifest.json on demand.
+
+Records store extracted product data as a JSON object under "product"
+(product_name, price, availability, description, specifications, ...), not
+as a pretty-printed string. Shard text is rendered from it at write time
+(record_text()), byte-for-byte as before. Content that is not a JSON object,
+or that would not render back identically, stays a string under "markdown",
+as older records do. The JSON index is written one record per line
+(write_index_json()), optionally compressed (see json_storage.py).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, MutableMapping, Optional, Set, Tuple
+
+import json_storage
+from json_storage import atomic_writer, write_json_atomic
+from shard_manifest import ShardManifest
+
+logger = logging.getLogger(__name__)
+
+INDEX_BACKENDS = ("json", "sqlite")
+
+# Columns stored directly; any other record fields are kept in the `extra` JSON column
+_COLUMNS = ("title", "markdown", "updated_at")
+
+
+def record_shard(record: Dict[str, Any]) -> Optional[str]:
+    """Shard key of an index record (older records use "shard")."""
+    return record.get("shard_key") or record.get("shard")
+
+
+def _render_product(product: Dict[str, Any]) -> str:
+    # The format scrapes have always used for product JSON
+    return json.dumps(product, indent=2, ensure_ascii=False)
+
+
+def content_fields(content: str) -> Dict[str, Any]:
+    """
+    Record fields for scraped content: {"product": {...}} when it is product
+    JSON that renders back to the same text, else {"markdown": content}.
+    """
+    if content.lstrip().startswith("{"):
+        try:
+            product = json.loads(content)
+        except ValueError:
+            product = None
+        if isinstance(product, dict):
+            text = _render_product(product)
+            # Shard files hold the text followed by a blank line
+            if content == text or content == text + "\n\n":
+                return {"product": product}
+    return {"markdown": content}
+
+
+def record_text(record: Dict[str, Any]) -> str:
+    """The product text of a record, as it appears in shard files."""
+    if "product" in record:
+        return _render_product(record["product"])
+    return record.get("markdown", "")
+
+
+def changed_fields(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> List[str]:
+    """Product fields that differ between two structured records (empty if either is unstructured)."""
+    if not old or "product" not in old or "product" not in new:
+        return []
+    before, after = old["product"], new["product"]
+    return [key for key in dict.fromkeys([*before, *after]) if before.get(key) != after.get(key)]
+
+
+def write_index_json(path: str, index: Dict[str, Dict[str, Any]], compression: str = "none") -> None:
+    """
+    Write an index as a JSON object with one record per line: smaller than
+    indent=2 once products are nested objects, and a changed product is a
+    one-line diff.
+    """
+    with atomic_writer(path, compression) as f:
+        f.write("{")
+        separator = "\n"
+        for url, record in index.items():
+            f.write(f"{separator}{json.dumps(url, ensure_ascii=False)}: {json.dumps(record, ensure_ascii=False)}")
+            separator = ",\n"
+        f.write("\n}\n")
+
+
+class ProductStore(MutableMapping, ABC):
+    """
+    Dict-like URL index. Subclasses persist records in _put()/_delete();
+    save() makes changes durable. A backend missing any of them cannot be
+    instantiated.
+    """
+
+    # True when every write is already durable, so whole-index snapshots are unnecessary
+    durable_writes = False
+
+    _manifest: Optional[ShardManifest] = None
+
+    @abstractmethod
+    def _put(self, url: str, record: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def _delete(self, url: str) -> None:
+        ...
+
+    def __setitem__(self, url: str, record: Dict[str, Any]) -> None:
+        self._put(url, record)
+        if self._manifest is not None:
+            self._manifest.place(url, record_shard(record))
+
+    def __delitem__(self, url: str) -> None:
+        self._delete(url)
+        if self._manifest is not None:
+            self._manifest.drop(url)
+
+    def _shard_assignments(self) -> Iterable[Tuple[str, Optional[str]]]:
+        """(url, shard key) for every record, in index order."""
+        return ((url, record_shard(record)) for url, record in self.items())
+
+    @property
+    def manifest(self) -> ShardManifest:
+        """shard key -> URLs, derived from the records and maintained on every write."""
+        if self._manifest is None:
+            manifest = ShardManifest()
+            for url, shard_key in self._shard_assignments():
+                manifest.place(url, shard_key)
+            self._manifest = manifest
+        return self._manifest
+
+    def export_manifest(self, path: str, compression: str = "none") -> None:
+        """Write the manifest in the llms-<site>-manifest.json format."""
+        write_json_atomic(
+            path, self.manifest.to_dict(), compression, indent=2, ensure_ascii=False, sort_keys=True
+        )
+
+    def by_shard(self, shard_key: str) -> Dict[str, Dict[str, Any]]:
+        """All records whose shard key is shard_key."""
+        return self.get_many(self.shard_urls(shard_key))
+
+    def shard_urls(self, shard_key: str) -> List[str]:
+        """URLs whose shard key is shard_key, in manifest order."""
+        return list(self.manifest.get(shard_key, ()))
+
+    def has_shard(self, shard_key: str) -> bool:
+        """Whether any record has shard key shard_key."""
+        return shard_key in self.manifest
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Records for the given URLs (missing URLs are left out)."""
+        found = {}
+        for url in urls:
+            record = self.get(url)
+            if record is not None:
+                found[url] = record
+        return found
+
+    def url_set(self) -> Set[str]:
+        """A set of stored URLs that also accepts add() for URLs recorded elsewhere."""
+        return set(self.keys())
+
+    @abstractmethod
+    def save(self) -> None:
+        ...
+
+    def export_json(self, path: str, compression: str = "none") -> None:
+        """Write the index in the legacy llms-<site>-index.json format."""
+        write_index_json(path, dict(self.items()), compression)
+
+    def close(self) -> None:
+        pass
+
+
+class JsonProductStore(ProductStore):
+    """The original in-memory dict, loaded from and saved to one JSON file."""
+
+    def __init__(self, path: str, compression: str = "none"):
+        self.path = path
+        self.compression = json_storage.check_compression(compression)
+        self._data: Dict[str, Dict[str, Any]] = {}
+        if json_storage.exists(path):
+            try:
+                self._data = json_storage.read_json(path)
+            except Exception as e:
+                logger.warning(f"Failed to load URL index: {e}")
+
+    def __getitem__(self, url: str) -> Dict[str, Any]:
+        return self._data[url]
+
+    def _put(self, url: str, record: Dict[str, Any]) -> None:
+        self._data[url] = record
+
+    def _delete(self, url: str) -> None:
+        del self._data[url]
+
+    def __contains__(self, url: object) -> bool:
+        return url in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def save(self) -> None:
+        write_index_json(self.path, self._data, self.compression)
+
+
+class _StoreUrlSet:
+    """
+    Set of known URLs backed by the store: membership falls through to an
+    indexed lookup, so nothing has to be loaded at startup. URLs recorded
+    outside the store are kept in memory.
+    """
+
+    def __init__(self, store: "SqliteProductStore"):
+        self._store = store
+        self._extra: Set[str] = set()
+
+    def add(self, url: str) -> None:
+        if url not in self._store:
+            self._extra.add(url)
+
+    def discard(self, url: str) -> None:
+        self._extra.discard(url)
+
+    def __contains__(self, url: object) -> bool:
+        return url in self._extra or url in self._store
+
+    def __len__(self) -> int:
+        return len(self._store) + sum(1 for url in self._extra if url not in self._store)
+
+    def __bool__(self) -> bool:
+        return bool(self._extra) or len(self._store) > 0
+
+    def __iter__(self) -> Iterator[str]:
+        for url in self._store:
+            yield url
+        for url in list(self._extra):
+            if url not in self._store:
+                yield url
+
+
+class SqliteProductStore(ProductStore):
+    """One row per normalized URL in SQLite, indexed by shard key."""
+
+    durable_writes = True
+
+    def __init__(self, path: str, import_json_path: Optional[str] = None):
+        self.path = path
+        is_new = not os.path.exists(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        # The shard pipeline reads from its writer thread; access is serialised by _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS products (
+                url TEXT PRIMARY KEY,
+                shard_key TEXT,
+                title TEXT,
+                markdown TEXT,
+                updated_at TEXT,
+                extra TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_products_shard ON products (shard_key)")
+
+        if is_new and import_json_path and json_storage.exists(import_json_path):
+            legacy = JsonProductStore(import_json_path)
+            self.update_many(legacy.items())
+            logger.info(f"Imported {len(legacy)} index entries from {os.path.basename(import_json_path)}")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _to_row(url: str, record: Dict[str, Any]) -> tuple:
+        # Structured "product" fields go in extra; markdown is NULL for those records
+        extra = {key: value for key, value in record.items() if key not in _COLUMNS}
+        return (
+            url,
+            record_shard(record),
+            record.get("title", ""),
+            record.get("markdown", "" if "product" not in record else None),
+            record.get("updated_at"),
+            json.dumps(extra, ensure_ascii=False),
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> Dict[str, Any]:
+        title, markdown, updated_at, extra = row
+        # Same key order as the JSON index: title, markdown or product, shard/shard_key..., updated_at
+        record: Dict[str, Any] = {"title": title}
+        if markdown is not None:
+            record["markdown"] = markdown
+        record.update(json.loads(extra) if extra else {})
+        record["updated_at"] = updated_at
+        return record
+
+    def __getitem__(self, url: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, markdown, updated_at, extra FROM products WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(url)
+        return self._from_row(row)
+
+    def _put(self, url: str, record: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO products (url, shard_key, title, markdown, updated_at, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._to_row(url, record),
+            )
+
+    def _delete(self, url: str) -> None:
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM products WHERE url = ?", (url,))
+        if cursor.rowcount == 0:
+            raise KeyError(url)
+
+    def __contains__(self, url: object) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM products WHERE url = ?", (url,)
+            ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            urls = [row[0] for row in self._conn.execute("SELECT url FROM products ORDER BY rowid")]
+        return iter(urls)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def items(self):  # type: ignore[override]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, title, markdown, updated_at, extra FROM products ORDER BY rowid"
+            ).fetchall()
+        return [(row[0], self._from_row(row[1:])) for row in rows]
+
+    def update_many(self, records: Iterable[tuple]) -> None:
+        """Upsert many (url, record) pairs in one transaction."""
+        records = list(records)
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO products (url, shard_key, title, markdown, updated_at, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [self._to_row(url, record) for url, record in records],
+            )
+        if self._manifest is not None:
+            for url, record in records:
+                self._manifest.place(url, record_shard(record))
+
+    def _shard_assignments(self) -> Iterable[Tuple[str, Optional[str]]]:
+        # Shard keys have their own column, so the manifest is built without reading markdown
+        with self._lock:
+            return self._conn.execute("SELECT url, shard_key FROM products ORDER BY rowid").fetchall()
+
+    def by_shard(self, shard_key: str) -> Dict[str, Dict[str, Any]]:
+        # Served by the shard_key index without building the manifest
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, title, markdown, updated_at, extra FROM products WHERE shard_key = ? ORDER BY rowid",
+                (shard_key,),
+            ).fetchall()
+        return {row[0]: self._from_row(row[1:]) for row in rows}
+
+    def shard_urls(self, shard_key: str) -> List[str]:
+        # Served by the shard_key index until something needs the whole manifest
+        if self._manifest is not None:
+            return super().shard_urls(shard_key)
+        with self._lock:
+            return [url for url, in self._conn.execute(
+                "SELECT url FROM products WHERE shard_key = ? ORDER BY rowid", (shard_key,)
+            )]
+
+    def has_shard(self, shard_key: str) -> bool:
+        if self._manifest is not None:
+            return super().has_shard(shard_key)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM products WHERE shard_key = ? LIMIT 1", (shard_key,)
+            ).fetchone() is not None
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        urls = list(urls)
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                for row in self._conn.execute(
+                    f"SELECT url, title, markdown, updated_at, extra FROM products WHERE url IN ({placeholders})",
+                    chunk,
+                ):
+                    found[row[0]] = self._from_row(row[1:])
+        return found
+
+    def url_set(self) -> Set[str]:
+        return _StoreUrlSet(self)
+
+    def save(self) -> None:
+        # Every write is already committed
+        pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_product_store(backend: str, json_path: str, sqlite_path: str, compression: str = "none") -> ProductStore:
+    """Open the URL index with the given backend ("json" or "sqlite"); compression applies to JSON files."""
+    if backend == "json":
+        return JsonProductStore(json_path, compression)
+    if backend == "sqlite":
+        return SqliteProductStore(sqlite_path, import_json_path=json_path)
+    raise ValueError(f"Unknown index backend: {backend}")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Priority Classes for the Pending Queue
+
+Every queue entry belongs to one class, kept in entry["metadata"]["priority"]:
+
+  realtime   webhook-triggered updates (--added/--changed --via-queue)
+  discovery  product URLs found by discovery (the default)
+  backfill   bulk additions, e.g. add_missing_products_from_map.py
+  refresh    already-indexed products queued for a re-scrape, stalest first
+             (--refresh-stale), ordered by metadata["last_updated"]
+
+Realtime entries always go first, so they make the next batch however big
+the backlog is. The rest of each batch is shared between the other classes
+by weight, configured per site in config/site_configs.json:
+
+  "queue": {
+    "priority_weights": {"discovery": 5, "backfill": 3, "refresh": 2}
+  }
+
+A class with fewer entries than its share gives the remainder to the
+others, so a batch is never short while work is queued. Queueing a URL that
+is already waiting in a less urgent class moves it to the new class. Both queue backends
+(PendingQueue and SqliteWorkQueue) schedule through plan_batch().
+"""
+
+from typing import Any, Dict, Mapping
+
+PRIORITIES = ("realtime", "discovery", "backfill", "refresh")
+
+DEFAULT_PRIORITY_WEIGHTS: Dict[str, float] = {
+    "discovery": 5,
+    "backfill": 3,
+    "refresh": 2,
+}
+
+# Classes that are scraped even when the URL is already in the index
+RESCRAPE_PRIORITIES = frozenset({"realtime", "refresh"})
+
+
+def entry_priority(entry: Dict[str, Any]) -> str:
+    """Priority class of a queue entry; entries queued before classes existed are discovery or backfill."""
+    metadata = entry.get("metadata") or {}
+    priority = metadata.get("priority")
+    if priority in PRIORITIES:
+        return priority
+    if metadata.get("source_category") == "site_map_discovery":
+        return "backfill"
+    return "discovery"
+
+
+def outranks(entry: Dict[str, Any], other: Dict[str, Any]) -> bool:
+    """Whether entry belongs to a more urgent class than other (e.g. a webhook for a backlog URL)."""
+    return PRIORITIES.index(entry_priority(entry)) < PRIORITIES.index(entry_priority(other))
+
+
+def staleness_key(entry: Dict[str, Any]) -> str:
+    """Sort key for refresh entries: least recently scraped first (never scraped sorts first); "" otherwise."""
+    if entry_priority(entry) != "refresh":
+        return ""
+    return (entry.get("metadata") or {}).get("last_updated") or ""
+
+
+def plan_batch(size: int, available: Mapping[str, int], weights: Mapping[str, float]) -> Dict[str, int]:
+    """
+    How many entries to take from each class for a batch of size.
+
+    Realtime is taken first; the remaining slots are split by weight between
+    the classes that have entries (largest remainder), and any share a class
+    cannot fill is handed to the others.
+    """
+    plan = {priority: 0 for priority in PRIORITIES}
+    plan["realtime"] = min(size, available.get("realtime", 0))
+    remaining = size - plan["realtime"]
+
+    while remaining > 0:
+        open_classes = [
+            p for p in PRIORITIES[1:] if available.get(p, 0) > plan[p] and weights.get(p, 0) > 0
+        ]
+        if not open_classes:
+            # Zero-weight classes still drain once nothing else is queued
+            open_classes = [p for p in PRIORITIES[1:] if available.get(p, 0) > plan[p]]
+            if not open_classes:
+                break
+            total = float(len(open_classes))
+            shares = {p: remaining / total for p in open_classes}
+        else:
+            total = float(sum(weights[p] for p in open_classes))
+            shares = {p: remaining * weights[p] / total for p in open_classes}
+
+        grants = {p: int(shares[p]) for p in open_classes}
+        # Hand out the slots lost to rounding, largest fractional share first
+        leftover = remaining - sum(grants.values())
+        for p in sorted(open_classes, key=lambda p: shares[p] - grants[p], reverse=True)[:leftover]:
+            grants[p] += 1
+
+        for p in open_classes:
+            granted = min(grants[p], available.get(p, 0) - plan[p])
+            plan[p] += granted
+            remaining -= granted
+    return plan
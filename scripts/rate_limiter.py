@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Token-Bucket Rate Limiting for Firecrawl API Calls
+
+Every Firecrawl request made by the updater goes through a limiter obtained
+from get_rate_limiter(). Limiters are shared per API key, so concurrent
+workers (and several updaters in one process) draw from the same quota.
+
+Limits are configured per site in config/site_configs.json:
+
+  "rate_limit": {
+    "requests_per_second": 2,
+    "burst": 5,
+    "max_in_flight": 5
+  }
+
+The limiter is also adaptive (AIMD): a 429 or an exhausted rate-limit header
+halves the send rate and pauses all callers for the server's Retry-After
+window, and every run of sustained successes adds a fixed step back until the
+configured ceiling is reached again.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT: Dict[str, Any] = {
+    "requests_per_second": 2.0,
+    "burst": 5,
+    "max_in_flight": 5,
+    # Adaptive pacing (AIMD)
+    "min_requests_per_second": 0.2,
+    "decrease_factor": 0.5,
+    "increase_step": 0.25,
+    "success_threshold": 20,
+    "default_retry_after": 5,
+    "max_throttle_retries": 5,
+}
+
+# Status codes that mean "slow down" rather than "this URL is broken"
+THROTTLE_STATUS_CODES = {429}
+
+
+def parse_retry_after(headers: Mapping[str, str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Return the number of seconds the server asked us to wait, if any.
+
+    Understands Retry-After (delta-seconds or HTTP-date) and the common
+    X-RateLimit-Remaining / X-RateLimit-Reset pair (reset as delta-seconds
+    or a Unix timestamp).
+    """
+    if not headers:
+        return None
+    now = time.time() if now is None else now
+
+    retry_after = headers.get("Retry-After") or headers.get("retry-after")
+    if retry_after:
+        retry_after = retry_after.strip()
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                if retry_at.tzinfo is None:
+                    retry_at = retry_at.replace(tzinfo=timezone.utc)
+                return max(retry_at.timestamp() - now, 0.0)
+            except (TypeError, ValueError):
+                pass
+
+    remaining = headers.get("X-RateLimit-Remaining") or headers.get("x-ratelimit-remaining")
+    reset = headers.get("X-RateLimit-Reset") or headers.get("x-ratelimit-reset")
+    if remaining is not None and reset:
+        try:
+            if float(remaining) > 0:
+                return None
+            reset_value = float(reset)
+        except ValueError:
+            return None
+        # Large values are absolute epoch seconds, small ones are deltas
+        if reset_value > 1_000_000_000:
+            return max(reset_value - now, 0.0)
+        return max(reset_value, 0.0)
+
+    return None
+
+
+class TokenBucketRateLimiter:
+    """Thread-safe, adaptive token bucket with a cap on concurrently running requests."""
+
+    def __init__(
+        self,
+        requests_per_second: float = 2.0,
+        burst: int = 5,
+        max_in_flight: int = 5,
+        min_requests_per_second: float = 0.2,
+        decrease_factor: float = 0.5,
+        increase_step: float = 0.25,
+        success_threshold: int = 20,
+        default_retry_after: float = 5.0,
+    ):
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._success_streak = 0
+        self.min_requests_per_second = max(float(min_requests_per_second), 0.01)
+        self.decrease_factor = min(max(float(decrease_factor), 0.05), 1.0)
+        self.increase_step = max(float(increase_step), 0.0)
+        self.success_threshold = max(int(success_threshold), 1)
+        self.default_retry_after = max(float(default_retry_after), 0.0)
+        self.configure(requests_per_second, burst, max_in_flight)
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+
+    def configure(self, requests_per_second: float, burst: int, max_in_flight: int) -> None:
+        """Update the limits in place (waiting callers pick them up immediately)."""
+        with self._cond:
+            self.requests_per_second = max(float(requests_per_second), 0.01)
+            self.current_rate = self.requests_per_second
+            self.burst = max(int(burst), 1)
+            self.max_in_flight = max(int(max_in_flight), 1)
+            if hasattr(self, "_tokens"):
+                self._tokens = min(self._tokens, float(self.burst))
+            self._cond.notify_all()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.current_rate)
+            self._last_refill = now
+
+    def acquire(self) -> None:
+        """Block until a token and an in-flight slot are both available."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    # Server asked everyone to back off
+                    self._cond.wait(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._in_flight < self.max_in_flight and self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    self._in_flight += 1
+                    return
+                if self._in_flight >= self.max_in_flight:
+                    # release() notifies when a slot frees up
+                    self._cond.wait()
+                else:
+                    self._cond.wait((1.0 - self._tokens) / self.current_rate)
+
+    def record_throttle(self, retry_after: Optional[float] = None) -> float:
+        """
+        Multiplicative decrease after a 429: cut the send rate, drain the
+        bucket and pause every caller for retry_after seconds.
+
+        Requests that were already in flight often come back throttled
+        together; a 429 that arrives while an earlier one's pause is still
+        running belongs to the same event, so it extends the pause but does
+        not cut the rate again.
+
+        Returns the pause that was applied.
+        """
+        delay = self.default_retry_after if retry_after is None else max(float(retry_after), 0.0)
+        with self._cond:
+            now = time.monotonic()
+            same_event = now < self._blocked_until
+            previous = self.current_rate
+            if not same_event:
+                self.current_rate = max(self.min_requests_per_second, self.current_rate * self.decrease_factor)
+            self._success_streak = 0
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._last_refill = self._blocked_until
+            self._cond.notify_all()
+        if same_event:
+            logger.debug(f"Firecrawl throttled an in-flight request; pausing {delay:.1f}s")
+        else:
+            logger.warning(
+                f"Firecrawl throttled us; pausing {delay:.1f}s and lowering rate "
+                f"{previous:.2f} -> {self.current_rate:.2f} req/s"
+            )
+        return delay
+
+    def record_success(self) -> None:
+        """Additive increase after success_threshold consecutive successes."""
+        with self._cond:
+            self._success_streak += 1
+            if self._success_streak < self.success_threshold:
+                return
+            self._success_streak = 0
+            if self.current_rate < self.requests_per_second:
+                self.current_rate = min(self.requests_per_second, self.current_rate + self.increase_step)
+                logger.debug(f"Sustained success; raising Firecrawl rate to {self.current_rate:.2f} req/s")
+                self._cond.notify_all()
+
+    def observe_response(self, status_code: int, headers: Optional[Mapping[str, str]] = None) -> Optional[float]:
+        """
+        Feed a response into the adaptive pacing.
+
+        Returns the back-off delay when the response was a throttle signal,
+        otherwise None.
+        """
+        retry_after = parse_retry_after(headers or {})
+        if status_code in THROTTLE_STATUS_CODES:
+            return self.record_throttle(retry_after)
+        if retry_after is not None and retry_after > 0:
+            # Quota exhausted but this request still went through: pause without
+            # treating it as a failure.
+            with self._cond:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            logger.info(f"Firecrawl rate-limit window exhausted; pausing {retry_after:.1f}s")
+            return None
+        if status_code < 400:
+            self.record_success()
+        return None
+
+    def release(self) -> None:
+        """Mark a request as finished, freeing its in-flight slot."""
+        with self._cond:
+            if self._in_flight > 0:
+                self._in_flight -= 1
+            self._cond.notify_all()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def __enter__(self) -> "TokenBucketRateLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+_limiters: Dict[str, TokenBucketRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter_key(api_key: str) -> str:
+    """Registry key for an API key (the raw key is never kept around)."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def get_rate_limiter(api_key: str, rate_limit: Optional[Dict[str, Any]] = None) -> TokenBucketRateLimiter:
+    """
+    Return the shared limiter for an API key, creating it on first use.
+
+    The first caller's configuration wins; later callers with different
+    settings get the existing limiter so the key's quota is never exceeded.
+    """
+    settings = dict(DEFAULT_RATE_LIMIT)
+    settings.update(rate_limit or {})
+
+    key = _limiter_key(api_key)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = TokenBucketRateLimiter(
+                requests_per_second=settings["requests_per_second"],
+                burst=settings["burst"],
+                max_in_flight=settings["max_in_flight"],
+                min_requests_per_second=settings["min_requests_per_second"],
+                decrease_factor=settings["decrease_factor"],
+                increase_step=settings["increase_step"],
+                success_threshold=settings["success_threshold"],
+                default_retry_after=settings["default_retry_after"],
+            )
+            _limiters[key] = limiter
+            logger.debug(
+                f"Created Firecrawl rate limiter: {limiter.requests_per_second} req/s, "
+                f"burst {limiter.burst}, max in-flight {limiter.max_in_flight}"
+            )
+        return limiter
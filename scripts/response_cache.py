@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+On-Disk Response Cache for Firecrawl Scrapes
+
+Successful Firecrawl scrape responses are stored under out/<site>/.cache/,
+one JSON file per request. The file name is a hash of the request payload:
+the EUR-normalized URL, the requested formats (including the JSON
+extraction schema) and the scrape options. Re-running a crashed batch,
+rebuilding the index or meeting the same product in several collections
+therefore costs nothing while the entry is younger than the TTL.
+
+Cache settings are configured per site in config/site_configs.json:
+
+  "cache": {
+    "ttl_hours": 168,
+    "max_size_mb": 500
+  }
+
+Entries are evicted least-recently-used first once the cache grows past
+max_size_mb. Modes (--cache-mode):
+
+  use      read fresh entries, store new responses (default)
+  refresh  ignore entries from earlier runs, store new responses
+  off      bypass the cache entirely
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_CONFIG: Dict[str, Any] = {
+    "ttl_hours": 168,
+    "max_size_mb": 500,
+}
+
+CACHE_MODES = ("use", "refresh", "off")
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """Stable hash of a Firecrawl request payload (key order does not matter)."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe, size-bounded LRU cache of Firecrawl responses stored as JSON files."""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        mode: str = "use",
+        ttl_hours: float = DEFAULT_CACHE_CONFIG["ttl_hours"],
+        max_size_mb: float = DEFAULT_CACHE_CONFIG["max_size_mb"],
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.ttl_seconds = max(float(ttl_hours), 0.0) * 3600
+        self.max_bytes = max(float(max_size_mb), 0.0) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # file name -> (size in bytes, last access time); built lazily from the directory
+        self._entries: Optional[Dict[str, list]] = None
+        # keys stored by this instance; refresh mode still reads these
+        self._stored: Set[str] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_entries(self) -> Dict[str, list]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.isdir(self.cache_dir):
+                for name in os.listdir(self.cache_dir):
+                    if not name.endswith(".json"):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        continue
+                    self._entries[name] = [stat.st_size, stat.st_mtime]
+        return self._entries
+
+    def get(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a payload, or None on a miss or stale entry."""
+        if not self.enabled:
+            return None
+
+        key = cache_key(payload)
+        if self.mode == "refresh" and key not in self._stored:
+            return None
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+
+            if time.time() - record.get("stored_at", 0) > self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            # Touch the file so LRU order survives restarts
+            now = time.time()
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+            entry = self._load_entries().get(os.path.basename(path))
+            if entry:
+                entry[1] = now
+            self.hits += 1
+
+        logger.debug(f"Cache hit for {payload.get('url')}")
+        return record.get("response")
+
+    def put(self, payload: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """Store a response, then evict least-recently-used entries beyond max_size_mb."""
+        if not self.enabled:
+            return
+
+        key = cache_key(payload)
+        path = self._path(key)
+        record = {
+            "stored_at": time.time(),
+            "url": payload.get("url"),
+            "response": response,
+        }
+        with self._lock:
+            entries = self._load_entries()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            entries[os.path.basename(path)] = [os.path.getsize(path), time.time()]
+            self._stored.add(key)
+            self._evict(entries)
+
+    def _evict(self, entries: Dict[str, list]) -> None:
+        total = sum(size for size, _ in entries.values())
+        if total <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            del entries[name]
+            total -= size
+        logger.debug(f"Evicted cache entries down to {total / (1024 * 1024):.1f} MB")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._load_entries()
+            return {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(entries),
+                "size_bytes": sum(size for size, _ in entries.values()),
+            }
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Backoff Schedule for the Retry Queue
+
+A URL whose scrape fails goes to the retry queue with three fields in
+entry["metadata"]:
+
+  attempts     failed scrapes so far
+  error_class  why the last one failed (see ERROR_CLASSES)
+  not_before   ISO timestamp before which it is not retried
+
+not_before grows exponentially with the attempts, from the error class's
+base delay up to max_delay_hours. Normal batch runs take due entries from
+the retry queue (batch_share of each batch, more when the pending queue
+runs short), so nothing needs a manual --process-retry-queue run. After max_attempts failures an entry is
+moved to the dead-letter queue instead, where it stays until an operator
+requeues it with --requeue-dead-letters.
+
+Configured per site in config/site_configs.json:
+
+  "queue": {
+    "retry": {
+      "max_attempts": 5,
+      "base_delay_minutes": 30,
+      "max_delay_hours": 48,
+      "batch_share": 0.2,
+      "error_classes": {"not_found": {"max_attempts": 2, "base_delay_minutes": 720}}
+    }
+  }
+
+Settings under error_classes override the top-level ones for that class.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional
+
+import requests
+
+ERROR_CLASSES = (
+    "timeout",       # request timed out
+    "network",       # connection or other transport error
+    "throttled",     # 429 after the rate limiter's own retries
+    "server_error",  # 5xx from Firecrawl or the site
+    "not_found",     # 404/410: the page is probably gone
+    "client_error",  # other 4xx
+    "no_data",       # a response without usable product data
+)
+
+DEFAULT_RETRY_CONFIG: Dict[str, Any] = {
+    "max_attempts": 5,
+    "base_delay_minutes": 30,
+    "max_delay_hours": 48,
+    "batch_share": 0.2,
+    "error_classes": {
+        "timeout": {"base_delay_minutes": 10},
+        "network": {"base_delay_minutes": 10},
+        "throttled": {"base_delay_minutes": 15},
+        "not_found": {"max_attempts": 2, "base_delay_minutes": 720},
+        "client_error": {"max_attempts": 3, "base_delay_minutes": 240},
+    },
+}
+
+
+def error_class_for_status(status_code: int) -> str:
+    """Error class of an HTTP error status."""
+    if status_code in (404, 410):
+        return "not_found"
+    if status_code == 429:
+        return "throttled"
+    if status_code >= 500:
+        return "server_error"
+    return "client_error"
+
+
+def error_class_for_exception(exc: BaseException) -> str:
+    """Error class of an exception raised while scraping."""
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "timeout"
+    response = getattr(exc, "response", None)
+    if isinstance(exc, requests.exceptions.HTTPError) and response is not None:
+        return error_class_for_status(response.status_code)
+    if isinstance(exc, requests.exceptions.RequestException):
+        return "network"
+    return "no_data"
+
+
+def retry_at(entry: Dict[str, Any]) -> str:
+    """A retry entry's not_before ("" if it has none, e.g. entries queued before backoff existed)."""
+    return (entry.get("metadata") or {}).get("not_before") or ""
+
+
+def is_due(entry: Dict[str, Any], now: datetime) -> bool:
+    """Whether a retry entry may be scraped at now; entries without not_before are due."""
+    return retry_at(entry) <= now.isoformat()
+
+
+class RetryPolicy:
+    """Exponential backoff and dead-lettering per error class."""
+
+    def __init__(self, config: Optional[Mapping[str, Any]] = None):
+        config = dict(config or {})
+        self.defaults = {key: value for key, value in DEFAULT_RETRY_CONFIG.items() if key != "error_classes"}
+        self.defaults.update({key: value for key, value in config.items() if key != "error_classes"})
+        self.error_classes: Dict[str, Dict[str, Any]] = {
+            name: dict(overrides) for name, overrides in DEFAULT_RETRY_CONFIG["error_classes"].items()
+        }
+        for name, overrides in (config.get("error_classes") or {}).items():
+            self.error_classes.setdefault(name, {}).update(overrides)
+        self.batch_share = float(self.defaults["batch_share"])
+
+    def setting(self, error_class: str, key: str) -> Any:
+        return self.error_classes.get(error_class, {}).get(key, self.defaults[key])
+
+    def delay(self, attempts: int, error_class: str) -> timedelta:
+        """Wait after the given number of failures: base * 2^(attempts - 1), capped at max_delay_hours."""
+        minutes = float(self.setting(error_class, "base_delay_minutes")) * 2 ** min(max(attempts - 1, 0), 30)
+        return min(timedelta(minutes=minutes), timedelta(hours=float(self.setting(error_class, "max_delay_hours"))))
+
+    def next_attempt(self, attempts: int, error_class: str, now: Optional[datetime] = None) -> Optional[datetime]:
+        """When to retry after the given number of failures, or None once the entry should be dead-lettered."""
+        if attempts >= int(self.setting(error_class, "max_attempts")):
+            return None
+        return (now or datetime.now()) + self.delay(attempts, error_class)
+
+    def retry_slots(self, batch_size: int) -> int:
+        """Share of a batch given to due retries."""
+        if self.batch_share <= 0:
+            return 0
+        return max(1, int(round(batch_size * self.batch_share)))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Shard Manifest with Constant-Time URL Membership
+
+The manifest maps each shard key to the URLs whose products go into that
+shard. On disk it stays the same JSON object of lists (llms-<site>-manifest.json,
+keys sorted). In memory each list is a ShardUrls: an insertion-ordered set
+backed by a dict. `in`, append() and remove() are O(1), so adding or
+removing thousands of URLs in one shard is linear instead of quadratic.
+
+ShardUrls keeps the list methods the updater already relies on (append,
+remove, len, iteration in insertion order, comparing equal to a list with
+the same order), so existing call sites work unchanged.
+
+The updater's manifest is derived from the URL index (see product_store.py),
+which keeps it current through place() and drop(). Those also maintain a
+URL -> shard map, so moving a URL to another shard is O(1) as well.
+"""
+
+from typing import Dict, Iterable, Iterator, List, MutableMapping, Optional
+
+
+class ShardUrls:
+    """Insertion-ordered set of URLs with list-style append/remove."""
+
+    __slots__ = ("_urls",)
+
+    def __init__(self, urls: Optional[Iterable[str]] = None):
+        self._urls: Dict[str, None] = dict.fromkeys(urls or ())
+
+    def append(self, url: str) -> None:
+        """Add url at the end; a URL already present keeps its position."""
+        self._urls[url] = None
+
+    add = append
+
+    def remove(self, url: str) -> None:
+        """Remove url; raises ValueError when absent, like list.remove."""
+        try:
+            del self._urls[url]
+        except KeyError:
+            raise ValueError(f"{url} not in shard") from None
+
+    def discard(self, url: str) -> None:
+        self._urls.pop(url, None)
+
+    def __contains__(self, url: object) -> bool:
+        return url in self._urls
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._urls)
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ShardUrls):
+            return list(self._urls) == list(other._urls)
+        if isinstance(other, list):
+            return list(self._urls) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ShardUrls({list(self._urls)!r})"
+
+
+class ShardManifest(MutableMapping):
+    """shard key -> ShardUrls; plain lists assigned in are converted."""
+
+    def __init__(self, data: Optional[Dict[str, Iterable[str]]] = None):
+        self._shards: Dict[str, ShardUrls] = {}
+        self._shard_of: Dict[str, str] = {}
+        for shard_key, urls in (data or {}).items():
+            self[shard_key] = urls
+
+    def __getitem__(self, shard_key: str) -> ShardUrls:
+        return self._shards[shard_key]
+
+    def __setitem__(self, shard_key: str, urls: Iterable[str]) -> None:
+        if shard_key in self._shards:
+            del self[shard_key]
+        urls = urls if isinstance(urls, ShardUrls) else ShardUrls(urls)
+        self._shards[shard_key] = urls
+        for url in urls:
+            self._shard_of[url] = shard_key
+
+    def __delitem__(self, shard_key: str) -> None:
+        for url in self._shards.pop(shard_key):
+            if self._shard_of.get(url) == shard_key:
+                del self._shard_of[url]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._shards)
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def setdefault(self, shard_key: str, urls: Iterable[str] = ()) -> ShardUrls:
+        # MutableMapping.setdefault would return the unconverted default
+        if shard_key not in self._shards:
+            self[shard_key] = urls
+        return self._shards[shard_key]
+
+    def shard_of(self, url: str) -> Optional[str]:
+        """The shard url was last placed in (None if it is in no shard)."""
+        return self._shard_of.get(url)
+
+    def place(self, url: str, shard_key: Optional[str]) -> None:
+        """List url under shard_key only, moving it out of its previous shard."""
+        previous = self._shard_of.get(url)
+        if previous == shard_key and (previous is None or url in self._shards.get(previous, ())):
+            return
+        self.drop(url)
+        if shard_key is None:
+            return
+        self.setdefault(shard_key).append(url)
+        self._shard_of[url] = shard_key
+
+    def drop(self, url: str) -> None:
+        """Remove url from the manifest, deleting its shard if that empties it."""
+        shard_key = self._shard_of.pop(url, None)
+        if shard_key is None or shard_key not in self._shards:
+            return
+        urls = self._shards[shard_key]
+        urls.discard(url)
+        if not urls:
+            del self._shards[shard_key]
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """The on-disk form: shard key -> list of URLs in insertion order."""
+        return {shard_key: list(urls) for shard_key, urls in self._shards.items()}
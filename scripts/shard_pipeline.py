@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Streaming Shard Writes for Long Scrape Runs
+
+Without a pipeline the updater scrapes everything first and only then writes
+the touched shard files and the index. With --pipeline, results are
+handed to a ShardPipeline as they are applied:
+
+  - a shard is flushed in the background once flush_every new products have
+    landed in it (and every dirty shard is flushed at the end, or whenever
+    the caller needs its results on disk, see drain());
+  - the index is checkpointed every checkpoint_every products (skipped when
+    the index store or journal already makes every write durable);
+  - the writer thread works from a bounded job queue, so when it falls behind
+    the scraping thread blocks instead of piling up snapshots in memory.
+
+Snapshots (the shard's records and the shard names its files must not be
+confused with) are taken on the calling thread, so the writer never reads
+the live url_index while it is being updated.
+
+Pipeline settings are configured per site in config/site_configs.json:
+
+  "pipeline": {
+    "flush_every": 25,
+    "checkpoint_every": 100,
+    "max_pending": 4
+  }
+"""
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from shard_writer import ShardChanges
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PIPELINE_CONFIG: Dict[str, Any] = {
+    "flush_every": 25,
+    "checkpoint_every": 100,
+    "max_pending": 4,
+}
+
+_STOP = object()
+
+
+class ShardPipeline:
+    """Flushes dirty shards and index checkpoints on a background thread while scraping continues."""
+
+    def __init__(
+        self,
+        snapshot_shard: Callable[[str], Tuple[Any, ...]],
+        write_shard: Callable[..., ShardChanges],
+        snapshot_index: Callable[[], Optional[Dict[str, Any]]],
+        save_index: Callable[[Dict[str, Any]], None],
+        flush_every: int = DEFAULT_PIPELINE_CONFIG["flush_every"],
+        checkpoint_every: int = DEFAULT_PIPELINE_CONFIG["checkpoint_every"],
+        max_pending: int = DEFAULT_PIPELINE_CONFIG["max_pending"],
+    ):
+        self.snapshot_shard = snapshot_shard
+        self.write_shard = write_shard
+        self.snapshot_index = snapshot_index
+        self.save_index = save_index
+        self.flush_every = max(int(flush_every), 1)
+        self.checkpoint_every = max(int(checkpoint_every), 1)
+
+        self.changes = ShardChanges()
+        self.shard_flushes = 0
+        self.checkpoints = 0
+        self._dirty: Dict[str, int] = {}
+        self._recorded = 0
+        self._since_checkpoint = 0
+        self._error: Optional[BaseException] = None
+        self._jobs: "queue.Queue[Any]" = queue.Queue(maxsize=max(int(max_pending), 1))
+        self._thread = threading.Thread(target=self._run, name="shard-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is _STOP:
+                    return
+                kind, args = job
+                if kind == "shard":
+                    self.changes.merge(self.write_shard(*args))
+                    self.shard_flushes += 1
+                else:
+                    self.save_index(*args)
+                    self.checkpoints += 1
+            except BaseException as exc:  # surfaced on the calling thread by _raise_if_failed/finish
+                logger.error(f"Background shard writer failed: {exc}")
+                if self._error is None:
+                    self._error = exc
+            finally:
+                self._jobs.task_done()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("Background shard writer failed") from self._error
+
+    def _submit(self, kind: str, args: Tuple[Any, ...]) -> None:
+        self._raise_if_failed()
+        # Blocks while max_pending jobs are waiting: backpressure on the scraper
+        self._jobs.put((kind, args))
+
+    def flush_shard(self, shard_key: str) -> None:
+        # snapshot_shard returns (urls, entries, *extra); all of it is passed on to write_shard
+        snapshot = self.snapshot_shard(shard_key)
+        self._dirty.pop(shard_key, None)
+        if snapshot[0]:
+            self._submit("shard", (shard_key, *snapshot))
+
+    def checkpoint(self) -> None:
+        self._since_checkpoint = 0
+        url_index = self.snapshot_index()
+        if url_index is not None:
+            self._submit("index", (url_index,))
+
+    def record(self, shard_key: str) -> None:
+        """Note one applied product; flushes its shard / checkpoints the index when due."""
+        self._dirty[shard_key] = self._dirty.get(shard_key, 0) + 1
+        self._recorded += 1
+        self._since_checkpoint += 1
+        if self._dirty[shard_key] >= self.flush_every:
+            self.flush_shard(shard_key)
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def drain(self) -> None:
+        """Flush every dirty shard and checkpoint the index, then wait until the writer has done it all."""
+        for shard_key in sorted(self._dirty):
+            self.flush_shard(shard_key)
+        self.checkpoint()
+        self._jobs.join()
+        self._raise_if_failed()
+
+    def finish(self, flush: bool = True) -> ShardChanges:
+        """
+        Flush every dirty shard and a final checkpoint, stop the writer and
+        return the shard files written, added and deleted across all flushes.
+        """
+        try:
+            if flush and self._error is None and self._recorded:
+                for shard_key in sorted(self._dirty):
+                    self.flush_shard(shard_key)
+                self.checkpoint()
+        finally:
+            self._jobs.put(_STOP)
+            self._thread.join()
+        self._raise_if_failed()
+        logger.info(
+            f"Shard pipeline wrote {self.shard_flushes} shard flushes and {self.checkpoints} index checkpoints"
+        )
+        return self.changes
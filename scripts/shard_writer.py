@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+Incremental Shard File Writer
+
+Shard files (llms-<site>-<shard>.txt, or llms-<site>-<shard>_<n>.txt once a
+shard is split at max_characters) are generated from the URL index. Each
+product is one block, sorted by URL:
+
+  <|https://example.com/products/widget|>
+  ## Widget
+
+  {...product JSON...}
+
+The writer keeps a small layout per shard in .shard-layout/<shard>.json:
+the chunk files in order, and for each one the URLs it holds with a
+fingerprint and size of each rendered block. A write then only has to:
+
+  - render the shard's blocks from the index (no shard files are read);
+  - route each URL to the chunk whose URL range holds it;
+  - rewrite the chunks whose (URL, fingerprint) list changed, re-splitting
+    only a chunk that outgrew max_characters;
+  - rename chunks whose _<n> number moved, and delete emptied ones.
+
+Without a layout (first write after an upgrade, or max_characters changed)
+the shard is repacked. Any chunk whose bytes already match the file on disk
+is left alone, in either case. write() returns a ShardChanges that lists
+exactly the files written, added and deleted.
+
+File names are matched exactly (<shard>.txt and <shard>_<n>.txt), so a
+shard never picks up another shard that shares its prefix.
+
+Next to each chunk file the writer keeps a sidecar index (same name, .idx)
+mapping every URL in the file to the byte offset and length of its block:
+
+  #llms-idx 1 <size of the .txt in bytes>
+  https://example.com/products/widget<TAB>0<TAB>412
+  ...
+
+read_block() seeks straight to one product. A sidecar whose size no longer
+matches its .txt (the file was edited by hand) is ignored.
+
+Chunking modes, configured per site in config/site_configs.json:
+
+  "chunking": {
+    "mode": "greedy",           # or "content_defined"
+    "min_ratio": 0.25,          # content_defined: min chunk size / max_characters
+    "target_ratio": 0.5         # content_defined: expected chunk size / max_characters
+  }
+
+"greedy" fills each chunk up to max_characters. When a chunk has to be
+re-split, every chunk after it is renumbered, and each renamed file counts
+as a new document in the knowledge base sync.
+
+"content_defined" cuts a chunk after a product whose URL hash falls below
+a threshold. The threshold scales with the product's block size, so chunks
+average target_ratio * max_characters. Cuts are skipped until a chunk
+reaches min_ratio * max_characters, and a cut is forced at max_characters.
+A boundary depends only on the products around it, so an insert, edit or
+removal changes the chunk that holds the product, and occasionally a
+neighbour. Each new chunk keeps the file name of the old chunk it shares
+the most products with. A chunk that has no such file gets the lowest
+free _<n> number. File numbers then follow chunk identity rather than URL
+order, and an edit never renames the other files.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import Counter
+from typing import Any, Container, Dict, List, Optional, Tuple
+
+from product_store import record_text
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_DIR = ".shard-layout"
+
+DEFAULT_CHUNKING_CONFIG: Dict[str, Any] = {
+    "mode": "greedy",
+    "min_ratio": 0.25,
+    "target_ratio": 0.5,
+}
+
+CHUNKING_MODES = ("greedy", "content_defined")
+
+_MARKER = re.compile(r"^<\|(.+)\|>$", re.MULTILINE)
+
+
+def render_block(url: str, record: Dict[str, Any]) -> str:
+    """One product's block in a shard file."""
+    block = f"<|{url}|>\n## {record.get('title', 'Product')}\n\n{record_text(record)}"
+    if not block.endswith('\n\n'):
+        block += '\n\n'
+    return block
+
+
+def parse_blocks(text: str) -> Dict[str, Tuple[str, str]]:
+    """url -> (title, markdown) for every block in a shard file's text."""
+    products = {}
+    starts = [(match.start(), match.group(1)) for match in _MARKER.finditer(text)]
+    for i, (start, url) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+        body = text[start:end].split('\n', 1)[1] if '\n' in text[start:end] else ""
+        title = ""
+        if body.startswith("## "):
+            title_line, _, body = body.partition('\n')
+            title = title_line[3:]
+            if body.startswith('\n'):
+                body = body[1:]
+        products[url] = (title, body)
+    return products
+
+
+def _fingerprint(block: str) -> str:
+    return hashlib.sha1(block.encode('utf-8')).hexdigest()[:16]
+
+
+def _same_contents(path: str, data: bytes) -> bool:
+    """True when the file at path already holds exactly data."""
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+SIDECAR_HEADER = "#llms-idx 1"
+
+
+def sidecar_path(shard_path: str) -> str:
+    """The .idx sidecar of a shard file."""
+    return os.path.splitext(shard_path)[0] + ".idx"
+
+
+def _sidecar_bytes(urls: List[str], encoded: List[bytes]) -> bytes:
+    lines = [f"{SIDECAR_HEADER} {sum(len(block) for block in encoded)}\n"]
+    offset = 0
+    for url, block in zip(urls, encoded):
+        lines.append(f"{url}\t{offset}\t{len(block)}\n")
+        offset += len(block)
+    return ''.join(lines).encode('utf-8')
+
+
+def load_sidecar(shard_path: str) -> Optional[Dict[str, Tuple[int, int]]]:
+    """url -> (byte offset, length) for a shard file, or None if it has no current sidecar."""
+    try:
+        with open(sidecar_path(shard_path), 'r', encoding='utf-8') as f:
+            header = f.readline().split()
+            if header[:2] != SIDECAR_HEADER.split() or int(header[2]) != os.path.getsize(shard_path):
+                return None
+            entries = {}
+            for line in f:
+                url, offset, length = line.rstrip('\n').split('\t')
+                entries[url] = (int(offset), int(length))
+            return entries
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def read_block(shard_path: str, url: str, sidecar: Optional[Dict[str, Tuple[int, int]]] = None) -> Optional[str]:
+    """One product's block from a shard file via its sidecar (None if absent or not indexed)."""
+    sidecar = load_sidecar(shard_path) if sidecar is None else sidecar
+    if not sidecar or url not in sidecar:
+        return None
+    offset, length = sidecar[url]
+    with open(shard_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length).decode('utf-8')
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remove_if_exists(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _url_hash(url: str) -> float:
+    """Stable hash of url in [0, 1)."""
+    return int(hashlib.sha1(url.encode('utf-8')).hexdigest()[:13], 16) / float(1 << 52)
+
+
+class ShardChanges:
+    """
+    Shard files a write changed: written (existing path overwritten), added
+    (new path) and deleted. merge() folds later writes in, so a file added
+    and then deleted in the same run drops out.
+    """
+
+    def __init__(self):
+        self._changes: Dict[str, str] = {}
+
+    def record_write(self, path: str, existed: bool = True) -> None:
+        previous = self._changes.get(path)
+        if previous == "added" or (previous is None and not existed):
+            self._changes[path] = "added"
+        else:
+            self._changes[path] = "written"
+
+    def record_delete(self, path: str) -> None:
+        if self._changes.get(path) == "added":
+            del self._changes[path]
+        else:
+            self._changes[path] = "deleted"
+
+    def merge(self, other: "ShardChanges") -> "ShardChanges":
+        for path, change in other._changes.items():
+            if change == "deleted":
+                self.record_delete(path)
+            else:
+                self.record_write(path, existed=change == "written")
+        return self
+
+    def _paths(self, kind: str) -> List[str]:
+        return [path for path, change in self._changes.items() if change == kind]
+
+    @property
+    def written(self) -> List[str]:
+        return self._paths("written")
+
+    @property
+    def added(self) -> List[str]:
+        return self._paths("added")
+
+    @property
+    def deleted(self) -> List[str]:
+        return self._paths("deleted")
+
+    @property
+    def paths(self) -> List[str]:
+        """Every file with new contents (written or added), in write order."""
+        return [path for path, change in self._changes.items() if change != "deleted"]
+
+    def __bool__(self) -> bool:
+        return bool(self._changes)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """The fields operation results report: written_files also lists the added ones."""
+        return {"written_files": self.paths, "added_files": self.added, "deleted_files": self.deleted}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ShardChanges":
+        """Rebuild from to_dict() output (or an operation result carrying the same fields)."""
+        changes = cls()
+        added = set(data.get("added_files") or ())
+        for path in data.get("written_files") or ():
+            changes.record_write(path, existed=path not in added)
+        for path in data.get("deleted_files") or ():
+            changes.record_delete(path)
+        return changes
+
+
+class ShardWriter:
+    """Writes a shard's chunk files from index records, touching only chunks that changed."""
+
+    def __init__(
+        self, output_dir: str, site_name: str, max_characters: int, chunking: Optional[Dict[str, Any]] = None
+    ):
+        self.output_dir = output_dir
+        self.site_name = site_name
+        self.max_characters = max_characters
+        self.layout_dir = os.path.join(output_dir, LAYOUT_DIR)
+
+        self.chunking = dict(DEFAULT_CHUNKING_CONFIG)
+        self.chunking.update(chunking or {})
+        if self.chunking["mode"] not in CHUNKING_MODES:
+            raise ValueError(f"Unknown chunking mode: {self.chunking['mode']}")
+        self.min_characters = int(max_characters * self.chunking["min_ratio"])
+        # Characters expected past min_characters before a breakpoint, so chunks average the target
+        self.breakpoint_characters = max(int(max_characters * self.chunking["target_ratio"]) - self.min_characters, 1)
+
+    # ------------------------------------------------------------------ files
+
+    def _file_name(self, shard_key: str, part: Optional[int] = None) -> str:
+        suffix = "" if part is None else f"_{part}"
+        return f"llms-{self.site_name}-{shard_key}{suffix}.txt"
+
+    def _part_files(self, shard_key: str) -> List[Tuple[Optional[str], str]]:
+        """(part number or None, file name) of every <shard>.txt / <shard>_<n>.txt on disk."""
+        pattern = re.compile(
+            rf"^llms-{re.escape(self.site_name)}-{re.escape(shard_key)}(?:_(\d+))?\.txt$"
+        )
+        try:
+            names = os.listdir(self.output_dir)
+        except FileNotFoundError:
+            return []
+        found = []
+        for name in names:
+            match = pattern.match(name)
+            if match:
+                found.append((match.group(1), name))
+        return found
+
+    def shard_files(self, shard_key: str, exclude: Container[str] = ()) -> List[str]:
+        """
+        Existing files of a shard: <shard>.txt and <shard>_<n>.txt in chunk
+        order. A <shard>_<n>.txt that belongs to a shard named in exclude is
+        skipped.
+        """
+        found = []
+        for part, name in self._part_files(shard_key):
+            if part is not None and f"{shard_key}_{part}" in exclude:
+                continue
+            found.append((int(part or 0), name))
+        return [os.path.join(self.output_dir, name) for _, name in sorted(found)]
+
+    def numbered_names(self, shard_key: str) -> List[str]:
+        """
+        "<shard>_<n>" for each <shard>_<n>.txt on disk: the shard keys those
+        files would have if they belonged to a separate shard (see shard_files' exclude).
+        """
+        return sorted(f"{shard_key}_{part}" for part, _ in self._part_files(shard_key) if part is not None)
+
+    def read_products(self, shard_key: str, exclude: Container[str] = ()) -> Dict[str, Tuple[str, str]]:
+        """url -> (title, markdown) parsed from the shard's existing files."""
+        products: Dict[str, Tuple[str, str]] = {}
+        for path in self.shard_files(shard_key, exclude):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    products.update(parse_blocks(f.read()))
+            except OSError as e:
+                logger.warning(f"Failed to read shard file {path}: {e}")
+        return products
+
+    def locate(self, shard_key: str, url: str) -> Optional[Tuple[str, int, int]]:
+        """(shard file, byte offset, length) of url's block, found via the layout and sidecar."""
+        chunks = self._load_layout(shard_key)
+        if not chunks:
+            return None
+        starts = [chunk["urls"][0][0] for chunk in chunks]
+        chunk = chunks[max(bisect.bisect_right(starts, url) - 1, 0)]
+        path = os.path.join(self.output_dir, chunk["file"])
+        entry = (load_sidecar(path) or {}).get(url)
+        return (path, entry[0], entry[1]) if entry else None
+
+    def read_product(self, shard_key: str, url: str) -> Optional[str]:
+        """url's block as written in the shard, read with a single seek (None if absent)."""
+        location = self.locate(shard_key, url)
+        if location is None:
+            return None
+        path, offset, length = location
+        return read_block(path, url, {url: (offset, length)})
+
+    # ----------------------------------------------------------------- layout
+
+    def _layout_path(self, shard_key: str) -> str:
+        return os.path.join(self.layout_dir, f"{shard_key}.json")
+
+    def has_layout(self, shard_key: str) -> bool:
+        return os.path.exists(self._layout_path(shard_key))
+
+    def _load_layout(self, shard_key: str) -> Optional[List[Dict[str, Any]]]:
+        """The shard's chunks, or None when they must be rebuilt."""
+        try:
+            with open(self._layout_path(shard_key), 'r', encoding='utf-8') as f:
+                layout = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if layout.get("max_characters") != self.max_characters:
+            return None
+        chunks = layout.get("chunks") or []
+        if not chunks:
+            return None
+        for chunk in chunks:
+            if not chunk.get("urls") or not os.path.exists(os.path.join(self.output_dir, chunk["file"])):
+                return None
+        return chunks
+
+    def _save_layout(self, shard_key: str, chunks: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.layout_dir, exist_ok=True)
+        path = self._layout_path(shard_key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"max_characters": self.max_characters, "chunks": chunks}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _drop_layout(self, shard_key: str) -> None:
+        try:
+            os.remove(self._layout_path(shard_key))
+        except FileNotFoundError:
+            pass
+
+    # ---------------------------------------------------------------- packing
+
+    def _pack(self, urls: List[str], sizes: Dict[str, int]) -> List[List[str]]:
+        """Greedily fill chunks up to max_characters, in URL order."""
+        groups: List[List[str]] = []
+        current: List[str] = []
+        current_chars = 0
+        for url in urls:
+            if current and current_chars + sizes[url] > self.max_characters:
+                groups.append(current)
+                current, current_chars = [], 0
+            current.append(url)
+            current_chars += sizes[url]
+        if current:
+            groups.append(current)
+        return groups
+
+    def _pack_content_defined(self, urls: List[str], sizes: Dict[str, int]) -> List[List[str]]:
+        """
+        Cut after a URL whose hash falls below its block's share of
+        breakpoint_characters, once the chunk holds min_characters; force a
+        cut before max_characters is exceeded.
+        """
+        groups: List[List[str]] = []
+        current: List[str] = []
+        current_chars = 0
+        for url in urls:
+            if current and current_chars + sizes[url] > self.max_characters:
+                groups.append(current)
+                current, current_chars = [], 0
+            current.append(url)
+            current_chars += sizes[url]
+            if current_chars >= self.min_characters and _url_hash(url) < sizes[url] / self.breakpoint_characters:
+                groups.append(current)
+                current, current_chars = [], 0
+        if current:
+            groups.append(current)
+        return groups
+
+    def _stable_targets(
+        self, shard_key: str, chunks: Optional[List[Dict[str, Any]]], groups: List[List[str]]
+    ) -> List[str]:
+        """
+        File name per group: the old chunk file holding most of the group's
+        URLs (largest overlaps claim first), else the lowest free _<n>.
+        """
+        if len(groups) == 1:
+            return [self._file_name(shard_key)]
+        single = self._file_name(shard_key)
+        owner = {entry[0]: chunk["file"] for chunk in chunks or [] for entry in chunk["urls"]}
+        claims = []
+        for i, group in enumerate(groups):
+            overlap = Counter(owner[url] for url in group if url in owner)
+            claims.extend((-count, i, name) for name, count in overlap.items() if name != single)
+
+        targets: List[Optional[str]] = [None] * len(groups)
+        taken = set()
+        for _, i, name in sorted(claims):
+            if targets[i] is None and name not in taken:
+                targets[i] = name
+                taken.add(name)
+
+        part = 0
+        for i, target in enumerate(targets):
+            if target is None:
+                part += 1
+                while self._file_name(shard_key, part) in taken:
+                    part += 1
+                targets[i] = self._file_name(shard_key, part)
+        return targets
+
+    def _regroup(
+        self, chunks: List[Dict[str, Any]], urls: List[str], fingerprints: Dict[str, str], sizes: Dict[str, int]
+    ) -> List[Tuple[List[str], Optional[str]]]:
+        """
+        Route URLs into the existing chunks by URL range. Returns (urls, file)
+        per chunk, where file is the chunk's current file when its contents
+        are unchanged and None when it has to be written.
+        """
+        starts = [chunk["urls"][0][0] for chunk in chunks]
+        members: List[List[str]] = [[] for _ in chunks]
+        for url in urls:
+            members[max(bisect.bisect_right(starts, url) - 1, 0)].append(url)
+
+        groups: List[Tuple[List[str], Optional[str]]] = []
+        for chunk, chunk_urls in zip(chunks, members):
+            previous = [(entry[0], entry[1]) for entry in chunk["urls"]]
+            if previous == [(url, fingerprints[url]) for url in chunk_urls]:
+                groups.append((chunk_urls, chunk["file"]))
+                continue
+            for group in self._pack(chunk_urls, sizes):
+                groups.append((group, None))
+        return groups
+
+    # ---------------------------------------------------------------- writing
+
+    def write(
+        self,
+        shard_key: str,
+        urls: List[str],
+        url_index: Dict[str, Dict[str, Any]],
+        exclude: Container[str] = (),
+    ) -> ShardChanges:
+        """
+        Bring the shard's files in line with the index records for urls.
+        Files whose contents would not change are left alone; the returned
+        ShardChanges lists exactly the files written, added and deleted.
+        """
+        blocks = {url: render_block(url, url_index[url]) for url in urls if url in url_index}
+        ordered = sorted(blocks)
+        sizes = {url: len(block) for url, block in blocks.items()}
+        fingerprints = {url: _fingerprint(block) for url, block in blocks.items()}
+        encoded = {url: block.encode('utf-8') for url, block in blocks.items()}
+
+        chunks = self._load_layout(shard_key)
+        if chunks is None:
+            old_files = self.shard_files(shard_key, exclude)
+        else:
+            old_files = [os.path.join(self.output_dir, chunk["file"]) for chunk in chunks]
+
+        if self.chunking["mode"] == "content_defined":
+            previous_files = {
+                tuple((entry[0], entry[1]) for entry in chunk["urls"]): chunk["file"] for chunk in chunks or []
+            }
+            groups = [
+                (group, previous_files.get(tuple((url, fingerprints[url]) for url in group)))
+                for group in self._pack_content_defined(ordered, sizes)
+            ]
+            targets = self._stable_targets(shard_key, chunks, [group for group, _ in groups])
+        else:
+            if chunks is None:
+                groups = [(group, None) for group in self._pack(ordered, sizes)]
+            else:
+                groups = self._regroup(chunks, ordered, fingerprints, sizes)
+            if len(groups) == 1:
+                targets = [self._file_name(shard_key)]
+            else:
+                targets = [self._file_name(shard_key, i) for i in range(1, len(groups) + 1)]
+
+        target_paths = [os.path.join(self.output_dir, target) for target in targets]
+        existed = {path for path in target_paths if os.path.exists(path)}
+        changes = ShardChanges()
+
+        # Move unchanged chunks out of the way first so renaming can't clobber them
+        moving = []
+        for (group, source), path in zip(groups, target_paths):
+            source_path = os.path.join(self.output_dir, source) if source is not None else None
+            if source_path is not None and source_path != path:
+                os.replace(source_path, f"{source_path}.moving")
+                moving.append((f"{source_path}.moving", path))
+
+        for (group, source), path in zip(groups, target_paths):
+            if source is not None:
+                continue
+            data = b''.join(encoded[url] for url in group)
+            if _same_contents(path, data):
+                # e.g. first write after an upgrade, or a re-scrape that returned the same product
+                continue
+            _write_bytes(path, data)
+            changes.record_write(path, existed=path in existed)
+            logger.info(
+                f"Wrote shard file: {os.path.basename(path)} "
+                f"({len(group)} products, {sum(sizes[url] for url in group)} characters)"
+            )
+
+        for moving_path, path in moving:
+            os.replace(moving_path, path)
+            changes.record_write(path, existed=path in existed)
+
+        for path in old_files:
+            if path in target_paths:
+                continue
+            if os.path.exists(path):
+                os.remove(path)
+                logger.debug(f"Removed old shard file: {os.path.basename(path)}")
+            _remove_if_exists(sidecar_path(path))
+            changes.record_delete(path)
+
+        # Sidecars follow their chunk files (cheap to compare, so checked for every chunk)
+        for (group, _), path in zip(groups, target_paths):
+            index_data = _sidecar_bytes(group, [encoded[url] for url in group])
+            if not _same_contents(sidecar_path(path), index_data):
+                _write_bytes(sidecar_path(path), index_data)
+
+        new_chunks = [
+            {"file": target, "urls": [[url, fingerprints[url], sizes[url]] for url in group]}
+            for (group, _), target in zip(groups, targets)
+        ]
+        if not groups:
+            self._drop_layout(shard_key)
+        elif new_chunks != chunks:
+            self._save_layout(shard_key, new_chunks)
+
+        unchanged = len(groups) - len(changes.paths)
+        if unchanged:
+            logger.debug(f"Shard '{shard_key}': {unchanged} of {len(groups)} chunk files unchanged")
+        return changes
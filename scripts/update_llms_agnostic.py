@@ -20,9 +20,13 @@ import sys
 import json
 import time
 import argparse
+import heapq
 import logging
 import re
-from typing import Dict, List, Optional, Set, Any
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Deque, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Any, Tuple
 from urllib.parse import urlparse, urljoin, urlunparse, parse_qs, urlencode
 import requests
 from datetime import datetime
@@ -30,6 +34,26 @@ from datetime import datetime
 # Add the scripts directory to the path to import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from site_config_manager import SiteConfigManager
+from http_client import PooledHTTPClient
+from index_journal import DEFAULT_JOURNAL_CONFIG, IndexJournal, append_entries, read_entries
+import json_storage
+from json_storage import COMPRESSIONS, write_json_atomic
+from product_store import (
+    ProductStore, changed_fields, content_fields, open_product_store, record_shard, write_index_json,
+)
+from queue_priority import (
+    DEFAULT_PRIORITY_WEIGHTS, PRIORITIES, RESCRAPE_PRIORITIES, entry_priority, outranks, plan_batch,
+    staleness_key,
+)
+from response_cache import DEFAULT_CACHE_CONFIG, ResponseCache
+from retry_policy import (
+    DEFAULT_RETRY_CONFIG, RetryPolicy, error_class_for_exception, error_class_for_status, is_due, retry_at,
+)
+from shard_manifest import ShardManifest
+from shard_pipeline import DEFAULT_PIPELINE_CONFIG, ShardPipeline
+from shard_writer import CHUNKING_MODES, ShardChanges, ShardWriter
+from work_queue import DEFAULT_LEASE_SECONDS, SqliteWorkQueue
+from rate_limiter import DEFAULT_RATE_LIMIT, get_rate_limiter
 
 # Configure logging
 logging.basicConfig(
@@ -39,136 +63,430 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# JSON extraction schema for product pages (shared by /scrape and /batch/scrape)
+PRODUCT_JSON_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "product_name": {
+            "type": "string",
+            "description": "The name/title of the product"
+        },
+        "description": {
+            "type": "string",
+            "description": "The main product description"
+        },
+        "price": {
+            "type": "string",
+            "description": "The current price of the product (including currency symbol)"
+        },
+        "availability": {
+            "type": "string",
+            "description": "Product availability status (e.g., 'In Stock', 'Out of Stock')"
+        },
+        "specifications": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Key product specifications or features"
+        }
+    },
+    "required": ["product_name", "description", "price"]
+}
+
+
+DEFAULT_QUEUE_CONFIG: Dict[str, Any] = {
+    "backend": "json",
+    "compact_every": 1000,
+    "lease_seconds": DEFAULT_LEASE_SECONDS,
+    "priority_weights": DEFAULT_PRIORITY_WEIGHTS,
+    "retry": DEFAULT_RETRY_CONFIG,
+}
+
+
 class PendingQueue:
-    """Persistent FIFO queue for pending product URLs."""
+    """
+    Persistent priority queue for pending product URLs.
+
+    Each priority class (see queue_priority.py) has its own lane: a deque
+    for realtime, discovery and backfill, and a heap ordered by staleness
+    for refresh. dequeue_batch() fills a batch from the lanes according to
+    plan_batch(). _index maps each normalized URL to its live entry, so
+    enqueue, dequeue and membership are O(1) (O(log n) for refresh).
+    Pruned entries stay in their lane as tombstones (no longer mapped in
+    _index), are skipped when reached, and are compacted away once they make
+    up half the stored entries.
+
+    On disk the queue is a {"pending": [...]} snapshot plus a journal next
+    to it (pending-queue.journal.jsonl) holding the operations since:
+
+      {"op": "enqueue", "entry": {...}}   new URL at the tail
+      {"op": "fail", "entry": {...}}      entry re-added after a failure
+      {"op": "ack", "url": "..."}         URL dequeued or pruned
+
+    save() appends the operations made since the last save, so its cost
+    follows the number of changes, not the queue length. The first save (or
+    the first after a compression change) writes the snapshot instead. Load replays the
+    journal over the snapshot. Once the journal holds more lines than
+    max(compact_every, queue length) the snapshot is rewritten and the
+    journal dropped, which keeps compaction amortized O(1) per operation.
+    """
 
-    def __init__(self, path: str):
+    def __init__(
+        self,
+        path: str,
+        compression: str = "none",
+        compact_every: int = 1000,
+        weights: Optional[Dict[str, float]] = None,
+    ):
         self.path = path
-        self.items: List[Dict[str, Any]] = []
-        self._index: Dict[str, int] = {}
+        self.compression = compression
+        self.compact_every = compact_every
+        self.weights = dict(weights or DEFAULT_PRIORITY_WEIGHTS)
+        self.journal_path = f"{os.path.splitext(path)[0]}.journal.jsonl"
+        self._index: Dict[str, Dict[str, Any]] = {}
+        # Operations not yet appended to the journal, and lines already in it
+        self._ops: List[Dict[str, Any]] = []
+        self._journal_entries = 0
         self._load()
 
+    def _reset(self):
+        self._lanes: Dict[str, Deque[Dict[str, Any]]] = {p: deque() for p in PRIORITIES if p != "refresh"}
+        self._refresh: List[Tuple[str, int, Dict[str, Any]]] = []
+        self._counts: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._seq = 0
+        self._stored = 0
+        self._tombstones = 0
+
     def _load(self):
-        if not os.path.exists(self.path):
-            self.items = []
-            self._rebuild_index()
-            return
+        self._reset()
+        self._index = {}
+        self._ops = []
+        if json_storage.exists(self.path):
+            try:
+                data = json_storage.read_json(self.path)
+                entries = data.get("pending", []) if isinstance(data, dict) else []
+            except Exception as exc:  # pragma: no cover - defensive, should not happen often
+                logger.warning(f"Failed to load pending queue from {self.path}: {exc}")
+                entries = []
+            for entry in entries:
+                normalized = entry.get("normalized_url")
+                if normalized:
+                    previous = self._index.get(normalized)
+                    if previous is not None:
+                        # Duplicate URL in the file: keep the last copy, as before
+                        self._tombstones += 1
+                        self._counts[entry_priority(previous)] -= 1
+                    self._index[normalized] = entry
+                self._push(entry)
+
+        journal = read_entries(self.journal_path)
+        for op in journal:
+            if op["op"] == "ack":
+                self._discard(op["url"])
+            else:
+                self._append(op["entry"])
+        self._journal_entries = len(journal)
+        if journal:
+            logger.info(f"Replayed {len(journal)} queue operations from {os.path.basename(self.journal_path)}")
+
+    def _push(self, entry: Dict[str, Any]):
+        priority = entry_priority(entry)
+        if priority == "refresh":
+            heapq.heappush(self._refresh, (staleness_key(entry), self._seq, entry))
+        else:
+            self._lanes[priority].append(entry)
+        self._seq += 1
+        self._stored += 1
+        self._counts[priority] += 1
+
+    def _pop(self, priority: str) -> Optional[Dict[str, Any]]:
+        """Next live entry of a class, dropping tombstones on the way."""
+        while True:
+            if priority == "refresh":
+                if not self._refresh:
+                    return None
+                entry = heapq.heappop(self._refresh)[2]
+            else:
+                lane = self._lanes[priority]
+                if not lane:
+                    return None
+                entry = lane.popleft()
+            self._stored -= 1
+            if self._is_live(entry):
+                self._counts[priority] -= 1
+                return entry
+            self._tombstones -= 1
+
+    def _append(self, entry: Dict[str, Any]) -> bool:
+        normalized_url = entry.get("normalized_url")
+        if not normalized_url or normalized_url in self._index:
+            return False
+        self._index[normalized_url] = entry
+        self._push(entry)
+        return True
 
-        try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            self.items = data.get("pending", []) if isinstance(data, dict) else []
-        except Exception as exc:  # pragma: no cover - defensive, should not happen often
-            logger.warning(f"Failed to load pending queue from {self.path}: {exc}")
-            self.items = []
-        self._rebuild_index()
+    def _is_live(self, entry: Dict[str, Any]) -> bool:
+        normalized = entry.get("normalized_url")
+        return not normalized or self._index.get(normalized) is entry
+
+    def _live_items(self) -> Iterator[Dict[str, Any]]:
+        """Live entries, class by class in priority order (refresh stalest first)."""
+        for lane in self._lanes.values():
+            for entry in lane:
+                if self._is_live(entry):
+                    yield entry
+        for _, _, entry in sorted(self._refresh, key=lambda item: item[:2]):
+            if self._is_live(entry):
+                yield entry
+
+    def _discard(self, normalized_url: str) -> bool:
+        """Drop a URL from the queue, leaving a tombstone in its lane."""
+        entry = self._index.pop(normalized_url, None)
+        if entry is None:
+            return False
+        self._counts[entry_priority(entry)] -= 1
+        self._tombstones += 1
+        if self._tombstones > self._stored // 2:
+            live = list(self._live_items())
+            self._reset()
+            for item in live:
+                self._push(item)
+        return True
 
-    def _rebuild_index(self):
-        self._index = {}
-        for idx, item in enumerate(self.items):
-            normalized = item.get("normalized_url")
-            if normalized:
-                self._index[normalized] = idx
+    def _snapshot_stale(self) -> bool:
+        """Whether the snapshot is missing or stored in another compression than configured."""
+        stored = json_storage.find_stored(self.path)
+        return stored != json_storage.stored_path(self.path, self.compression)
 
     def save(self):
+        """Append pending operations to the journal, compacting into the snapshot when due."""
         os.makedirs(os.path.dirname(self.path), exist_ok=True)
-        tmp_path = f"{self.path}.tmp"
-        payload = {"pending": self.items}
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, self.path)
+        journal_entries = self._journal_entries + len(self._ops)
+        if journal_entries > max(self.compact_every, len(self)) or self._snapshot_stale():
+            self.compact()
+        elif self._ops:
+            append_entries(self.journal_path, self._ops)
+            self._journal_entries = journal_entries
+            self._ops = []
+
+    def compact(self):
+        """Write the full snapshot, then drop the journal it now contains."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        payload = {"pending": self.as_list()}
+        write_json_atomic(self.path, payload, self.compression, ensure_ascii=False, indent=2)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_entries = 0
+        self._ops = []
 
     def enqueue(self, url: str, normalized_url: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
-        """Add a new URL to the tail of the queue if not already present."""
-        if normalized_url in self._index:
-            return False
-
+        """
+        Add a new URL to the tail of its priority class. A URL already queued is
+        left alone, unless the new entry is more urgent: then it moves class.
+        """
         entry = {
             "url": url,
             "normalized_url": normalized_url,
             "metadata": metadata or {},
             "discovered_at": datetime.now().isoformat()
         }
-        self.items.append(entry)
-        self._index[normalized_url] = len(self.items) - 1
+        queued = self._index.get(normalized_url)
+        if queued is not None:
+            if not outranks(entry, queued):
+                return False
+            self._discard(normalized_url)
+            self._ops.append({"op": "ack", "url": normalized_url})
+        self._append(entry)
+        self._ops.append({"op": "enqueue", "entry": entry})
         return True
 
     def enqueue_entry(self, entry: Dict[str, Any]) -> bool:
         """Re-add an existing entry (e.g., after a failed scrape)."""
-        normalized_url = entry.get("normalized_url")
-        if not normalized_url:
+        if not self._append(entry):
             return False
-        if normalized_url in self._index:
-            return False
-        self.items.append(entry)
-        self._index[normalized_url] = len(self.items) - 1
+        self._ops.append({"op": "fail", "entry": entry})
         return True
 
     def dequeue_batch(self, size: int) -> List[Dict[str, Any]]:
+        """Take the next batch: realtime entries first, the rest shared by priority weight."""
+        batch: List[Dict[str, Any]] = []
+        for priority, count in plan_batch(size, self._counts, self.weights).items():
+            for _ in range(count):
+                entry = self._pop(priority)
+                if entry is None:
+                    break
+                normalized = entry.get("normalized_url")
+                if normalized:
+                    del self._index[normalized]
+                    self._ops.append({"op": "ack", "url": normalized})
+                batch.append(entry)
+        return batch
+
+    def dequeue_due(self, size: int, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Take up to size entries whose metadata not_before has passed, earliest
+        first. Scans every entry, which suits the retry queue it is used for.
+        """
         if size <= 0:
             return []
-        batch = self.items[:size]
-        self.items = self.items[size:]
-        self._rebuild_index()
-        return batch
+        now = now or datetime.now()
+        due = heapq.nsmallest(size, (entry for entry in self._index.values() if is_due(entry, now)), key=retry_at)
+        for entry in due:
+            self._discard(entry["normalized_url"])
+            self._ops.append({"op": "ack", "url": entry["normalized_url"]})
+        return due
+
+    def ack(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Entries leave this queue when dequeued, so there is nothing left to acknowledge."""
+        return 0
+
+    def fail(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Put dequeued entries back at the tail (e.g. when a batch is interrupted)."""
+        return sum(1 for entry in entries if self.enqueue_entry(entry))
+
+    def renew(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Dequeued entries hold no lease, so there is nothing to renew."""
+        return 0
 
     def peek_batch(self, size: int, offset: int = 0) -> List[Dict[str, Any]]:
         if size <= 0:
             return []
         start = max(offset, 0)
-        end = start + size
-        return self.items[start:end]
+        return list(islice(self._live_items(), start, start + size))
 
     def prune(self, existing_urls: Set[str]) -> int:
-        """Remove any queued URLs already present in index/manifest."""
-        before = len(self.items)
-        if not existing_urls:
+        """Remove queued URLs already present in index/manifest (realtime and refresh entries stay)."""
+        if not existing_urls or not self._index:
             return 0
-        self.items = [item for item in self.items if item.get("normalized_url") not in existing_urls]
-        removed = before - len(self.items)
-        if removed:
-            self._rebuild_index()
+        # Walk whichever side is smaller; membership is O(1) on both
+        if len(existing_urls) < len(self._index):
+            candidates = [url for url in existing_urls if url in self._index]
+        else:
+            candidates = [url for url in self._index if url in existing_urls]
+        removed = 0
+        for url in candidates:
+            if entry_priority(self._index[url]) in RESCRAPE_PRIORITIES:
+                continue
+            if self._discard(url):
+                self._ops.append({"op": "ack", "url": url})
+                removed += 1
         return removed
 
+    def counts(self) -> Dict[str, int]:
+        """Queued entries per priority class."""
+        return dict(self._counts)
+
+    def __contains__(self, normalized_url: str) -> bool:
+        return normalized_url in self._index
+
     def __len__(self) -> int:
-        return len(self.items)
+        return sum(self._counts.values())
 
     def as_list(self) -> List[Dict[str, Any]]:
-        return list(self.items)
+        return list(self._live_items())
 
-def retry_with_backoff(func, max_retries=3, initial_delay=2, backoff_multiplier=2):
+
+class DiscoveryFrontier:
     """
-    Retry a function with exponential backoff.
-    
-    Args:
-        func: Function to retry
-        max_retries: Maximum number of retry attempts
-        initial_delay: Initial delay in seconds
-        backoff_multiplier: Multiplier for delay between retries
-    
-    Returns:
-        Function result if successful, None if all retries failed
+    Persistent crawl frontier for hierarchical discovery.
+
+    Tracks every main, sub and product category page seen, keyed by
+    normalized URL, with its depth (1-3), status (pending, in_progress,
+    done, failed) and last visit. Discovery resumes from pending/failed
+    pages, and done pages become due again once they are older than
+    revisit_after_hours.
     """
-    delay = initial_delay
-    for attempt in range(max_retries):
+
+    def __init__(self, path: str, revisit_after_hours: float = 168, compression: str = "none"):
+        self.path = path
+        self.compression = compression
+        self.revisit_after_hours = revisit_after_hours
+        self.categories: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        if not json_storage.exists(self.path):
+            return
         try:
-            return func()
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 502:
-                if attempt < max_retries - 1:
-                    logger.warning(f"Got 502 error, retrying in {delay}s (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(delay)
-                    delay *= backoff_multiplier
-                else:
-                    logger.error(f"Failed after {max_retries} attempts: {e}")
-                    raise
-            else:
-                # For non-502 errors, raise immediately
-                raise
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
-            raise
-    return None
+            data = json_storage.read_json(self.path)
+            self.categories = data.get("categories", {}) if isinstance(data, dict) else {}
+        except Exception as exc:  # pragma: no cover - defensive, should not happen often
+            logger.warning(f"Failed to load discovery frontier from {self.path}: {exc}")
+            self.categories = {}
+        # Pages that were in flight when a previous run died start over
+        for entry in self.categories.values():
+            if entry.get("status") == "in_progress":
+                entry["status"] = "pending"
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        payload = {"categories": self.categories}
+        write_json_atomic(self.path, payload, self.compression, ensure_ascii=False, indent=2)
+
+    def add(self, url: str, normalized_url: str, depth: int, parent: Optional[str] = None) -> bool:
+        """Record a newly seen category page as pending; returns False if already known."""
+        if normalized_url in self.categories:
+            return False
+        self.categories[normalized_url] = {
+            "url": url,
+            "depth": depth,
+            "parent": parent,
+            "status": "pending",
+            "discovered_at": datetime.now().isoformat(),
+            "last_visited": None,
+        }
+        return True
+
+    def get(self, normalized_url: str) -> Optional[Dict[str, Any]]:
+        return self.categories.get(normalized_url)
+
+    def is_due(self, normalized_url: str) -> bool:
+        """Whether a page needs (re)visiting: unknown, pending, failed, or done but stale."""
+        entry = self.categories.get(normalized_url)
+        if entry is None:
+            return True
+        status = entry.get("status")
+        if status in ("pending", "failed"):
+            return True
+        if status != "done":
+            return False
+        last_visited = entry.get("last_visited")
+        if not last_visited:
+            return True
+        try:
+            age = datetime.now() - datetime.fromisoformat(last_visited)
+        except ValueError:
+            return True
+        return age.total_seconds() > self.revisit_after_hours * 3600
+
+    def mark(self, normalized_url: str, status: str, found: Optional[int] = None) -> None:
+        entry = self.categories[normalized_url]
+        entry["status"] = status
+        if status in ("done", "failed"):
+            entry["last_visited"] = datetime.now().isoformat()
+        if found is not None:
+            entry["found"] = found
+
+    def due(self, depth: int, parent: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Due pages at a depth (optionally under one parent), in discovery order."""
+        return [
+            entry for key, entry in self.categories.items()
+            if entry.get("depth") == depth
+            and (parent is None or entry.get("parent") == parent)
+            and self.is_due(key)
+        ]
+
+    def children(self, parent: str) -> List[Dict[str, Any]]:
+        return [entry for entry in self.categories.values() if entry.get("parent") == parent]
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self.categories.values():
+            status = entry.get("status", "pending")
+            counts[status] = counts.get(status, 0) + 1
+        return counts
 
 
 class AgnosticLLMsUpdater:
@@ -188,6 +506,15 @@ class AgnosticLLMsUpdater:
         pending_queue_path: Optional[str] = None,
         disable_discovery: bool = False,
         discovery_only: bool = False,
+        concurrency: int = 1,
+        scrape_engine: str = "scrape",
+        cache_mode: str = "use",
+        pipeline: bool = False,
+        index_backend: Optional[str] = None,
+        journal: Optional[bool] = None,
+        chunking: Optional[str] = None,
+        compression: Optional[str] = None,
+        queue_backend: Optional[str] = None,
     ):
         """Initialize the updater with domain and configuration."""
         self.firecrawl_api_key = firecrawl_api_key
@@ -204,6 +531,13 @@ class AgnosticLLMsUpdater:
         self.config_manager = SiteConfigManager()
         self.site_config = self.config_manager.get_site_config(domain)
         
+        # Shared per-API-key limiter; every Firecrawl call goes through it
+        rate_limit_config = self.site_config.get("rate_limit") or {}
+        self.rate_limiter = get_rate_limiter(self.firecrawl_api_key, rate_limit_config)
+        self.max_throttle_retries = rate_limit_config.get(
+            "max_throttle_retries", DEFAULT_RATE_LIMIT["max_throttle_retries"]
+        )
+        
         # Extract site name for file naming
         self.site_name = domain.replace('www.', '').replace('.', '-')
         
@@ -215,11 +549,36 @@ class AgnosticLLMsUpdater:
         # File paths
         self.index_file = os.path.join(self.site_output_dir, f"llms-{self.site_name}-index.json")
         self.manifest_file = os.path.join(self.site_output_dir, f"llms-{self.site_name}-manifest.json")
+        self.index_db_file = os.path.join(self.site_output_dir, f"llms-{self.site_name}-index.db")
+        
+        # Shard files are regenerated from the index, one changed chunk file at a time.
+        # "content_defined" chunking keeps chunk boundaries and file names stable across edits.
+        chunking_config = dict(self.site_config.get("chunking") or {})
+        if chunking:
+            chunking_config["mode"] = chunking
+        self.shard_writer = ShardWriter(self.site_output_dir, self.site_name, self.max_characters, chunking_config)
+        
+        # URL index storage: "json" (whole-file) or "sqlite" (row per URL, see product_store.py)
+        storage_config = self.site_config.get("storage") or {}
+        self.index_backend = index_backend or storage_config.get("index_backend", "json")
+        # JSON index, manifest export and queue files can be stored gzip/zstd-compressed (see json_storage.py)
+        self.storage_compression = json_storage.check_compression(
+            compression or storage_config.get("compression", "none")
+        )
         
-        # Load existing data
+        # Index changes can be appended to a journal instead of rewriting the index file
+        self.journal_config = dict(DEFAULT_JOURNAL_CONFIG)
+        self.journal_config.update(self.site_config.get("journal") or {})
+        self.journal_enabled = self.journal_config["enabled"] if journal is None else journal
+        self.journal = IndexJournal(os.path.join(self.site_output_dir, f"llms-{self.site_name}-journal.jsonl"))
+        
+        # Load existing data (a leftover journal is always replayed, even with journaling off).
+        # The manifest is derived from the index's shard keys on first use (see the manifest property).
         self.url_index = self._load_url_index()
-        self.manifest = self._load_manifest()
-        self.existing_urls: Set[str] = set(self.url_index.keys())
+        self.journal.replay(self.url_index)
+        self.existing_urls: Set[str] = self.url_index.url_set()
+        # URLs removed during this run, which legacy shard adoption must not bring back
+        self._removed_urls: Set[str] = set()
         
         # Batch handling + queue configuration
         self.force_refresh = force_refresh
@@ -227,6 +586,41 @@ class AgnosticLLMsUpdater:
         self.disable_discovery = disable_discovery
         self.discovery_only = discovery_only
         self.max_batches = max_batches if max_batches and max_batches > 0 else 1
+        # Number of Firecrawl scrapes kept in flight while draining the queue
+        self.concurrency = concurrency if concurrency and concurrency > 0 else 1
+
+        # Keep-alive connection pool sized to the number of requests we can have in flight
+        self.firecrawl_http = PooledHTTPClient(
+            self.firecrawl_base_url,
+            headers=self.headers,
+            pool_size=max(self.concurrency, self.rate_limiter.max_in_flight),
+            timeouts=self.site_config.get("timeouts")
+        )
+
+        # "scrape" = one /scrape call per URL, "batch" = one Firecrawl batch-scrape job per queue batch
+        if scrape_engine not in ("scrape", "batch"):
+            raise ValueError(f"Unknown scrape engine: {scrape_engine}")
+        self.scrape_engine = scrape_engine
+        batch_scrape_config = self.site_config.get("batch_scrape") or {}
+        self.batch_poll_interval = batch_scrape_config.get("poll_interval", 5)
+        self.batch_max_wait = batch_scrape_config.get("max_wait", 1800)
+        self.batch_job_path = os.path.join(self.site_output_dir, "batch-scrape-job.json")
+
+        # Stream shard files / index checkpoints to disk while scraping (see shard_pipeline.py)
+        self.pipeline = pipeline
+        self.pipeline_config = dict(DEFAULT_PIPELINE_CONFIG)
+        self.pipeline_config.update(self.site_config.get("pipeline") or {})
+
+        # Scrape responses are cached on disk (directory created on first write); this is
+        # also how products scraped with a category page are reused instead of re-scraped
+        cache_config = dict(DEFAULT_CACHE_CONFIG)
+        cache_config.update(self.site_config.get("cache") or {})
+        self.response_cache = ResponseCache(
+            os.path.join(self.site_output_dir, ".cache"),
+            mode=cache_mode,
+            ttl_hours=cache_config["ttl_hours"],
+            max_size_mb=cache_config["max_size_mb"]
+        )
 
         effective_batch_size = batch_size
         if self.domain == "mydiy.ie" and effective_batch_size is None:
@@ -237,50 +631,103 @@ class AgnosticLLMsUpdater:
         self.batch_size = effective_batch_size
         self.batch_mode = self.batch_size is not None
 
+        # Queues: "json" (journaled file, one process) or "sqlite" (leased rows that several
+        # workers can drain in parallel, see work_queue.py)
+        self.queue_config = dict(DEFAULT_QUEUE_CONFIG)
+        self.queue_config.update(self.site_config.get("queue") or {})
+        self.queue_backend = queue_backend or self.queue_config["backend"]
+        # Batch shares per priority class (realtime always goes first, see queue_priority.py)
+        self.priority_weights = dict(DEFAULT_PRIORITY_WEIGHTS)
+        self.priority_weights.update(self.queue_config["priority_weights"])
+        if self.queue_backend not in ("json", "sqlite"):
+            raise ValueError(f"Unknown queue backend: {self.queue_backend}")
+        if self.queue_backend == "sqlite" and self.index_backend == "json":
+            logger.warning("Parallel workers on the sqlite queue should use --index-backend sqlite; "
+                           "each worker rewrites the whole JSON index")
+        self.work_queue_db = os.path.join(self.site_output_dir, "work-queue.db")
         queue_path = pending_queue_path or os.path.join(self.site_output_dir, "pending-queue.json")
         self.pending_queue_path = queue_path
-        self.pending_queue = PendingQueue(queue_path)
+        self.pending_queue = self._open_queue(queue_path, "pending")
         removed_from_queue = self.pending_queue.prune(self.existing_urls)
         if removed_from_queue:
             logger.info(f"Pruned {removed_from_queue} URLs already present in index from pending queue")
 
-        # Initialize retry queue for failed URLs
+        # Initialize retry queue for failed URLs; due entries are drained by normal batch runs
+        # and entries that fail too often are dead-lettered (see retry_policy.py)
         retry_queue_path = os.path.join(self.site_output_dir, "retry-queue.json")
         self.retry_queue_path = retry_queue_path
-        self.retry_queue = PendingQueue(retry_queue_path)
+        self.retry_queue = self._open_queue(retry_queue_path, "retry")
         logger.info(f"Retry queue initialized with {len(self.retry_queue)} URLs")
+        self.retry_policy = RetryPolicy(self.queue_config["retry"])
+        self.dead_letter_queue_path = os.path.join(self.site_output_dir, "dead-letter-queue.json")
+        self.dead_letter_queue = self._open_queue(self.dead_letter_queue_path, "dead_letter")
+        # Error class of the last failed scrape per URL, read when the failure is queued for retry
+        self._scrape_failures: Dict[str, str] = {}
+        # (queue, entries) of the batch being processed, whose sqlite leases are renewed while it runs
+        self._leased_batches: List[Tuple[Any, List[Dict[str, Any]]]] = []
+        self._leases_renewed_at = 0.0
+
+        # Crawl frontier for --hierarchical, so discovery can resume across runs
+        discovery_config = self.site_config.get("discovery") or {}
+        self.discovery_frontier = DiscoveryFrontier(
+            os.path.join(self.site_output_dir, "discovery-frontier.json"),
+            revisit_after_hours=discovery_config.get("revisit_after_hours", 168),
+            compression=self.storage_compression
+        )
 
         logger.info(f"Initialized for {self.site_config['name']} ({domain})")
     
-    def _load_url_index(self) -> Dict[str, Dict[str, Any]]:
-        """Load existing URL index from file."""
-        if os.path.exists(self.index_file):
-            try:
-                with open(self.index_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.warning(f"Failed to load URL index: {e}")
-        return {}
+    def _open_queue(self, json_path: str, name: str):
+        """Open a URL queue with the configured backend; the sqlite queue imports the JSON one once."""
+        if self.queue_backend == "json":
+            return PendingQueue(
+                json_path, self.storage_compression, self.queue_config["compact_every"], self.priority_weights
+            )
+        queue = SqliteWorkQueue(self.work_queue_db, name, self.queue_config["lease_seconds"], self.priority_weights)
+        if not queue.imported:
+            queue.import_entries(PendingQueue(json_path, self.storage_compression).as_list())
+        return queue
     
-    def _load_manifest(self) -> Dict[str, List[str]]:
-        """Load existing manifest from file."""
-        if os.path.exists(self.manifest_file):
-            try:
-                with open(self.manifest_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.warning(f"Failed to load manifest: {e}")
-        return {}
+    @property
+    def manifest(self) -> ShardManifest:
+        """
+        shard key -> URLs, built from the whole index on first access and kept
+        in step by the store. Shard writes use url_index.shard_urls() instead,
+        so a run that only touches a few shards never builds it.
+        """
+        return self.url_index.manifest
+
+    def _load_url_index(self) -> ProductStore:
+        """Open the URL index with the configured storage backend."""
+        return open_product_store(
+            self.index_backend, self.index_file, self.index_db_file, self.storage_compression
+        )
+    
+    def _save_url_index(self, url_index: Optional[Dict[str, Dict[str, Any]]] = None):
+        """Save URL index, or write a snapshot of it to the JSON index file."""
+        if url_index is None:
+            self.url_index.save()
+        else:
+            write_index_json(self.index_file, url_index, self.storage_compression)
     
-    def _save_url_index(self):
-        """Save URL index to file."""
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            json.dump(self.url_index, f, indent=2, ensure_ascii=False)
+    def export_manifest(self):
+        """Write the derived manifest to llms-<site>-manifest.json."""
+        self.url_index.export_manifest(self.manifest_file, self.storage_compression)
+    
+    def _persist_index(self):
+        """
+        Make index changes durable. Journaled runs already are, so the index
+        snapshot is only rewritten once compaction is due.
+        """
+        if self.journal_enabled and self.journal.entries < self.journal_config["compact_every"]:
+            return
+        self.compact_journal()
     
-    def _save_manifest(self):
-        """Save manifest to file with stable ordering."""
-        with open(self.manifest_file, 'w', encoding='utf-8') as f:
-            json.dump(self.manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+    def compact_journal(self):
+        """Write the index snapshot, then drop the journal it now contains."""
+        self._save_url_index()
+        if self.journal.entries:
+            self.journal.truncate()
     
     def _clean_navigation_content(self, content: str) -> str:
         """Remove navigation and footer content from scraped content."""
@@ -356,20 +803,91 @@ class AgnosticLLMsUpdater:
         """Get shard key for URL using site configuration."""
         return self.config_manager.get_shard_key(url, self.site_config)
     
+    def _firecrawl_post(
+        self, endpoint: str, payload: Dict[str, Any], timeout: Optional[float] = None
+    ) -> requests.Response:
+        """
+        POST to a Firecrawl endpoint over the pooled session, paced by the shared rate limiter.
+
+        The timeout defaults to the endpoint type's (map, scrape, ...). Throttle
+        responses (429) are fed back into the limiter, which slows the global
+        send rate and pauses for Retry-After before the request is sent again.
+        Only after max_throttle_retries is the 429 handed back to the caller,
+        so transient throttling lowers throughput instead of filling the retry
+        queue.
+        """
+        endpoint_type = endpoint.split('/')[0]
+        attempt = 0
+        while True:
+            with self.rate_limiter:
+                response = self.firecrawl_http.post(
+                    endpoint,
+                    endpoint_type=endpoint_type,
+                    json=payload,
+                    timeout=timeout
+                )
+            delay = self.rate_limiter.observe_response(response.status_code, response.headers)
+            if delay is None or attempt >= self.max_throttle_retries:
+                return response
+            attempt += 1
+            logger.warning(
+                f"Retrying Firecrawl /{endpoint} after throttle "
+                f"(attempt {attempt}/{self.max_throttle_retries})"
+            )
+    
+    def _firecrawl_scrape(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST /scrape and return the decoded response, serving it from the response cache when possible.
+
+        Only successful responses are cached. HTTP errors are raised as with
+        response.raise_for_status().
+        """
+        cached = self.response_cache.get(payload)
+        if cached is not None:
+            return cached
+
+        response = self._firecrawl_post("scrape", payload)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("success") and data.get("data"):
+            self.response_cache.put(payload, data)
+        return data
+    
+    def _product_scrape_payload(self, eur_url: str) -> Dict[str, Any]:
+        """Scrape request for a single product page (also the cache key for its response)."""
+        return {
+            "url": eur_url,
+            "formats": self._product_scrape_formats(),
+            "onlyMainContent": False  # Need full page for breadcrumbs
+        }
+    
+    def _firecrawl_get(self, path: str) -> requests.Response:
+        """GET a Firecrawl status/paging URL (relative path or absolute `next` link), paced like _firecrawl_post."""
+        attempt = 0
+        while True:
+            with self.rate_limiter:
+                response = self.firecrawl_http.get(path, endpoint_type="status")
+            delay = self.rate_limiter.observe_response(response.status_code, response.headers)
+            if delay is None or attempt >= self.max_throttle_retries:
+                return response
+            attempt += 1
+            logger.warning(
+                f"Retrying Firecrawl GET {path} after throttle "
+                f"(attempt {attempt}/{self.max_throttle_retries})"
+            )
+    
     def _map_website(self, limit: int = 10000) -> List[str]:
         """Map website structure using Firecrawl."""
         logger.info(f"Mapping website structure for {self.domain}")
         
         try:
-            response = requests.post(
-                f"{self.firecrawl_base_url}/map",
-                headers=self.headers,
-                json={
+            response = self._firecrawl_post(
+                "map",
+                {
                     "url": self.site_config["base_url"],
                     "limit": limit,
                     "includeSubdomains": True
-                },
-                timeout=90  # 90 second timeout for map operations
+                }
             )
             response.raise_for_status()
             
@@ -714,8 +1232,7 @@ class AgnosticLLMsUpdater:
             return self._parse_prescraped_to_json(url, pre_scraped_content, is_diff)
 
         # Process both individual product URLs and collection/category pages
-        product_pattern = self.site_config.get('url_patterns', {}).get('product', '/products/')
-        if product_pattern in url.lower():
+        if self._is_product_url(url):
             # Individual product page - scrape directly
             return self._extract_product_data(url)
         else:
@@ -723,28 +1240,22 @@ class AgnosticLLMsUpdater:
             logger.info(f"Processing collection/category page: {url}")
             return self._scrape_category_page(url)
     
+    def _is_product_url(self, url: str) -> bool:
+        """Whether a URL is an individual product page (per the site's product URL pattern)."""
+        product_pattern = self.site_config.get('url_patterns', {}).get('product', '/products/')
+        return product_pattern in url.lower()
+    
     def _scrape_category_page(self, url: str) -> Optional[Dict[str, Any]]:
         """Scrape category page and extract all individual product URLs, then scrape each product."""
         try:
-            # Rate limiting: wait 1 second before API call
-            time.sleep(1)
-            
             # Ensure EUR currency for proper pricing
             eur_url = self._ensure_eur_currency(url)
             
-            response = requests.post(
-                f"{self.firecrawl_base_url}/scrape",
-                headers=self.headers,
-                json={
-                    "url": eur_url,
-                    "formats": ["markdown"],
-                    "onlyMainContent": True
-                },
-                timeout=60  # 60 second timeout for scrape operations
-            )
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._firecrawl_scrape({
+                "url": eur_url,
+                "formats": ["markdown"],
+                "onlyMainContent": True
+            })
             if data.get("success") and data.get("data"):
                 # Handle different response formats from Firecrawl API
                 response_data = data["data"]
@@ -823,6 +1334,47 @@ class AgnosticLLMsUpdater:
         
         return None
     
+    def _fetch_category_links(self, category_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Links-only category fetch for discovery.
+
+        One scrape returns the page's markdown and links; unlike
+        _scrape_category_page, the products found on the page are not scraped.
+        The page is requested in EUR, like every other scrape, so it shares
+        their cache key.
+        """
+        try:
+            data = self._firecrawl_scrape({
+                "url": self._ensure_eur_currency(category_url),
+                "formats": ["markdown", "links"],
+                "onlyMainContent": True  # Focus on main content, not nav/footer
+            })
+        except Exception as e:
+            logger.error(f"Failed to fetch category page {category_url}: {e}")
+            return None
+
+        if not data.get("success") or not data.get("data"):
+            return None
+
+        response_data = data["data"]
+        return {
+            "url": category_url,
+            "content": response_data.get("markdown", ""),
+            "links": self._link_urls(response_data.get("links", [])),
+        }
+    
+    def _link_urls(self, links_data: List[Any]) -> List[str]:
+        """Flatten a Firecrawl links list (strings or {url|href} objects) into URLs."""
+        if not links_data:
+            return []
+        if isinstance(links_data[0], str):
+            return list(links_data)
+        return [
+            link.get("url") or link.get("href")
+            for link in links_data
+            if isinstance(link, dict) and (link.get("url") or link.get("href"))
+        ]
+    
     def _ensure_eur_currency(self, url: str) -> str:
         """Ensure URL has EUR currency parameter for proper pricing."""
         from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
@@ -936,141 +1488,46 @@ class AgnosticLLMsUpdater:
         
         return shard_name
     
+    def _product_scrape_formats(self) -> List[Any]:
+        """Formats requested for product pages: JSON extraction, plus HTML when breadcrumbs are enabled."""
+        formats: List[Any] = [{
+            "type": "json",
+            "schema": PRODUCT_JSON_SCHEMA
+        }]
+        
+        # Add HTML format if breadcrumbs enabled
+        if self.site_config.get('shard_extraction', {}).get('use_breadcrumbs', False):
+            formats.append("html")
+        return formats
+    
     def _extract_product_data(self, url: str) -> Optional[Dict[str, Any]]:
         """Extract structured product data using Firecrawl scrape endpoint with JSON format."""
+        self._scrape_failures.pop(url, None)
         try:
-            # Rate limiting: wait 1 second before API call
-            time.sleep(1)
-            
             # Ensure EUR currency for proper pricing
             eur_url = self._ensure_eur_currency(url)
             
-            # Check if breadcrumbs are enabled for this site
-            use_breadcrumbs = self.site_config.get('shard_extraction', {}).get('use_breadcrumbs', False)
-            
             def make_request():
                 try:
                     # Request both JSON and HTML formats if breadcrumbs enabled
-                    formats = [{
-                        "type": "json",
-                        "schema": {
-                            "type": "object",
-                            "properties": {
-                                "product_name": {
-                                    "type": "string",
-                                    "description": "The name/title of the product"
-                                },
-                                "description": {
-                                    "type": "string", 
-                                    "description": "The main product description"
-                                },
-                                "price": {
-                                    "type": "string",
-                                    "description": "The current price of the product (including currency symbol)"
-                                },
-                                "availability": {
-                                    "type": "string",
-                                    "description": "Product availability status (e.g., 'In Stock', 'Out of Stock')"
-                                },
-                                "specifications": {
-                                    "type": "array",
-                                    "items": {"type": "string"},
-                                    "description": "Key product specifications or features"
-                                }
-                            },
-                            "required": ["product_name", "description", "price"]
-                        }
-                    }]
-                    
-                    # Add HTML format if breadcrumbs enabled
-                    if use_breadcrumbs:
-                        formats.append("html")
-                    
-                    response = requests.post(
-                        f"{self.firecrawl_base_url}/scrape",
-                        headers=self.headers,
-                        json={
-                            "url": eur_url,
-                            "formats": formats,
-                            "onlyMainContent": False  # Need full page for breadcrumbs
-                        },
-                        timeout=60  # Increased timeout from 30 to 60 seconds
-                    )
-                    response.raise_for_status()
-                    return response
-                except requests.exceptions.Timeout:
+                    return self._firecrawl_scrape(self._product_scrape_payload(eur_url))
+                except requests.exceptions.Timeout as e:
                     logger.warning(f"Timeout scraping {eur_url}, will retry...")
+                    self._scrape_failures[url] = error_class_for_exception(e)
                     return None  # Return None to trigger retry
                 except requests.exceptions.RequestException as e:
                     logger.warning(f"Request error scraping {eur_url}: {e}")
+                    self._scrape_failures[url] = error_class_for_exception(e)
                     return None  # Return None to trigger retry
             
-            # NO automatic retries - fail fast and move to retry queue
-            # This prevents any API wastage on problematic URLs
-            # Users can manually retry later with --process-retry-queue
-            response = make_request()
+            # NO automatic retries - fail fast and move to retry queue, which
+            # retries with backoff per error class (see retry_policy.py)
+            # (429 throttling is paced and retried inside _firecrawl_post)
+            data = make_request()
             
-            if response:
-                data = response.json()
+            if data:
                 if data.get("success") and data.get("data"):
-                    response_data = data["data"]
-                    extracted_data = response_data.get("json", {})
-                    
-                    # Extract HTML if available (for breadcrumbs)
-                    html_content = response_data.get("html", "")
-                    
-                    if extracted_data:
-                        # Use the extracted data directly as JSON content
-                        import json
-                        content = json.dumps(extracted_data, indent=2, ensure_ascii=False)
-                        
-                        result = {
-                            "url": eur_url,  # Use EUR URL for indexing
-                            "content": content,
-                            "title": extracted_data.get("product_name", ""),
-                            "scraped_at": datetime.now().isoformat()
-                        }
-                        
-                        # Add HTML if breadcrumbs enabled
-                        if use_breadcrumbs and html_content:
-                            result["html"] = html_content
-                        
-                        return result
-                    else:
-                        # Fallback: try to get content from other fields if JSON extraction failed
-                        logger.warning(f"JSON extraction failed for {url}, trying fallback methods")
-                        
-                        # Try to get content from markdown field
-                        content = ""
-                        if "markdown" in response_data:
-                            content = response_data.get("markdown", "")
-                        elif "html" in response_data:
-                            content = response_data.get("html", "")
-                        elif "text" in response_data:
-                            content = response_data.get("text", "")
-                        
-                        if content:
-                            # Try to get title
-                            title = ""
-                            if "metadata" in response_data and response_data["metadata"]:
-                                title = response_data["metadata"].get("title", "")
-                            elif "title" in response_data:
-                                title = response_data.get("title", "")
-                            else:
-                                title = "Product"
-                            
-                            result = {
-                                "url": eur_url,
-                                "content": content,
-                                "title": title,
-                                "scraped_at": datetime.now().isoformat()
-                            }
-                            
-                            # Add HTML if breadcrumbs enabled
-                            if use_breadcrumbs and html_content:
-                                result["html"] = html_content
-                            
-                            return result
+                    return self._build_product_result(url, eur_url, data["data"])
             
         except KeyError as e:
             logger.error(f"Missing expected field in Firecrawl response for {url}: {e}")
@@ -1080,6 +1537,68 @@ class AgnosticLLMsUpdater:
         
         return None
     
+    def _build_product_result(self, url: str, eur_url: str, response_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Turn one Firecrawl scrape document into the scraped-data dict used by _update_url_data."""
+        use_breadcrumbs = self.site_config.get('shard_extraction', {}).get('use_breadcrumbs', False)
+        extracted_data = response_data.get("json", {})
+        
+        # Extract HTML if available (for breadcrumbs)
+        html_content = response_data.get("html", "")
+        
+        if extracted_data:
+            # Use the extracted data directly as JSON content
+            content = json.dumps(extracted_data, indent=2, ensure_ascii=False)
+            
+            result = {
+                "url": eur_url,  # Use EUR URL for indexing
+                "content": content,
+                "title": extracted_data.get("product_name", ""),
+                "scraped_at": datetime.now().isoformat()
+            }
+            
+            # Add HTML if breadcrumbs enabled
+            if use_breadcrumbs and html_content:
+                result["html"] = html_content
+            
+            return result
+        
+        # Fallback: try to get content from other fields if JSON extraction failed
+        logger.warning(f"JSON extraction failed for {url}, trying fallback methods")
+        
+        # Try to get content from markdown field
+        content = ""
+        if "markdown" in response_data:
+            content = response_data.get("markdown", "")
+        elif "html" in response_data:
+            content = response_data.get("html", "")
+        elif "text" in response_data:
+            content = response_data.get("text", "")
+        
+        if not content:
+            return None
+        
+        # Try to get title
+        title = ""
+        if "metadata" in response_data and response_data["metadata"]:
+            title = response_data["metadata"].get("title", "")
+        elif "title" in response_data:
+            title = response_data.get("title", "")
+        else:
+            title = "Product"
+        
+        result = {
+            "url": eur_url,
+            "content": content,
+            "title": title,
+            "scraped_at": datetime.now().isoformat()
+        }
+        
+        # Add HTML if breadcrumbs enabled
+        if use_breadcrumbs and html_content:
+            result["html"] = html_content
+        
+        return result
+    
     def _update_url_data(self, url: str, scraped_data: Dict[str, Any]) -> str:
         """Update URL data in index and return shard key with breadcrumb fallback."""
         normalized_url = self._normalize_url(url)
@@ -1087,25 +1606,36 @@ class AgnosticLLMsUpdater:
         # Try URL path extraction first, with breadcrumb fallback if available
         shard_key = self._get_shard_key_with_breadcrumbs(url, scraped_data)
         
-        # Update URL index (use shard_key field, not old shard field)
-        self.url_index[normalized_url] = {
+        # Update URL index (use shard_key field, not old shard field).
+        # Product JSON is stored as structured fields and rendered when shards are written.
+        record = {
             "title": scraped_data.get("title", ""),
-            "markdown": scraped_data.get("content", ""),
+            **content_fields(scraped_data.get("content", "")),
             "shard_key": shard_key,  # ← Use shard_key not shard!
             "updated_at": scraped_data.get("scraped_at", datetime.now().isoformat())
         }
-        
-        # Update manifest
-        if shard_key not in self.manifest:
-            self.manifest[shard_key] = []
-        
-        if normalized_url not in self.manifest[shard_key]:
-            self.manifest[shard_key].append(normalized_url)
+        self._log_changed_fields(normalized_url, record)
+        # The store moves the URL to this shard in the manifest
+        self._journal_put(normalized_url, record)
+        self.url_index[normalized_url] = record
 
         self.existing_urls.add(normalized_url)
 
         return shard_key
     
+    def _log_changed_fields(self, normalized_url: str, record: Dict[str, Any]):
+        """Log which product fields a re-scrape changed (structured records only)."""
+        if normalized_url not in self.url_index:
+            return
+        fields = changed_fields(self.url_index.get(normalized_url), record)
+        if fields:
+            logger.info(f"   Changed fields for {normalized_url}: {', '.join(fields)}")
+
+    def _journal_put(self, normalized_url: str, record: Dict[str, Any]):
+        """Log an index upsert ahead of applying it, when journaling is on."""
+        if self.journal_enabled and not self.dry_run:
+            self.journal.record_put(normalized_url, record)
+    
     def _get_shard_key_with_breadcrumbs(self, url: str, scraped_data: Dict[str, Any]) -> str:
         """
         Get shard key with proper waterfall:
@@ -1172,201 +1702,232 @@ class AgnosticLLMsUpdater:
         
         return "other_products"
     
-    def _remove_url_data(self, url: str):
-        """Remove URL data from index and manifest."""
+    def _remove_url_data(self, url: str) -> Optional[str]:
+        """Remove URL data from the index (the derived manifest follows); returns its shard key."""
         normalized_url = self._normalize_url(url)
         
         logger.info(f"🗑️  Attempting to remove URL: {url}")
         logger.info(f"   Normalized to: {normalized_url}")
 
         if normalized_url in self.url_index:
-            shard_key = self.url_index[normalized_url]["shard_key"]
+            shard_key = record_shard(self.url_index[normalized_url])
             logger.info(f"   Found in url_index under shard: {shard_key}")
+            if self.journal_enabled and not self.dry_run:
+                self.journal.record_delete(normalized_url)
             del self.url_index[normalized_url]
-            logger.info(f"   ✅ Removed from url_index")
+            logger.info(f"   ✅ Removed from url_index and manifest")
             self.existing_urls.discard(normalized_url)
-            
-            # Remove from manifest
-            if shard_key in self.manifest:
-                logger.info(f"   Shard '{shard_key}' exists in manifest with {len(self.manifest[shard_key])} URLs")
-                logger.info(f"   URLs in manifest for this shard: {self.manifest[shard_key]}")
-                
-                if normalized_url in self.manifest[shard_key]:
-                    self.manifest[shard_key].remove(normalized_url)
-                    logger.info(f"   ✅ Removed from manifest (now {len(self.manifest[shard_key])} URLs remain)")
-                    
-                    # Clean up empty shards
-                    if not self.manifest[shard_key]:
-                        del self.manifest[shard_key]
-                        logger.info(f"   🗑️  Removed empty shard from manifest")
-                else:
-                    logger.warning(f"   ⚠️  URL NOT FOUND in manifest[{shard_key}]!")
-                    logger.warning(f"   This is a BUG - url_index and manifest are out of sync!")
-            else:
-                logger.warning(f"   ⚠️  Shard '{shard_key}' NOT FOUND in manifest!")
-        else:
-            logger.warning(f"   ⚠️  URL NOT FOUND in url_index!")
+            self._removed_urls.add(normalized_url)
+            return shard_key
+        logger.warning(f"   ⚠️  URL NOT FOUND in url_index!")
+        return None
     
-    def _write_shard_file(self, shard_key: str, urls: List[str]) -> List[str]:
-        """Write shard file with content from URLs, automatically splitting if too large."""
-        if not urls:
-            return []
-        
-        # Read existing products from all shard files for this key (including splits)
-        existing_products = {}
-        base_pattern = f"llms-{self.site_name}-{shard_key}"
-        
-        # Check for main file and any split files
-        import glob
-        shard_files = glob.glob(os.path.join(self.site_output_dir, f"{base_pattern}*.txt"))
-        
-        for filepath in shard_files:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Parse existing products by URL marker
-                current_url = None
-                current_content = []
-                
-                for line in content.split('\n'):
-                    if line.startswith('<|') and line.endswith('|>'):
-                        # Save previous product if exists
-                        if current_url and current_content:
-                            existing_products[current_url] = '\n'.join(current_content)
-                        
-                        # Start new product
-                        current_url = line.strip()[2:-2]  # Extract URL from <|URL|>
-                        current_content = [line]
-                    elif current_url is not None:
-                        current_content.append(line)
-                
-                # Save last product
-                if current_url and current_content:
-                    existing_products[current_url] = '\n'.join(current_content)
-                
-            except Exception as e:
-                logger.warning(f"Failed to read existing shard file {filepath}: {e}")
-        
-        if existing_products:
-            logger.debug(f"Loaded {len(existing_products)} existing products from {len(shard_files)} file(s)")
-        
-        # Collect all products for this shard (existing + new from urls list)
-        all_products = {}
-        
-        # First, add all existing products
-        for url, content in existing_products.items():
-            all_products[url] = content
-        
-        # Then add/update products from the manifest URLs
-        for url in urls:
-            if url in self.url_index:
-                try:
-                    content = self.url_index[url].get("markdown", "")
-                    title = self.url_index[url].get("title", "Product")
-                    
-                    # Build content with header
-                    header = f"<|{url}|>\n## {title}\n\n"
-                    content_with_header = header + content
-                    
-                    all_products[url] = content_with_header
-                except KeyError as e:
-                    logger.warning(f"Missing field in URL index for {url}: {e}")
-                    continue
-        
-        if not all_products:
-            return []
-        
-        # Split products into chunks that fit within max_characters
-        chunks = []
-        current_chunk = []
-        current_chars = 0
-        
-        for url in sorted(all_products.keys()):  # Sort for consistency
-            product_content = all_products[url]
-            if not product_content.endswith('\n\n'):
-                product_content += '\n\n'
-            
-            product_size = len(product_content)
-            
-            # If adding this product would exceed limit, start new chunk
-            if current_chars + product_size > self.max_characters and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = [product_content]
-                current_chars = product_size
-            else:
-                current_chunk.append(product_content)
-                current_chars += product_size
-        
-        # Add final chunk
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        # Delete old shard files before writing new ones
-        for old_file in shard_files:
-            try:
-                os.remove(old_file)
-                logger.debug(f"Removed old shard file: {os.path.basename(old_file)}")
-            except Exception as e:
-                logger.warning(f"Failed to remove old file {old_file}: {e}")
-        
-        # Write chunks to files
-        written_files = []
-        
-        if len(chunks) == 1:
-            # Single file, no split needed
-            filename = f"llms-{self.site_name}-{shard_key}.txt"
-            filepath = os.path.join(self.site_output_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(''.join(chunks[0]))
-            
-            product_count = len(chunks[0])
-            char_count = sum(len(p) for p in chunks[0])
-            logger.info(f"Wrote shard file: {filename} ({product_count} products, {char_count} characters)")
-            written_files.append(filepath)
-        else:
-            # Multiple files needed
-            logger.info(f"Splitting shard '{shard_key}' into {len(chunks)} files ({len(all_products)} total products)")
-            
-            for i, chunk in enumerate(chunks, 1):
-                filename = f"llms-{self.site_name}-{shard_key}_{i}.txt"
-                filepath = os.path.join(self.site_output_dir, filename)
-                
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(''.join(chunk))
-                
-                product_count = len(chunk)
-                char_count = sum(len(p) for p in chunk)
-                logger.info(f"  Wrote {filename} ({product_count} products, {char_count} characters)")
-                written_files.append(filepath)
-        
-        return written_files
+    def _write_shard_file(
+        self,
+        shard_key: str,
+        urls: List[str],
+        url_index: Optional[Dict[str, Dict[str, Any]]] = None,
+        exclude: Optional[FrozenSet[str]] = None,
+    ) -> ShardChanges:
+        """
+        Write a shard's files from the index, splitting at max_characters and
+        rewriting only the chunk files whose contents changed (see shard_writer.py).
+        Returns the files written, added and deleted.
+
+        url_index and exclude default to the live index; the shard pipeline
+        passes snapshots of both so it can write from a background thread.
+        """
+        if url_index is None:
+            self._adopt_legacy_shard(shard_key)
+            # Adoption may have added products the caller's list predates
+            urls = self.url_index.shard_urls(shard_key) or urls
+            url_index = self.url_index.get_many(urls)
+        if exclude is None:
+            exclude = self._excluded_shards(shard_key)
+        return self.shard_writer.write(shard_key, list(urls), url_index, exclude=exclude)
+
+    def _excluded_shards(self, shard_key: str) -> FrozenSet[str]:
+        """
+        Shards whose files look like numbered parts of shard_key (e.g. "tools_2"
+        next to "tools"), so they are not read or deleted as part of it.
+        """
+        return frozenset(name for name in self.shard_writer.numbered_names(shard_key) if self.url_index.has_shard(name))
+
+    def _verify_removed(self, removed: List[Tuple[str, Optional[str]]]) -> None:
+        """Check through the shard sidecars that removed products are gone from their shard files."""
+        if self.dry_run:
+            return
+        for url, shard_key in removed:
+            if shard_key is None:
+                continue
+            normalized_url = self._normalize_url(url)
+            if self.shard_writer.locate(shard_key, normalized_url) is not None:
+                logger.warning(f"⚠️  Removed product still present in '{shard_key}' shard files: {normalized_url}")
+
+    def _adopt_legacy_shard(self, shard_key: str):
+        """
+        Before a shard's first incremental write, copy products that exist
+        only in its shard files into the index, so regenerating the shard
+        from the index does not drop them. Products removed during this run
+        are left out. Runs on the main thread.
+        """
+        if self.dry_run or self.shard_writer.has_layout(shard_key):
+            return
+        adopted = 0
+        now = datetime.now().isoformat()
+        for url, (title, markdown) in self.shard_writer.read_products(shard_key, exclude=self._excluded_shards(shard_key)).items():
+            if url in self.url_index or url in self._removed_urls:
+                continue
+            record = {"title": title, **content_fields(markdown), "shard_key": shard_key, "updated_at": now}
+            self._journal_put(url, record)
+            self.url_index[url] = record
+            self.existing_urls.add(url)
+            adopted += 1
+        if adopted:
+            logger.info(f"Adopted {adopted} products from existing '{shard_key}' shard files into the index")
+
+    def _new_shard_pipeline(self) -> Optional[ShardPipeline]:
+        """Start a background shard writer when --pipeline is on (None otherwise)."""
+        if not self.pipeline or self.dry_run:
+            return None
+
+        def snapshot_shard(shard_key: str) -> Tuple[List[str], Dict[str, Dict[str, Any]], FrozenSet[str]]:
+            self._adopt_legacy_shard(shard_key)
+            urls = self.url_index.shard_urls(shard_key)
+            # Index entries are replaced, never mutated, so a shallow copy is a stable snapshot.
+            # The excluded shard names are fixed here too, so the writer never reads the live index.
+            return urls, self.url_index.get_many(urls), self._excluded_shards(shard_key)
+
+        def snapshot_index() -> Optional[Dict[str, Any]]:
+            # Nothing to checkpoint when the journal or the store already made every write durable
+            if self.journal_enabled or self.url_index.durable_writes:
+                return None
+            return dict(self.url_index.items())
+
+        return ShardPipeline(
+            snapshot_shard,
+            self._write_shard_file,
+            snapshot_index,
+            self._save_url_index,
+            flush_every=self.pipeline_config["flush_every"],
+            checkpoint_every=self.pipeline_config["checkpoint_every"],
+            max_pending=self.pipeline_config["max_pending"],
+        )
 
     def _should_skip_existing(self, normalized_url: str) -> bool:
         """Return True if URL already scraped and refresh not forced."""
         return not self.force_refresh and normalized_url in self.existing_urls
     
-    def _add_to_retry_queue(self, entry: Dict[str, Any]) -> None:
-        """Add a failed URL to the retry queue for manual review/retry later."""
-        url = entry.get("url")
-        normalized_url = entry.get("normalized_url")
-        
-        # Only add if not already in retry queue
-        if normalized_url not in self.retry_queue._index:
+    def _schedule_retry(self, entry: Dict[str, Any], from_retry_queue: bool = False) -> Optional[str]:
+        """
+        Record a failed scrape on the entry and queue it again after its backoff
+        delay, or dead-letter it once it has used up its attempts.
+
+        Entries that came from the retry queue are handed back to it with fail()
+        (the sqlite queue still holds their lease). Returns the backoff timestamp,
+        or None if the entry was dead-lettered.
+        """
+        url = entry["url"]
+        metadata = entry.get("metadata") or {}
+        now = datetime.now()
+        attempts = metadata.get("attempts", 0) + 1
+        error_class = self._scrape_failures.pop(url, "no_data")
+        metadata["attempts"] = attempts
+        metadata["error_class"] = error_class
+        metadata["last_error"] = f"{error_class} at {now.isoformat()}"
+        entry["metadata"] = metadata
+
+        not_before = self.retry_policy.next_attempt(attempts, error_class, now)
+        if not_before is None:
+            metadata.pop("not_before", None)
+            metadata["dead_lettered_at"] = now.isoformat()
+            self.dead_letter_queue.enqueue_entry(entry)
+            self.dead_letter_queue.save()
+            logger.warning(f"Dead-lettered {url} after {attempts} failed attempts ({error_class})")
+            return None
+
+        metadata["not_before"] = not_before.isoformat()
+        if from_retry_queue:
+            self.retry_queue.fail([entry])
+            self.retry_queue.save()
+        else:
+            self._add_to_retry_queue(entry)
+        return metadata["not_before"]
+
+    def _add_to_retry_queue(self, entry: Dict[str, Any]) -> None:
+        """Add a failed URL to the retry queue; it is retried once its not_before has passed."""
+        url = entry.get("url")
+        normalized_url = entry.get("normalized_url")
+        
+        # Only add if not already in retry queue
+        if normalized_url not in self.retry_queue:
             self.retry_queue.enqueue_entry(entry)
             self.retry_queue.save()
             logger.info(f"Added to retry queue: {url}")
         else:
             logger.debug(f"Already in retry queue: {url}")
 
+    def _renew_leases(self) -> None:
+        """
+        Extend the leases on the batch being processed, at most every third of
+        lease_seconds, so a long batch job or scrape window is not reclaimed
+        and scraped again by another worker. Nothing to do for JSON queues.
+        """
+        if not self._leased_batches:
+            return
+        if time.monotonic() - self._leases_renewed_at < self.queue_config["lease_seconds"] / 3:
+            return
+        for queue, entries in self._leased_batches:
+            if entries:
+                queue.renew(entries)
+        self._leases_renewed_at = time.monotonic()
+
+    def _dequeue_due_retries(self, batch_size: int) -> List[Dict[str, Any]]:
+        """
+        Due retry entries for the next batch: the retry share of the batch, or
+        whatever the pending queue cannot fill, never displacing realtime entries.
+        """
+        slots = max(self.retry_policy.retry_slots(batch_size), batch_size - len(self.pending_queue))
+        slots = min(slots, batch_size - self.pending_queue.counts()["realtime"])
+        return self.retry_queue.dequeue_due(slots)
+
+    def requeue_dead_letters(self) -> Dict[str, Any]:
+        """Give every dead-lettered URL a fresh set of attempts in the retry queue (e.g. after fixing the cause)."""
+        requeued = 0
+        while True:
+            entries = self.dead_letter_queue.dequeue_batch(100)
+            if not entries:
+                # Empty, or the rest is leased by another worker
+                break
+            for entry in entries:
+                metadata = entry.get("metadata") or {}
+                for key in ("attempts", "not_before", "dead_lettered_at"):
+                    metadata.pop(key, None)
+                entry["metadata"] = metadata
+                requeued += self.retry_queue.enqueue_entry(entry)
+            self.dead_letter_queue.ack(entries)
+        self.retry_queue.save()
+        self.dead_letter_queue.save()
+        logger.info(f"Requeued {requeued} dead-lettered URLs for retry")
+        return {
+            "operation": "requeue_dead_letters",
+            "requeued": requeued,
+            "retry_queue_size": len(self.retry_queue),
+        }
+
     def _enqueue_for_batch(
         self,
         url: str,
         category_shard_key: Optional[str] = None,
         source_category: Optional[str] = None,
+        priority: str = "discovery",
     ) -> Dict[str, Any]:
-        """Queue a URL for batched scraping, capturing skip/duplicate status."""
+        """
+        Queue a URL for batched scraping, capturing skip/duplicate status.
+
+        priority is the queue class (see queue_priority.py). Realtime and
+        refresh URLs are queued even when already indexed.
+        """
         normalized_url = self._normalize_url(url)
         result = {
             "url": url,
@@ -1376,15 +1937,18 @@ class AgnosticLLMsUpdater:
             "duplicate": False,
         }
 
-        if self._should_skip_existing(normalized_url):
+        if priority not in RESCRAPE_PRIORITIES and self._should_skip_existing(normalized_url):
             result["skipped_existing"] = True
             return result
 
-        metadata: Dict[str, Any] = {"attempts": 0}
+        metadata: Dict[str, Any] = {"attempts": 0, "priority": priority}
         if category_shard_key:
             metadata["category_shard_key"] = category_shard_key
         if source_category:
             metadata["source_category"] = source_category
+        if priority == "refresh":
+            existing = self.url_index.get(normalized_url) or {}
+            metadata["last_updated"] = existing.get("updated_at") or ""
 
         queued = self.pending_queue.enqueue(url, normalized_url, metadata)
         if queued:
@@ -1393,6 +1957,297 @@ class AgnosticLLMsUpdater:
             result["duplicate"] = True
         return result
 
+    def queue_realtime_update(self, urls: List[str], operation: str = "added") -> Dict[str, Any]:
+        """
+        Queue webhook URLs ahead of any backlog and process a batch, so they are
+        scraped in this run even when another worker is draining the queue.
+        """
+        queued = sum(1 for url in urls if self._enqueue_for_batch(url, priority="realtime")["queued"])
+        self.pending_queue.save()
+        logger.info(f"Queued {queued} {operation} URLs as realtime ({len(self.pending_queue)} queued in total)")
+        # Big enough for every realtime entry, plus backlog up to the usual batch size
+        realtime = self.pending_queue.counts()["realtime"]
+        result = self.process_queue_batch(max(self.batch_size or 0, realtime))
+        result["realtime_queued"] = queued
+        return result
+
+    def queue_stale_refreshes(self, limit: int) -> Dict[str, Any]:
+        """Queue the limit least recently scraped indexed products for a refresh scrape."""
+        stalest = heapq.nsmallest(
+            limit, ((record.get("updated_at") or "", url) for url, record in self.url_index.items())
+        )
+        queued = 0
+        for _, url in stalest:
+            record = self.url_index.get(url) or {}
+            if self._enqueue_for_batch(url, record_shard(record), priority="refresh")["queued"]:
+                queued += 1
+        self.pending_queue.save()
+        logger.info(f"Queued {queued} stale products for refresh")
+        return {"operation": "queue_stale_refreshes", "queued": queued, "queue_counts": self.pending_queue.counts()}
+
+    def _scrape_entries(
+        self, entries: List[Dict[str, Any]]
+    ) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """
+        Scrape queue entries, keeping up to self.concurrency requests in flight.
+
+        Yields (entry, scraped_data) pairs in input order so callers can apply
+        results to url_index/manifest from a single thread. scraped_data is None
+        when the scrape failed or raised. Entries repeating an earlier entry's
+        normalized_url are dropped, so each URL is scraped once.
+        """
+        unique: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            key = entry.get("normalized_url") or entry["url"]
+            if key in unique:
+                logger.debug(f"Skipping duplicate queue entry: {entry['url']}")
+                continue
+            unique[key] = entry
+        entries = list(unique.values())
+
+        def scrape(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            url = entry["url"]
+            try:
+                return self._scrape_url(url)
+            except Exception as exc:  # pragma: no cover - surface error but keep loop going
+                logger.error(f"Error scraping {url}: {exc}")
+                return None
+
+        if self.concurrency <= 1 or len(entries) <= 1:
+            for entry in entries:
+                scraped_data = scrape(entry)
+                self._renew_leases()
+                yield entry, scraped_data
+            return
+
+        workers = min(self.concurrency, len(entries))
+        logger.info(f"Scraping {len(entries)} URLs with {workers} concurrent workers")
+        # Only a bounded window of scrapes runs ahead of the consumer, so a slow
+        # consumer (e.g. a backed-up shard pipeline) pauses scraping
+        window = workers * 2
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape") as executor:
+            in_flight: List[Tuple[Dict[str, Any], Any]] = []
+            remaining = iter(entries)
+            for entry in remaining:
+                in_flight.append((entry, executor.submit(scrape, entry)))
+                if len(in_flight) >= window:
+                    break
+            while in_flight:
+                entry, future = in_flight.pop(0)
+                scraped_data = future.result()
+                self._renew_leases()
+                yield entry, scraped_data
+                next_entry = next(remaining, None)
+                if next_entry is not None:
+                    in_flight.append((next_entry, executor.submit(scrape, next_entry)))
+
+    def _load_batch_job(self) -> Optional[Dict[str, Any]]:
+        """Load the in-progress batch-scrape job left by a previous run, if any."""
+        if not os.path.exists(self.batch_job_path):
+            return None
+        try:
+            with open(self.batch_job_path, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load batch scrape job: {e}")
+            return None
+        if not isinstance(job, dict) or not job.get("id"):
+            return None
+        return job
+
+    def _save_batch_job(self, job: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.batch_job_path), exist_ok=True)
+        tmp_path = f"{self.batch_job_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.batch_job_path)
+
+    def _clear_batch_job(self) -> None:
+        if os.path.exists(self.batch_job_path):
+            os.remove(self.batch_job_path)
+
+    def _submit_batch_scrape(self, entries: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Submit product URLs as one Firecrawl batch-scrape job.
+
+        The job id and its queue entries are persisted before the pending and
+        retry queues are saved, so a run that dies while the job is running can
+        collect it on resume instead of re-paying for the scrapes. Saving the
+        queues also drops every other entry dequeued so far, so the caller must
+        have made their results durable first (see _batch_scrape_entries).
+        """
+        urls = [self._ensure_eur_currency(entry["url"]) for entry in entries]
+        try:
+            response = self._firecrawl_post(
+                "batch/scrape",
+                {
+                    "urls": urls,
+                    "formats": self._product_scrape_formats(),
+                    "onlyMainContent": False  # Need full page for breadcrumbs
+                }
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            logger.warning(f"Batch scrape submission failed: {e}")
+            return None
+
+        if not data.get("success") or not data.get("id"):
+            logger.warning(f"Batch scrape submission rejected: {data.get('error', data)}")
+            return None
+
+        job = {
+            "id": data["id"],
+            "submitted_at": datetime.now().isoformat(),
+            "entries": entries,
+        }
+        self._save_batch_job(job)
+        self.pending_queue.save()
+        self.retry_queue.save()
+        logger.info(f"Submitted batch scrape job {job['id']} with {len(urls)} URLs")
+        return job
+
+    def _collect_batch_job(
+        self, job: Dict[str, Any]
+    ) -> Optional[List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]]:
+        """
+        Poll a batch-scrape job until it finishes and pair its documents with the queued entries.
+
+        Returns (entry, scraped_data) pairs in the job's entry order; scraped_data
+        is None for URLs the job did not return or returned with an error status.
+        Returns None if the job is still running after batch_max_wait, leaving the
+        job file in place for the next run.
+        """
+        job_id = job["id"]
+        deadline = time.monotonic() + self.batch_max_wait
+        while True:
+            try:
+                response = self._firecrawl_get(f"batch/scrape/{job_id}")
+                response.raise_for_status()
+                status = response.json()
+            except Exception as e:
+                logger.warning(f"Failed to poll batch scrape job {job_id}: {e}")
+                status = {}
+
+            state = status.get("status")
+            if state in ("completed", "failed", "cancelled"):
+                break
+            if time.monotonic() >= deadline:
+                logger.warning(f"Batch scrape job {job_id} still '{state}' after {self.batch_max_wait}s")
+                return None
+            logger.info(
+                f"Batch scrape job {job_id}: {status.get('completed', 0)}/{status.get('total', '?')} done"
+            )
+            self._renew_leases()
+            time.sleep(self.batch_poll_interval)
+
+        # Gather every page of results
+        documents = list(status.get("data") or [])
+        next_url = status.get("next")
+        while next_url:
+            try:
+                response = self._firecrawl_get(next_url)
+                response.raise_for_status()
+                page = response.json()
+            except Exception as e:
+                logger.warning(f"Failed to fetch batch scrape results page for {job_id}: {e}")
+                break
+            documents.extend(page.get("data") or [])
+            next_url = page.get("next")
+
+        if state != "completed":
+            logger.warning(f"Batch scrape job {job_id} ended with status '{state}'")
+
+        by_url: Dict[str, Dict[str, Any]] = {}
+        error_status: Dict[str, int] = {}
+        for document in documents:
+            doc_metadata = document.get("metadata") or {}
+            source_url = doc_metadata.get("sourceURL") or doc_metadata.get("url")
+            if not source_url:
+                continue
+            if doc_metadata.get("statusCode", 200) >= 400:
+                error_status[self._normalize_url(source_url)] = doc_metadata["statusCode"]
+                continue
+            by_url[self._normalize_url(source_url)] = document
+
+        results: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]] = []
+        for entry in job.get("entries", []):
+            url = entry["url"]
+            eur_url = self._ensure_eur_currency(url)
+            document = by_url.get(self._normalize_url(eur_url)) or by_url.get(self._normalize_url(url))
+            scraped_data = None
+            status_code = error_status.get(self._normalize_url(eur_url)) or error_status.get(self._normalize_url(url))
+            if status_code:
+                self._scrape_failures[url] = error_class_for_status(status_code)
+            if document:
+                self.response_cache.put(self._product_scrape_payload(eur_url), {"success": True, "data": document})
+                try:
+                    scraped_data = self._build_product_result(url, eur_url, document)
+                except Exception as e:
+                    logger.error(f"Failed to parse batch scrape result for {url}: {e}")
+            results.append((entry, scraped_data))
+        return results
+
+    def _batch_scrape_entries(
+        self,
+        entries: List[Dict[str, Any]],
+        apply_result: Callable[[Dict[str, Any], Optional[Dict[str, Any]]], None],
+        persist_results: Callable[[], None]
+    ) -> Optional[str]:
+        """
+        Scrape queue entries with a single batch-scrape job for the product pages.
+
+        Category pages (which expand into further scrapes) still go through
+        _scrape_entries, as does everything if the job cannot be submitted.
+        Each (entry, scraped_data) pair is handed to apply_result: first the
+        category pages and cached products, then the job's results.
+
+        Submitting the job saves the queues, which drops every entry dequeued
+        so far, so persist_results is called first to write what has been
+        applied (including earlier batches) to the shards and index.
+
+        Returns the job id when the job outlived batch_max_wait; its entries
+        are then left unapplied and are collected by the next run.
+        """
+        product_entries = [entry for entry in entries if self._is_product_url(entry["url"])]
+        other_entries = [entry for entry in entries if not self._is_product_url(entry["url"])]
+
+        for entry, scraped_data in self._scrape_entries(other_entries):
+            apply_result(entry, scraped_data)
+
+        # Products with a fresh cached response don't need to be part of the job
+        uncached_entries = []
+        for entry in product_entries:
+            eur_url = self._ensure_eur_currency(entry["url"])
+            cached = self.response_cache.get(self._product_scrape_payload(eur_url))
+            if not (cached and cached.get("data")):
+                uncached_entries.append(entry)
+                continue
+            scraped_data = None
+            try:
+                scraped_data = self._build_product_result(entry["url"], eur_url, cached["data"])
+            except Exception as e:
+                logger.error(f"Failed to parse cached scrape result for {entry['url']}: {e}")
+            apply_result(entry, scraped_data)
+        product_entries = uncached_entries
+        if not product_entries:
+            return None
+
+        persist_results()
+        job = self._submit_batch_scrape(product_entries)
+        if not job:
+            logger.info("Falling back to per-URL scraping")
+            for entry, scraped_data in self._scrape_entries(product_entries):
+                apply_result(entry, scraped_data)
+            return None
+
+        collected = self._collect_batch_job(job)
+        if collected is None:
+            return job["id"]
+        for entry, scraped_data in collected:
+            apply_result(entry, scraped_data)
+        return None
+
     def process_queue_batch(self, batch_size: Optional[int] = None) -> Dict[str, Any]:
         """Process a batch (or batches) of queued URLs."""
         effective_batch = batch_size or self.batch_size
@@ -1425,84 +2280,166 @@ class AgnosticLLMsUpdater:
         skipped_existing = 0
         failed_urls: List[str] = []
         touched_shards: Set[str] = set()
-        written_files: List[str] = []
+        unwritten_shards: Set[str] = set()  # touched since the shards were last written (no pipeline)
+        shard_changes = ShardChanges()
         batches_executed = 0
         queue_mutated = False
+        batch_job_completed = False
+        pending_batch_job: Optional[str] = None
+        pending_batch: List[Dict[str, Any]] = []
+        retry_batch: List[Dict[str, Any]] = []
+        retried = 0
+        pipeline = self._new_shard_pipeline()
+
+        def apply_result(entry: Dict[str, Any], scraped_data: Optional[Dict[str, Any]]) -> None:
+            nonlocal processed_count
+            url = entry["url"]
+            normalized_url = entry["normalized_url"]
+            metadata = entry.get("metadata", {})
+
+            if not scraped_data:
+                # No immediate retry: the retry queue backs off per error class, so
+                # consistently failing URLs stop using API credits
+                failed_urls.append(url)
+                from_retry_queue = any(entry is retry_entry for retry_entry in retry_batch)
+                not_before = self._schedule_retry(entry, from_retry_queue)
+                if not_before:
+                    logger.warning(
+                        f"Failed to scrape {url}; retrying after {not_before} "
+                        f"(attempt {entry['metadata']['attempts']}, {entry['metadata']['error_class']})"
+                    )
+                return
 
-        while len(self.pending_queue) > 0 and batches_executed < self.max_batches:
-            batch = self.pending_queue.dequeue_batch(effective_batch)
-            if not batch:
-                break
+            category_shard_key = metadata.get("category_shard_key")
+            if category_shard_key:
+                shard_key = self._update_url_data_with_category(url, scraped_data, category_shard_key)
+            else:
+                shard_key = self._update_url_data(url, scraped_data)
 
-            queue_mutated = True
-            batches_executed += 1
-            requeue_entries: List[Dict[str, Any]] = []
+            touched_shards.add(shard_key)
+            unwritten_shards.add(shard_key)
+            processed_count += 1
+            self.existing_urls.add(normalized_url)
+            logger.info(f"Scraped {url} into shard '{shard_key}'")
+            if pipeline:
+                pipeline.record(shard_key)
+
+        def write_shards() -> None:
+            for shard_key in sorted(unwritten_shards):
+                shard_changes.merge(self._write_shard_file(shard_key, self.url_index.shard_urls(shard_key)))
+            unwritten_shards.clear()
+
+        def persist_results() -> None:
+            """Write everything applied so far to the shards and index (before the queues are saved)."""
+            if pipeline:
+                pipeline.drain()
+            elif unwritten_shards:
+                write_shards()
+                self._persist_index()
 
-            logger.info(
-                f"Processing batch {batches_executed}/{self.max_batches} with {len(batch)} queued URLs"
-            )
+        try:
+            # Finish a batch-scrape job left behind by an interrupted run before dequeuing more work
+            if self.scrape_engine == "batch":
+                job = self._load_batch_job()
+                if job:
+                    logger.info(f"Resuming batch scrape job {job['id']} ({len(job.get('entries', []))} URLs)")
+                    results = self._collect_batch_job(job)
+                    if results is None:
+                        pending_batch_job = job["id"]
+                    else:
+                        for entry, scraped_data in results:
+                            apply_result(entry, scraped_data)
+                        batch_job_completed = True
+
+            while pending_batch_job is None and batches_executed < self.max_batches:
+                # Retries that have come due share the batch with the pending queue
+                retry_batch = self._dequeue_due_retries(effective_batch)
+                pending_batch = self.pending_queue.dequeue_batch(effective_batch - len(retry_batch))
+                batch = pending_batch + retry_batch
+                if not batch:
+                    break
+                self._leased_batches = [(self.pending_queue, pending_batch), (self.retry_queue, retry_batch)]
+                self._leases_renewed_at = time.monotonic()
 
-            for entry in batch:
-                url = entry.get("url")
-                normalized_url = entry.get("normalized_url")
-                metadata = entry.get("metadata", {})
+                queue_mutated = True
+                batches_executed += 1
+                retried += len(retry_batch)
 
-                if not url or not normalized_url:
-                    logger.warning("Encountered malformed queue entry, skipping")
-                    continue
+                logger.info(
+                    f"Processing batch {batches_executed}/{self.max_batches} with {len(batch)} queued URLs"
+                    + (f" ({len(retry_batch)} due retries)" if retry_batch else "")
+                )
 
-                if self._should_skip_existing(normalized_url):
-                    skipped_existing += 1
-                    logger.info(f"⏭️  Skipping already-scraped URL: {url}")
-                    continue
+                scrape_entries: List[Dict[str, Any]] = []
+                for entry in batch:
+                    url = entry.get("url")
+                    normalized_url = entry.get("normalized_url")
 
-                try:
-                    scraped_data = self._scrape_url(url)
-                except Exception as exc:  # pragma: no cover - surface error but keep loop going
-                    logger.error(f"Error scraping {url}: {exc}")
-                    scraped_data = None
-
-                if not scraped_data:
-                    # CHANGED: No automatic retry - move to retry queue immediately
-                    # This prevents API wastage on consistently failing URLs
-                    attempts = metadata.get("attempts", 0) + 1
-                    metadata["attempts"] = attempts
-                    metadata["last_error"] = f"No data returned at {datetime.now().isoformat()}"
-                    entry["metadata"] = metadata
-                    
-                    # Add to failed_urls list for tracking
-                    failed_urls.append(url)
-                    
-                    # Save to retry queue for manual review/retry later
-                    self._add_to_retry_queue(entry)
-                    logger.warning(f"Failed to scrape {url}; moved to retry queue (attempt {attempts})")
-                    continue
+                    if not url or not normalized_url:
+                        logger.warning("Encountered malformed queue entry, skipping")
+                        continue
 
-                category_shard_key = metadata.get("category_shard_key")
-                if category_shard_key:
-                    shard_key = self._update_url_data_with_category(url, scraped_data, category_shard_key)
-                else:
-                    shard_key = self._update_url_data(url, scraped_data)
+                    if entry_priority(entry) not in RESCRAPE_PRIORITIES and self._should_skip_existing(normalized_url):
+                        skipped_existing += 1
+                        logger.info(f"⏭️  Skipping already-scraped URL: {url}")
+                        continue
 
-                touched_shards.add(shard_key)
-                processed_count += 1
-                self.existing_urls.add(normalized_url)
-                logger.info(f"Scraped {url} into shard '{shard_key}'")
+                    scrape_entries.append(entry)
 
-            # NOTE: Removed automatic re-queueing to prevent API wastage
-            # Failed URLs are now moved to retry queue for manual review
+                if self.scrape_engine == "batch":
+                    pending_batch_job = self._batch_scrape_entries(scrape_entries, apply_result, persist_results)
+                    if pending_batch_job is None and any(
+                        self._is_product_url(entry["url"]) for entry in scrape_entries
+                    ):
+                        batch_job_completed = True
+                else:
+                    # Scrapes run on worker threads; results are applied here, on a single thread
+                    for entry, scraped_data in self._scrape_entries(scrape_entries):
+                        apply_result(entry, scraped_data)
+
+                # Every entry is now done, scheduled in the retry queue, dead-lettered,
+                # or owned by the pending batch job file
+                self.pending_queue.ack(pending_batch)
+                self.retry_queue.ack(retry_batch)
+                self._leased_batches = []
+                pending_batch = []
+                retry_batch = []
+        except BaseException:
+            self._leased_batches = []
+            # Hand unfinished entries back (already-scraped ones are skipped when reclaimed)
+            if pending_batch:
+                self.pending_queue.fail(pending_batch)
+            if retry_batch:
+                self.retry_queue.fail(retry_batch)
+            # Keep what was scraped before the failure, then save the queues: a mid-batch
+            # retry-queue save may already have journaled the dequeue of the entries handed back
+            if pipeline:
+                pipeline.finish()
+            elif unwritten_shards:
+                write_shards()
+                self._persist_index()
+            self.pending_queue.save()
+            self.retry_queue.save()
+            raise
 
         # Persist queue changes if anything was dequeued or requeued
         if queue_mutated:
             self.pending_queue.save()
+        if retried:
+            self.retry_queue.save()
 
-        # Write updated shard files and persist manifests/index
-        if processed_count:
-            for shard_key in touched_shards:
-                if shard_key in self.manifest:
-                    written_files.extend(self._write_shard_file(shard_key, self.manifest[shard_key]))
-            self._save_url_index()
-            self._save_manifest()
+        # Write updated shard files and persist the index
+        if pipeline:
+            shard_changes.merge(pipeline.finish())
+            if self.journal.entries:
+                self._persist_index()
+        elif unwritten_shards:
+            write_shards()
+            self._persist_index()
+
+        # Results are durable now, so the finished job no longer needs to be resumable
+        if batch_job_completed and pending_batch_job is None:
+            self._clear_batch_job()
 
         # Log batch processing summary
         total_processed = processed_count + skipped_existing
@@ -1511,20 +2448,34 @@ class AgnosticLLMsUpdater:
             logger.info(f"   ✅ Processed: {processed_count} URLs")
             if skipped_existing > 0:
                 logger.info(f"   ⏭️  Skipped: {skipped_existing} already-scraped URLs")
+            if retried:
+                logger.info(f"   🔁 Retried: {retried} URLs whose backoff had passed")
             if failed_urls:
-                logger.info(f"   ⚠️  Failed: {len(failed_urls)} URLs (moved to retry queue)")
+                logger.info(f"   ⚠️  Failed: {len(failed_urls)} URLs (scheduled for retry or dead-lettered)")
             logger.info(f"   📦 Queue remaining: {len(self.pending_queue)} URLs")
+            if self.response_cache.hits:
+                logger.info(f"   💾 Served from cache: {self.response_cache.hits} responses")
+        if pending_batch_job:
+            logger.info(f"   ⏳ Batch scrape job {pending_batch_job} still running; rerun to collect its results")
 
-        return {
+        result = {
             "operation": "process_queue_batch",
             "processed_urls": processed_count,
             "skipped_existing": skipped_existing,
             "failed_urls": failed_urls,
+            "retried_urls": retried,
             "queue_size": len(self.pending_queue),
+            "retry_queue_size": len(self.retry_queue),
+            "dead_letter_size": len(self.dead_letter_queue),
             "batch_size": effective_batch,
             "batches_executed": batches_executed,
-            "written_files": written_files,
+            **shard_changes.to_dict(),
+            "touched_shards": sorted(touched_shards),
         }
+        if self.scrape_engine == "batch":
+            result["scrape_engine"] = "batch"
+            result["pending_batch_job"] = pending_batch_job
+        return result
     
     def full_crawl(self, limit: int = 10000) -> Dict[str, Any]:
         """Perform full crawl of the website."""
@@ -1538,120 +2489,293 @@ class AgnosticLLMsUpdater:
         # Process URLs
         processed_count = 0
         touched_shards = set()
+        pipeline = self._new_shard_pipeline()
         
-        for i, url in enumerate(urls):
-            logger.info(f"Processing {i+1}/{len(urls)}: {url}")
-            
-            scraped_data = self._scrape_url(url)
-            if scraped_data:
-                shard_key = self._update_url_data(url, scraped_data)
-                touched_shards.add(shard_key)
-                processed_count += 1
-            
-            # Rate limiting
-            time.sleep(0.1)
-        
-        # Write shard files
-        written_files = []
-        for shard_key in touched_shards:
-            if shard_key in self.manifest:
-                filepaths = self._write_shard_file(shard_key, self.manifest[shard_key])
-                written_files.extend(filepaths)
+        try:
+            for i, url in enumerate(urls):
+                logger.info(f"Processing {i+1}/{len(urls)}: {url}")
+                
+                scraped_data = self._scrape_url(url)
+                if scraped_data:
+                    shard_key = self._update_url_data(url, scraped_data)
+                    touched_shards.add(shard_key)
+                    processed_count += 1
+                    if pipeline:
+                        pipeline.record(shard_key)
+        except BaseException:
+            if pipeline:
+                # Keep what was scraped before the failure
+                pipeline.finish()
+            raise
         
-        # Save index and manifest
-        self._save_url_index()
-        self._save_manifest()
+        if pipeline:
+            shard_changes = pipeline.finish()
+            if self.journal.entries:
+                self._persist_index()
+        else:
+            # Write shard files
+            shard_changes = ShardChanges()
+            for shard_key in touched_shards:
+                shard_changes.merge(self._write_shard_file(shard_key, self.url_index.shard_urls(shard_key)))
+            
+            # Save index
+            self._persist_index()
         
         return {
             "operation": "full_crawl",
             "processed_urls": processed_count,
             "total_urls": len(urls),
             "touched_shards": list(touched_shards),
-            "written_files": written_files
+            **shard_changes.to_dict()
         }
     
     def hierarchical_discovery(self, main_category_url: str, max_products_per_category: int = 50, max_categories: int = 10) -> Dict[str, Any]:
-        """Discover and scrape products using the full 4-level hierarchy."""
+        """
+        Discover products using the full 4-level hierarchy, then scrape them from the pending queue.
+
+        Level 2 and level 3 pages are discovered concurrently (see
+        _run_hierarchical_discovery); every product found is queued as soon as
+        its category page is done, and scraping starts only once discovery is
+        complete.
+
+        Progress is kept in the discovery frontier (discovery-frontier.json):
+        a rerun only visits pages that are new, unfinished, failed or older
+        than revisit_after_hours, and subcategories beyond max_categories are
+        left pending for the next run rather than dropped.
+        """
         logger.info(f"Starting hierarchical discovery from: {main_category_url}")
         
-        # Level 1: Discover subcategories from main category page
-        logger.info("Level 1: Discovering subcategories...")
-        subcategory_urls = self._discover_subcategories(main_category_url)
-        
-        if not subcategory_urls:
-            return {"error": "No subcategories found in main category page"}
-        
-        logger.info(f"Found {len(subcategory_urls)} subcategories")
-        
-        # Limit subcategories for testing
-        if max_categories and len(subcategory_urls) > max_categories:
-            subcategory_urls = subcategory_urls[:max_categories]
-            logger.info(f"Limited to first {max_categories} subcategories for testing")
-        
-        total_processed = 0
-        total_products = 0
-        all_touched_shards = set()
-        all_written_files = []
+        discovery: Dict[str, Any] = {
+            "categories_visited": 0,
+            "discovered_total": 0,
+            "queued_new": 0,
+            "duplicates": 0,
+            "skipped_existing": 0,
+        }
+        subcategory_urls: List[str] = []
+        remaining_subcategories = 0
+        frontier = self.discovery_frontier
         
-        # Level 2: For each subcategory, discover product categories
-        for i, subcategory_url in enumerate(subcategory_urls, 1):
-            logger.info(f"Level 2 ({i}/{len(subcategory_urls)}): Processing subcategory: {subcategory_url}")
+        if self.disable_discovery:
+            logger.info("Discovery disabled; will use existing pending queue only")
+        else:
+            main_key = self._normalize_url(main_category_url)
+            frontier.add(main_category_url, main_key, depth=1)
+            
+            if frontier.is_due(main_key):
+                # Level 1: Discover subcategories from main category page
+                logger.info("Level 1: Discovering subcategories...")
+                discovered = self._discover_subcategories(main_category_url)
+                for url in discovered:
+                    frontier.add(url, self._normalize_url(url), depth=2, parent=main_key)
+                if discovered:
+                    frontier.mark(main_key, "done", found=len(discovered))
+                    logger.info(f"Found {len(discovered)} subcategories")
+                elif frontier.children(main_key):
+                    frontier.mark(main_key, "failed")
+                    logger.warning("Subcategory discovery failed; continuing with the frontier's known subcategories")
+                else:
+                    frontier.mark(main_key, "failed")
+                    if not self.dry_run:
+                        frontier.save()
+                    return {"error": "No subcategories found in main category page"}
+            else:
+                logger.info(f"Level 1: using {len(frontier.children(main_key))} known subcategories from the discovery frontier")
+            
+            due_subcategories = frontier.due(2, parent=main_key)
+            subcategory_urls = [entry["url"] for entry in due_subcategories]
+            
+            # Limit subcategories per run; the rest stay pending in the frontier
+            if max_categories and len(subcategory_urls) > max_categories:
+                remaining_subcategories = len(subcategory_urls) - max_categories
+                subcategory_urls = subcategory_urls[:max_categories]
+                logger.info(
+                    f"Limited to first {max_categories} subcategories; "
+                    f"{remaining_subcategories} remain pending in the discovery frontier"
+                )
             
-            # Discover product categories from subcategory page
-            product_category_urls = self._discover_product_categories(subcategory_url)
+            # Product categories left unfinished under subcategories that are themselves done
+            category_urls: List[str] = []
+            for entry in frontier.children(main_key):
+                parent_key = self._normalize_url(entry["url"])
+                if not frontier.is_due(parent_key):
+                    category_urls.extend(child["url"] for child in frontier.due(3, parent=parent_key))
             
-            if not product_category_urls:
-                logger.warning(f"No product categories found in: {subcategory_url}")
-                # Try to scrape products directly from this subcategory (it might be a product page itself)
-                logger.info(f"Attempting to scrape products directly from: {subcategory_url}")
-                result = self.auto_discover_products(subcategory_url, max_products_per_category)
-                
-                if "error" not in result:
-                    total_processed += result.get("processed_urls", 0)
-                    total_products += result.get("total_urls", 0)
-                    all_touched_shards.update(result.get("touched_shards", []))
-                    all_written_files.extend(result.get("written_files", []))
-                continue
+            if not subcategory_urls and not category_urls:
+                logger.info("Discovery frontier is up to date; nothing to revisit")
             
-            logger.info(f"Found {len(product_category_urls)} product categories in subcategory")
-            
-            # Level 3: For each product category, discover and scrape products
-            for j, product_category_url in enumerate(product_category_urls, 1):
-                logger.info(f"Level 3 ({j}/{len(product_category_urls)}): Processing product category: {product_category_url}")
-                
-                # Use existing auto_discover_products method for Level 3 → Level 4
-                result = self.auto_discover_products(product_category_url, max_products_per_category)
-                
-                if "error" not in result:
-                    total_processed += result.get("processed_urls", 0)
-                    total_products += result.get("total_urls", 0)
-                    all_touched_shards.update(result.get("touched_shards", []))
-                    all_written_files.extend(result.get("written_files", []))
+            discovery = self._run_hierarchical_discovery(subcategory_urls, max_products_per_category, category_urls)
+            if not self.dry_run:
+                if discovery["queued_new"]:
+                    self.pending_queue.save()
+                frontier.save()
         
-        return {
+        result: Dict[str, Any] = {
             "operation": "hierarchical_discovery",
-            "processed_urls": total_processed,
-            "total_urls": total_products,
             "subcategories_processed": len(subcategory_urls),
-            "touched_shards": list(all_touched_shards),
-            "written_files": all_written_files
+            "subcategories_remaining": remaining_subcategories,
+            "frontier": frontier.summary(),
+            **discovery,
         }
+        
+        if self.discovery_only:
+            logger.info(f"🔍 Discovery-only mode: {discovery['queued_new']} URLs queued, skipping batch processing")
+            result.update(
+                {
+                    "processed_urls": 0,
+                    "total_urls": discovery["discovered_total"],
+                    "touched_shards": [],
+                    **ShardChanges().to_dict(),
+                    "queue_after": len(self.pending_queue),
+                    "discovery_only": True,
+                }
+            )
+            return result
+        
+        # Without --batch-size the whole queue is scraped in one go, as before
+        batch_summary = self.process_queue_batch(self.batch_size or max(len(self.pending_queue), 1))
+        result.update(
+            {
+                "processed_urls": batch_summary.get("processed_urls", 0),
+                "total_urls": discovery["discovered_total"],
+                "touched_shards": batch_summary.get("touched_shards", []),
+                "written_files": batch_summary.get("written_files", []),
+                "added_files": batch_summary.get("added_files", []),
+                "deleted_files": batch_summary.get("deleted_files", []),
+                "queue_after": batch_summary.get("queue_size", len(self.pending_queue)),
+                "batch": batch_summary,
+            }
+        )
+        return result
+    
+    def _run_hierarchical_discovery(
+        self,
+        subcategory_urls: List[str],
+        max_products_per_category: int,
+        category_urls: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fan out level 2 (product categories) and level 3 (product links) discovery concurrently.
+
+        Page fetches run on worker threads, paced by the shared rate limiter.
+        Results are handled on this thread: the discovery frontier plus one
+        visited set dedupe category and product URLs across the whole walk,
+        and each category's products go straight into the pending queue.
+        Queue and frontier are checkpointed every few seconds so an
+        interrupted run resumes close to where it stopped.
+        """
+        workers = max(self.concurrency, self.rate_limiter.max_in_flight)
+        frontier = self.discovery_frontier
+        scheduled: Set[str] = set()
+        visited_products: Set[str] = set()
+        last_checkpoint = time.monotonic()
+        stats = {
+            "categories_visited": 0,
+            "discovered_total": 0,
+            "queued_new": 0,
+            "duplicates": 0,
+            "skipped_existing": 0,
+        }
+        
+        def checkpoint() -> None:
+            if self.dry_run:
+                return
+            # Queue first: a page is only marked done once its products are safely queued
+            self.pending_queue.save()
+            frontier.save()
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="discover") as executor:
+            pending: Dict[Any, Tuple[str, str, str]] = {}
+            
+            def schedule(level: str, url: str, key: str) -> None:
+                scheduled.add(key)
+                frontier.mark(key, "in_progress")
+                if level == "subcategory":
+                    future = executor.submit(self._discover_product_categories, url)
+                else:
+                    future = executor.submit(self._discover_category_products, url, max_products_per_category)
+                pending[future] = (level, url, key)
+            
+            for url in subcategory_urls:
+                key = self._normalize_url(url)
+                if key not in scheduled:
+                    schedule("subcategory", url, key)
+            for url in category_urls or []:
+                key = self._normalize_url(url)
+                if key not in scheduled:
+                    schedule("category", url, key)
+            
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    level, url, key = pending.pop(future)
+                    try:
+                        found = future.result()
+                    except Exception as e:
+                        logger.error(f"Discovery failed for {url}: {e}")
+                        found = None
+                    stats["categories_visited"] += 1
+                    
+                    if level == "subcategory":
+                        if not found:
+                            # It might list products itself
+                            logger.info(f"No product categories found in {url}; looking for products directly")
+                            schedule("category", url, key)
+                            continue
+                        logger.info(f"Level 2: {len(found)} product categories in {url}")
+                        for category_url in found:
+                            category_key = self._normalize_url(category_url)
+                            frontier.add(category_url, category_key, depth=3, parent=key)
+                            if category_key not in scheduled and frontier.is_due(category_key):
+                                schedule("category", category_url, category_key)
+                        frontier.mark(key, "done", found=len(found))
+                        continue
+                    
+                    if found is None:
+                        frontier.mark(key, "failed")
+                        continue
+                    
+                    # Level 3 → 4: queue the category's products
+                    category_shard_key = self._get_shard_key_from_category_url(url)
+                    for product_url in found:
+                        normalized = self._normalize_url(product_url)
+                        if normalized in visited_products:
+                            stats["duplicates"] += 1
+                            continue
+                        visited_products.add(normalized)
+                        stats["discovered_total"] += 1
+                        enqueue_result = self._enqueue_for_batch(product_url, category_shard_key, url)
+                        if enqueue_result["queued"]:
+                            stats["queued_new"] += 1
+                        elif enqueue_result["duplicate"]:
+                            stats["duplicates"] += 1
+                        elif enqueue_result["skipped_existing"]:
+                            stats["skipped_existing"] += 1
+                    frontier.mark(key, "done", found=len(found))
+                    logger.info(f"Level 3: {len(found)} products in {url} ({stats['queued_new']} queued so far)")
+                
+                if time.monotonic() - last_checkpoint >= 5:
+                    checkpoint()
+                    last_checkpoint = time.monotonic()
+        
+        logger.info(f"📊 Discovery Summary: {stats['discovered_total']} URLs found in {stats['categories_visited']} pages")
+        if stats["skipped_existing"] > 0:
+            logger.info(f"   ⏭️  Skipped {stats['skipped_existing']} already-scraped URLs")
+        if stats["duplicates"] > 0:
+            logger.info(f"   🔁 Skipped {stats['duplicates']} duplicate URLs")
+        logger.info(f"   ✅ Queued {stats['queued_new']} new URLs for scraping")
+        return stats
     
     def _discover_subcategories(self, main_category_url: str) -> List[str]:
         """Discover subcategory URLs from a main category page (Level 1 → Level 2)."""
         try:
-            # Rate limiting: wait 1 second before API call
-            time.sleep(1)
-            
-            response = requests.post(
-                f"{self.firecrawl_base_url}/map",
-                headers=self.headers,
-                json={
+            response = self._firecrawl_post(
+                "map",
+                {
                     "url": main_category_url,
                     "limit": 100,  # Get more URLs to filter from
                     "includeSubdomains": False
-                },
-                timeout=90  # 90 second timeout for map operations
+                }
             )
             
             if response.status_code == 200:
@@ -1679,20 +2803,15 @@ class AgnosticLLMsUpdater:
     def _discover_product_categories(self, subcategory_url: str) -> List[str]:
         """Discover product category URLs from a subcategory page (Level 2 → Level 3)."""
         try:
-            # Rate limiting: wait 1 second before API call
-            time.sleep(1)
-            
             # Use SCRAPE with links format to get all links from the page
             # SCRAPE is better than MAP here because it gets all links from rendered page
-            response = requests.post(
-                f"{self.firecrawl_base_url}/scrape",
-                headers=self.headers,
-                json={
+            response = self._firecrawl_post(
+                "scrape",
+                {
                     "url": subcategory_url,
                     "formats": ["links"]
                     # NOT using onlyMainContent to ensure we get all category links (nav included)
-                },
-                timeout=60  # 60 second timeout for scrape operations
+                }
             )
             
             if response.status_code == 200:
@@ -1700,15 +2819,8 @@ class AgnosticLLMsUpdater:
                 links_data = data.get("data", {}).get("links", [])
                 
                 # Extract URLs from response (handle both list of strings and list of objects)
-                all_urls = []
-                if links_data and len(links_data) > 0:
-                    if isinstance(links_data[0], str):
-                        all_urls = links_data
-                    elif isinstance(links_data[0], dict):
-                        all_urls = [link.get("url") or link.get("href") 
-                                   for link in links_data 
-                                   if link.get("url") or link.get("href")]
-                else:
+                all_urls = self._link_urls(links_data)
+                if not links_data:
                     logger.warning(f"SCRAPE API returned empty links data for {subcategory_url}")
                     logger.debug(f"Response structure: {data}")
                 
@@ -1800,6 +2912,16 @@ class AgnosticLLMsUpdater:
         
         return True
 
+    def _discover_category_products(self, category_url: str, max_products: int) -> Optional[List[str]]:
+        """Product URLs listed on a category page (Level 3 → Level 4), or None if the page could not be fetched."""
+        # Links only: the products themselves are scraped (or queued) later, once
+        category_data = self._fetch_category_links(category_url)
+        if not category_data:
+            return None
+        return self._extract_product_urls_with_ai(
+            category_data["content"], category_url, max_products, links=category_data["links"]
+        )
+
     def auto_discover_products(self, category_url: str, max_products: int = 50) -> Dict[str, Any]:
         """Auto-discover and scrape products from a category page using AI-powered link extraction."""
         logger.info(f"Auto-discovering products from: {category_url}")
@@ -1810,20 +2932,16 @@ class AgnosticLLMsUpdater:
         if self.disable_discovery:
             logger.info("Discovery disabled; will use existing pending queue only")
         else:
-            category_data = self._scrape_url(category_url)
-            if not category_data:
+            extracted_urls = self._discover_category_products(category_url, max_products)
+            if extracted_urls is None:
                 discovery_errors.append("failed_to_scrape_category")
-            else:
-                extracted_urls = self._extract_product_urls_with_ai(
-                    category_data["content"], category_url, max_products
+            elif extracted_urls:
+                product_urls = list(dict.fromkeys(extracted_urls))
+                logger.info(
+                    f"Found {len(extracted_urls)} product URLs, {len(product_urls)} unique URLs to process"
                 )
-                if extracted_urls:
-                    product_urls = list(dict.fromkeys(extracted_urls))
-                    logger.info(
-                        f"Found {len(extracted_urls)} product URLs, {len(product_urls)} unique URLs to process"
-                    )
-                else:
-                    discovery_errors.append("no_product_urls_found")
+            else:
+                discovery_errors.append("no_product_urls_found")
 
         discovered_total = len(product_urls)
         result_base: Dict[str, Any] = {
@@ -1918,73 +3036,78 @@ class AgnosticLLMsUpdater:
         processed_count = 0
         touched_shards = set()
         skipped_existing = 0
-        written_files: List[str] = []
+        shard_changes = ShardChanges()
+        pipeline = self._new_shard_pipeline()
 
-        for url in product_urls:
-            logger.info(f"Processing product: {url}")
-            normalized = self._normalize_url(url)
-            if self._should_skip_existing(normalized):
-                skipped_existing += 1
-                continue
+        try:
+            for url in product_urls:
+                logger.info(f"Processing product: {url}")
+                normalized = self._normalize_url(url)
+                if self._should_skip_existing(normalized):
+                    skipped_existing += 1
+                    continue
 
-            scraped_data = self._scrape_url(url)
-            if scraped_data:
-                shard_key = self._update_url_data_with_category(url, scraped_data, category_shard_key)
-                touched_shards.add(shard_key)
-                processed_count += 1
-                self.existing_urls.add(normalized)
-            time.sleep(0.1)
+                scraped_data = self._scrape_url(url)
+                if scraped_data:
+                    shard_key = self._update_url_data_with_category(url, scraped_data, category_shard_key)
+                    touched_shards.add(shard_key)
+                    processed_count += 1
+                    self.existing_urls.add(normalized)
+                    if pipeline:
+                        pipeline.record(shard_key)
+        except BaseException:
+            if pipeline:
+                # Keep what was scraped before the failure
+                pipeline.finish()
+            raise
 
-        if processed_count:
+        if pipeline:
+            shard_changes.merge(pipeline.finish())
+            if self.journal.entries:
+                self._persist_index()
+        elif processed_count:
             for shard_key in touched_shards:
-                if shard_key in self.manifest:
-                    written_files.extend(self._write_shard_file(shard_key, self.manifest[shard_key]))
-            self._save_url_index()
-            self._save_manifest()
+                shard_changes.merge(self._write_shard_file(shard_key, self.url_index.shard_urls(shard_key)))
+            self._persist_index()
 
         result_base.update(
             {
                 "processed_urls": processed_count,
                 "total_urls": discovered_total,
                 "touched_shards": list(touched_shards),
-                "written_files": written_files,
+                **shard_changes.to_dict(),
                 "skipped_existing": skipped_existing,
             }
         )
 
         return result_base
     
-    def _extract_product_urls_with_ai(self, content: str, base_url: str, max_products: int) -> List[str]:
-        """Extract product URLs from page content using Scrape API with links format."""
+    def _extract_product_urls_with_ai(
+        self, content: str, base_url: str, max_products: int, links: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Extract product URLs from page content using Scrape API with links format.
+
+        Pass links already fetched with the page (see _fetch_category_links) to
+        skip the extra links scrape.
+        """
         try:
-            # Rate limiting: wait 1 second before API call
-            time.sleep(1)
-            
-            # Use Firecrawl's scrape with links format to get all links from rendered page
-            logger.info("Using Firecrawl scrape to discover product URLs...")
-            response = requests.post(
-                f"{self.firecrawl_base_url}/scrape",
-                headers=self.headers,
-                json={
-                    "url": base_url,
-                    "formats": ["links"],
-                    "onlyMainContent": True  # Focus on main content, not nav/footer
-                },
-                timeout=60  # 60 second timeout for scrape operations
-            )
+            if links is None:
+                # Use Firecrawl's scrape with links format to get all links from rendered page
+                logger.info("Using Firecrawl scrape to discover product URLs...")
+                response = self._firecrawl_post(
+                    "scrape",
+                    {
+                        "url": base_url,
+                        "formats": ["links"],
+                        "onlyMainContent": True  # Focus on main content, not nav/footer
+                    }
+                )
+                if response.status_code == 200:
+                    links = self._link_urls(response.json().get("data", {}).get("links", []))
             
-            if response.status_code == 200:
-                data = response.json()
-                # Extract links from the response
-                links_data = data.get("data", {}).get("links", [])
-                
-                # Handle both list of strings and list of objects
-                all_urls = []
-                if links_data:
-                    if isinstance(links_data[0], str):
-                        all_urls = links_data
-                    elif isinstance(links_data[0], dict):
-                        all_urls = [link.get("url") or link.get("href") for link in links_data if link.get("url") or link.get("href")]
+            if links:
+                all_urls = links
                 
                 # Filter for product URLs
                 product_urls = []
@@ -2138,19 +3261,15 @@ class AgnosticLLMsUpdater:
         normalized_url = self._normalize_url(url)
         
         # Update URL index with the provided category shard key
-        self.url_index[normalized_url] = {
+        record = {
             "title": scraped_data.get("title", ""),
-            "markdown": scraped_data.get("content", ""),
+            **content_fields(scraped_data.get("content", "")),
             "shard": category_shard_key,
             "updated_at": scraped_data.get("scraped_at", datetime.now().isoformat())
         }
-        
-        # Update manifest with the provided category shard key
-        if category_shard_key not in self.manifest:
-            self.manifest[category_shard_key] = []
-        
-        if normalized_url not in self.manifest[category_shard_key]:
-            self.manifest[category_shard_key].append(normalized_url)
+        self._log_changed_fields(normalized_url, record)
+        self._journal_put(normalized_url, record)
+        self.url_index[normalized_url] = record
 
         self.existing_urls.add(normalized_url)
 
@@ -2163,7 +3282,8 @@ class AgnosticLLMsUpdater:
         
         processed_count = 0
         touched_shards = set()
-        written_files = []
+        shard_changes = ShardChanges()
+        removed: List[Tuple[str, Optional[str]]] = []
         
         if operation in ["added", "changed"]:
             # Process URLs to add/update
@@ -2200,7 +3320,6 @@ class AgnosticLLMsUpdater:
                             except Exception as e:
                                 logger.error(f"Error processing product URL {product_url}: {e}")
                                 # Continue processing other URLs instead of failing completely
-                            time.sleep(0.1)
                         # Skip the original category page processing since we processed individual products
                         continue
                     else:
@@ -2231,8 +3350,6 @@ class AgnosticLLMsUpdater:
                     except Exception as e:
                         logger.error(f"Error processing URL {url}: {e}")
                         # Continue processing other URLs instead of failing completely
-                
-                time.sleep(0.1)
         
         elif operation == "removed":
             # Remove URLs
@@ -2260,12 +3377,10 @@ class AgnosticLLMsUpdater:
                         # Remove each extracted product URL
                         for product_url in removed_product_urls:
                             logger.info(f"Removing product URL: {product_url}")
-                            self._remove_url_data(product_url)
+                            removed.append((product_url, self._remove_url_data(product_url)))
                             processed_count += 1
                         # After removal, ensure shard file for this category is rewritten to trigger hash change
-                        if shard_key in self.manifest:
-                            filepaths = self._write_shard_file(shard_key, self.manifest[shard_key])
-                            written_files.extend(filepaths)
+                        shard_changes.merge(self._write_shard_file(shard_key, self.url_index.shard_urls(shard_key)))
                     else:
                         logger.warning("Could not extract removed product URLs from diff; attempting fallback scrape to diff against manifest")
                         # Fallback: scrape current category page, extract product URLs, and remove those missing
@@ -2276,43 +3391,40 @@ class AgnosticLLMsUpdater:
                             shard_key = self._get_shard_key_from_category_url(url)
                             touched_shards.add(shard_key)
                             # Get existing URLs for this shard from manifest
-                            existing_urls = list(self.manifest.get(shard_key, []))
+                            existing_urls = self.url_index.shard_urls(shard_key)
                             to_remove = [u for u in existing_urls if u not in current_set]
                             if to_remove:
                                 logger.info(f"Fallback removal identified {len(to_remove)} URLs to remove from shard {shard_key}")
                                 for product_url in to_remove:
-                                    self._remove_url_data(product_url)
+                                    removed.append((product_url, self._remove_url_data(product_url)))
                                     processed_count += 1
-                                if shard_key in self.manifest:
-                                    filepaths = self._write_shard_file(shard_key, self.manifest[shard_key])
-                                    written_files.extend(filepaths)
+                                shard_changes.merge(self._write_shard_file(shard_key, self.url_index.shard_urls(shard_key)))
                             else:
                                 logger.info("Fallback removal found no URLs to remove")
                 else:
                     # Direct product URL removal or no diff extraction
                     normalized_url = self._normalize_url(url)
                     if normalized_url in self.url_index:
-                        shard_key = self.url_index[normalized_url]["shard_key"]
-                        touched_shards.add(shard_key)
-                    self._remove_url_data(url)
+                        shard_key = record_shard(self.url_index[normalized_url])
+                        if shard_key:
+                            touched_shards.add(shard_key)
+                    removed.append((url, self._remove_url_data(url)))
                     processed_count += 1
         
         # Write shard files for all touched shards
         for shard_key in touched_shards:
-            if shard_key in self.manifest:
-                filepaths = self._write_shard_file(shard_key, self.manifest[shard_key])
-                written_files.extend(filepaths)
+            shard_changes.merge(self._write_shard_file(shard_key, self.url_index.shard_urls(shard_key)))
+        self._verify_removed(removed)
         
-        # Save index and manifest
-        self._save_url_index()
-        self._save_manifest()
+        # Save index
+        self._persist_index()
         
         return {
             "operation": f"incremental_{operation}",
             "processed_urls": processed_count,
             "total_urls": len(urls),
             "touched_shards": list(touched_shards),
-            "written_files": written_files
+            **shard_changes.to_dict()
         }
 
 
@@ -2328,10 +3440,17 @@ def main():
     group.add_argument("--full", action="store_true", help="Perform full crawl")
     group.add_argument("--auto-discover", type=str, help="Auto-discover and scrape all products from a category page URL")
     group.add_argument("--hierarchical", type=str, help="Hierarchical discovery from main category page (Level 1 → Level 4)")
-    group.add_argument("--process-retry-queue", action="store_true", help="Process URLs from the retry queue")
+    group.add_argument("--process-retry-queue", action="store_true",
+                       help="Retry every URL in the retry queue now, before its backoff has passed "
+                            "(due retries are also picked up by normal batch runs)")
+    group.add_argument("--requeue-dead-letters", action="store_true",
+                       help="Move dead-lettered URLs back to the retry queue with their attempts reset")
     group.add_argument("--added", type=str, help="JSON array of URLs to add")
     group.add_argument("--changed", type=str, help="JSON array of URLs to update")
     group.add_argument("--removed", type=str, help="JSON array of URLs to remove")
+    group.add_argument("--compact-journal", action="store_true", help="Fold the index journal into the index file")
+    group.add_argument("--refresh-stale", type=int, metavar="N",
+                       help="Queue the N least recently scraped products for refresh, then process the queue")
     
     # Optional arguments
     parser.add_argument(
@@ -2360,7 +3479,7 @@ def main():
         "--max-categories",
         type=int,
         default=10,
-        help="Maximum number of subcategories to process in hierarchical mode (default: 10)"
+        help="Maximum number of subcategories to visit per run in hierarchical mode; the rest stay in the discovery frontier for the next run (default: 10)"
     )
     parser.add_argument(
         "--output-dir",
@@ -2422,6 +3541,79 @@ def main():
         action="store_true",
         help="Skip discovery and only process from the existing pending queue"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of Firecrawl scrapes to keep in flight when processing the queue (default: 1)"
+    )
+    parser.add_argument(
+        "--scrape-engine",
+        choices=["scrape", "batch"],
+        default="scrape",
+        help="Scrape queued product pages one request per URL, or as one Firecrawl batch-scrape job per batch (default: scrape)"
+    )
+    parser.add_argument(
+        "--cache-mode",
+        choices=["use", "refresh", "off"],
+        default="use",
+        help="Firecrawl response cache: use fresh entries, refresh them, or bypass the cache (default: use)"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Write finished shards and index checkpoints in the background while scraping continues"
+    )
+    parser.add_argument(
+        "--index-backend",
+        choices=["json", "sqlite"],
+        help="URL index storage: whole-file JSON or one SQLite row per URL (default: site config, else json)"
+    )
+    parser.add_argument(
+        "--queue-backend",
+        choices=["json", "sqlite"],
+        help="Pending/retry queues: journaled JSON for a single process, or SQLite work-queue.db with "
+             "leases so several workers can drain one site in parallel (default: site config, else json)"
+    )
+    parser.add_argument(
+        "--via-queue",
+        action="store_true",
+        help="With --added/--changed: queue the URLs as realtime priority, ahead of any backlog, "
+             "and process a batch instead of scraping them directly"
+    )
+    parser.add_argument(
+        "--chunking",
+        choices=list(CHUNKING_MODES),
+        help="How large shards are split into files: greedy fill, or content-defined boundaries "
+             "that keep unchanged chunk files stable (default: site config, else greedy)"
+    )
+    parser.add_argument(
+        "--compression",
+        choices=list(COMPRESSIONS),
+        help="Store the JSON index, manifest and queue files compressed (.gz/.zst); "
+             "existing files in any format are still read (default: site config, else none)"
+    )
+    parser.add_argument(
+        "--export-index-json",
+        action="store_true",
+        help="After the run, write llms-<site>-index.json from the URL index (for tools that read the JSON index)"
+    )
+    parser.add_argument(
+        "--changes-file",
+        help="Merge the shard files written, added and deleted by this run into this JSON file "
+             "(read by knowledge_base_manager_agnostic.py --changes-file)"
+    )
+    parser.add_argument(
+        "--export-manifest",
+        action="store_true",
+        help="After the run, write llms-<site>-manifest.json from the index's shard keys"
+    )
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        default=None,
+        help="Append index changes to a journal instead of rewriting the index file (default: site config)"
+    )
 
     args = parser.parse_args()
     
@@ -2445,7 +3637,16 @@ def main():
         dry_run=args.dry_run,
         pending_queue_path=args.pending_queue,
         disable_discovery=args.disable_discovery,
-        discovery_only=args.discovery_only
+        discovery_only=args.discovery_only,
+        concurrency=args.concurrency,
+        scrape_engine=args.scrape_engine,
+        cache_mode=args.cache_mode,
+        pipeline=args.pipeline,
+        index_backend=args.index_backend,
+        journal=args.journal,
+        chunking=args.chunking,
+        compression=args.compression,
+        queue_backend=args.queue_backend
     )
     
     # Load pre-scraped content if provided (support --pre-scraped-content or --diff-file)
@@ -2468,13 +3669,17 @@ def main():
             retry_count = len(updater.retry_queue)
             logger.info(f"Processing {retry_count} URLs from retry queue")
             
-            # Move all items from retry queue to main queue
+            # Move all items from retry queue to main queue, ignoring their backoff.
+            # Attempts are kept, so URLs that keep failing are still dead-lettered.
             while len(updater.retry_queue) > 0:
                 entries = updater.retry_queue.dequeue_batch(100)
+                if not entries:
+                    # The rest is leased by another worker
+                    break
                 for entry in entries:
-                    # Reset attempt counter for manual retry
-                    entry["metadata"]["attempts"] = 0
+                    entry["metadata"].pop("not_before", None)
                     updater.pending_queue.enqueue_entry(entry)
+                updater.retry_queue.ack(entries)
             
             updater.pending_queue.save()
             updater.retry_queue.save()
@@ -2482,15 +3687,42 @@ def main():
             # Process the queue
             result = updater.process_queue_batch(updater.batch_size)
             result["retry_queue_processed"] = retry_count
-        elif args.added:
-            urls = json.loads(args.added)
-            result = updater.incremental_update(urls, "added", pre_scraped_content)
-        elif args.changed:
-            urls = json.loads(args.changed)
-            result = updater.incremental_update(urls, "changed", pre_scraped_content)
+        elif args.requeue_dead_letters:
+            result = updater.requeue_dead_letters()
+        elif args.refresh_stale:
+            refresh = updater.queue_stale_refreshes(args.refresh_stale)
+            result = updater.process_queue_batch(updater.batch_size)
+            result["refresh_queued"] = refresh["queued"]
+        elif args.added or args.changed:
+            operation = "added" if args.added else "changed"
+            urls = json.loads(args.added or args.changed)
+            if args.via_queue and not pre_scraped_content:
+                result = updater.queue_realtime_update(urls, operation)
+            else:
+                result = updater.incremental_update(urls, operation, pre_scraped_content)
         elif args.removed:
             urls = json.loads(args.removed)
             result = updater.incremental_update(urls, "removed", pre_scraped_content)
+        elif args.compact_journal:
+            entries = updater.journal.entries
+            updater.compact_journal()
+            result = {"operation": "compact_journal", "entries_compacted": entries}
+        
+        if args.export_index_json:
+            updater.url_index.export_json(updater.index_file, updater.storage_compression)
+            logger.info(f"Exported URL index to {updater.index_file}")
+        if args.export_manifest:
+            updater.export_manifest()
+            logger.info(f"Exported manifest to {updater.manifest_file}")
+        if args.changes_file and isinstance(result, dict):
+            # Accumulate across runs so a single knowledge base sync can follow several updates
+            changes = ShardChanges()
+            if os.path.exists(args.changes_file):
+                with open(args.changes_file, 'r', encoding='utf-8') as f:
+                    changes = ShardChanges.from_dict(json.load(f))
+            changes.merge(ShardChanges.from_dict(result))
+            write_json_atomic(args.changes_file, changes.to_dict(), indent=2)
+            logger.info(f"Recorded shard file changes in {args.changes_file}")
         
         # Print results
         print(json.dumps(result, indent=2))
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+SQLite Work Queue with Leases
+
+The JSON PendingQueue belongs to one process: two runs draining the same
+site each load pending-queue.json, and whichever saves last wins. This
+queue keeps a site's pending and retry queues as rows in one SQLite file
+(work-queue.db), so several worker processes, or machines sharing the
+output volume, can drain one backlog in parallel:
+
+  dequeue_batch(n)  claims up to n entries in queue order under a lease
+                    that expires after lease_seconds
+  ack(entries)      deletes entries this worker finished
+  fail(entries)     ends the lease and puts entries back at the tail
+  dequeue_due(n)    claims up to n entries whose not_before has passed
+                    (the retry queue's backoff schedule, see retry_policy.py)
+
+Claims run in an IMMEDIATE transaction, so two workers never claim the same
+entry while its lease is live. A worker that dies simply stops renewing:
+once its leases expire the entries become claimable again, in their
+original position. An ack from a worker whose lease already expired and was
+re-claimed elsewhere is ignored, so the new holder's result wins.
+
+Claims follow the same priority classes and weights as PendingQueue
+(queue_priority.py): each row stores its class, plus a staleness key that
+orders refresh entries. It has the same interface as PendingQueue, so the
+updater can use either.
+The backend is chosen per site in config/site_configs.json
+("queue": {"backend": "sqlite", "lease_seconds": 900}) or with
+--queue-backend. On first use, the existing JSON queue is imported.
+Parallel workers should also use --index-backend sqlite, since each worker
+rewrites the whole JSON index when it saves.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from queue_priority import (
+    DEFAULT_PRIORITY_WEIGHTS, PRIORITIES, RESCRAPE_PRIORITIES, entry_priority, outranks, plan_batch,
+    staleness_key,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 900
+
+
+class SqliteWorkQueue:
+    """One named queue in a shared SQLite file, drained under expiring leases."""
+
+    # ORDER BY expression listing classes in PRIORITIES order
+    _PRIORITY_ORDER = "CASE priority " + " ".join(
+        f"WHEN '{priority}' THEN {rank}" for rank, priority in enumerate(PRIORITIES)
+    ) + " END"
+
+    def __init__(
+        self,
+        path: str,
+        name: str = "pending",
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.path = path
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.weights = dict(weights or DEFAULT_PRIORITY_WEIGHTS)
+        # Identifies this worker's leases; unique per process and queue object
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        # Waits up to 30s for another worker's transaction instead of failing with "database is locked"
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue_entries (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                normalized_url TEXT NOT NULL,
+                entry TEXT NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                priority TEXT NOT NULL DEFAULT 'discovery',
+                stale_key TEXT NOT NULL DEFAULT '',
+                UNIQUE (queue, normalized_url)
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(queue_entries)")}
+        if "priority" not in columns:
+            # Queue files created before priority classes; existing rows are classified from their metadata
+            self._add_priority_columns()
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_queue_entries_claim ON queue_entries (queue, priority, stale_key, seq)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS queue_imports (queue TEXT PRIMARY KEY)")
+
+    def _add_priority_columns(self) -> None:
+        with self._transaction() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(queue_entries)")}
+            if "priority" in columns:
+                return
+            conn.execute("ALTER TABLE queue_entries ADD COLUMN priority TEXT NOT NULL DEFAULT 'discovery'")
+            conn.execute("ALTER TABLE queue_entries ADD COLUMN stale_key TEXT NOT NULL DEFAULT ''")
+            rows = conn.execute("SELECT seq, entry FROM queue_entries").fetchall()
+            conn.executemany(
+                "UPDATE queue_entries SET priority = ?, stale_key = ? WHERE seq = ?",
+                [(entry_priority(json.loads(entry)), staleness_key(json.loads(entry)), seq) for seq, entry in rows],
+            )
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so concurrent claims are serialised
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @property
+    def imported(self) -> bool:
+        """Whether an existing JSON queue has already been imported into this queue."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM queue_imports WHERE queue = ?", (self.name,)
+            ).fetchone() is not None
+
+    def import_entries(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """One-time import of a JSON queue's entries, in order; a no-op once done by any worker."""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM queue_imports WHERE queue = ?", (self.name,)).fetchone():
+                return 0
+            conn.execute("INSERT INTO queue_imports (queue) VALUES (?)", (self.name,))
+            added = 0
+            for entry in entries:
+                if entry.get("normalized_url"):
+                    added += self._insert(conn, entry)
+        if added:
+            logger.info(f"Imported {added} entries into the {self.name} work queue")
+        return added
+
+    def _insert(self, conn: sqlite3.Connection, entry: Dict[str, Any]) -> int:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO queue_entries (queue, normalized_url, entry, priority, stale_key) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self.name, entry["normalized_url"], json.dumps(entry, ensure_ascii=False),
+             entry_priority(entry), staleness_key(entry)),
+        )
+        return cursor.rowcount
+
+    def enqueue(self, url: str, normalized_url: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Add a new URL to the tail of its priority class (or move it there from a less urgent one)."""
+        entry = {
+            "url": url,
+            "normalized_url": normalized_url,
+            "metadata": metadata or {},
+            "discovered_at": datetime.now().isoformat(),
+        }
+        with self._transaction() as conn:
+            if self._insert(conn, entry):
+                return True
+            # Already queued: a more urgent entry moves it to its class, unless a worker holds it
+            row = conn.execute(
+                "SELECT entry FROM queue_entries WHERE queue = ? AND normalized_url = ? "
+                "AND (lease_expires IS NULL OR lease_expires <= ?)",
+                (self.name, normalized_url, time.time()),
+            ).fetchone()
+            if row is None or not outranks(entry, json.loads(row[0])):
+                return False
+            conn.execute(
+                "DELETE FROM queue_entries WHERE queue = ? AND normalized_url = ?", (self.name, normalized_url)
+            )
+            return bool(self._insert(conn, entry))
+
+    def enqueue_entry(self, entry: Dict[str, Any]) -> bool:
+        """Re-add an existing entry (e.g., after a failed scrape)."""
+        if not entry.get("normalized_url"):
+            return False
+        with self._transaction() as conn:
+            return bool(self._insert(conn, entry))
+
+    def dequeue_batch(self, size: int) -> List[Dict[str, Any]]:
+        """
+        Claim up to size entries not leased by a live worker, realtime first and
+        the rest by priority weight; ack() or fail() them when done.
+        """
+        if size <= 0:
+            return []
+        now = time.time()
+        with self._transaction() as conn:
+            available = dict(conn.execute(
+                """
+                SELECT priority, COUNT(*) FROM queue_entries
+                WHERE queue = ? AND (lease_expires IS NULL OR lease_expires <= ?)
+                GROUP BY priority
+                """,
+                (self.name, now),
+            ).fetchall())
+            rows = []
+            for priority, count in plan_batch(size, available, self.weights).items():
+                if count:
+                    rows.extend(conn.execute(
+                        """
+                        SELECT seq, entry FROM queue_entries
+                        WHERE queue = ? AND priority = ? AND (lease_expires IS NULL OR lease_expires <= ?)
+                        ORDER BY stale_key, seq LIMIT ?
+                        """,
+                        (self.name, priority, now, count),
+                    ).fetchall())
+            self._lease(conn, rows, now)
+        return [json.loads(entry) for _, entry in rows]
+
+    def dequeue_due(self, size: int, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Claim up to size entries whose metadata not_before has passed, earliest first."""
+        if size <= 0:
+            return []
+        due_before = (now or datetime.now()).isoformat()
+        clock = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                """
+                SELECT seq, entry FROM queue_entries
+                WHERE queue = ? AND (lease_expires IS NULL OR lease_expires <= ?)
+                AND COALESCE(json_extract(entry, '$.metadata.not_before'), '') <= ?
+                ORDER BY COALESCE(json_extract(entry, '$.metadata.not_before'), ''), seq LIMIT ?
+                """,
+                (self.name, clock, due_before, size),
+            ).fetchall()
+            self._lease(conn, rows, clock)
+        return [json.loads(entry) for _, entry in rows]
+
+    def _lease(self, conn: sqlite3.Connection, rows: List[Any], now: float) -> None:
+        conn.executemany(
+            "UPDATE queue_entries SET lease_owner = ?, lease_expires = ? WHERE seq = ?",
+            [(self.worker_id, now + self.lease_seconds, seq) for seq, _ in rows],
+        )
+
+    def ack(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Delete finished entries that this worker still holds the lease on."""
+        urls = [(self.name, entry["normalized_url"], self.worker_id) for entry in entries if entry.get("normalized_url")]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "DELETE FROM queue_entries WHERE queue = ? AND normalized_url = ? AND lease_owner = ?", urls
+            )
+            return conn.total_changes - before
+
+    def fail(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Release this worker's leases on entries and move them to the tail (with their updated data)."""
+        released = 0
+        with self._transaction() as conn:
+            for entry in entries:
+                normalized_url = entry.get("normalized_url")
+                if not normalized_url:
+                    continue
+                cursor = conn.execute(
+                    "DELETE FROM queue_entries WHERE queue = ? AND normalized_url = ? AND lease_owner = ?",
+                    (self.name, normalized_url, self.worker_id),
+                )
+                if cursor.rowcount:
+                    released += self._insert(conn, entry)
+        return released
+
+    def renew(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Extend this worker's leases on entries by another lease_seconds."""
+        expires = time.time() + self.lease_seconds
+        urls = [(expires, self.name, entry["normalized_url"], self.worker_id)
+                for entry in entries if entry.get("normalized_url")]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE queue_entries SET lease_expires = ? "
+                "WHERE queue = ? AND normalized_url = ? AND lease_owner = ?",
+                urls,
+            )
+            return conn.total_changes - before
+
+    def peek_batch(self, size: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """Entries that could be claimed now, class by class in priority order, without claiming them."""
+        if size <= 0:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT entry FROM queue_entries
+                WHERE queue = ? AND (lease_expires IS NULL OR lease_expires <= ?)
+                ORDER BY {self._PRIORITY_ORDER}, stale_key, seq LIMIT ? OFFSET ?
+                """,
+                (self.name, time.time(), size, max(offset, 0)),
+            ).fetchall()
+        return [json.loads(entry) for entry, in rows]
+
+    def prune(self, existing_urls: Set[str]) -> int:
+        """Remove queued URLs already present in index/manifest (realtime and refresh entries stay)."""
+        if not existing_urls:
+            return 0
+        rescrape = sorted(RESCRAPE_PRIORITIES)
+        with self._lock:
+            queued = [url for url, in self._conn.execute(
+                f"SELECT normalized_url FROM queue_entries WHERE queue = ? "
+                f"AND priority NOT IN ({', '.join('?' * len(rescrape))})",
+                (self.name, *rescrape),
+            )]
+        stale = [(self.name, url) for url in queued if url in existing_urls]
+        if not stale:
+            return 0
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("DELETE FROM queue_entries WHERE queue = ? AND normalized_url = ?", stale)
+            return conn.total_changes - before
+
+    def save(self) -> None:
+        # Every change is already committed
+        pass
+
+    def compact(self) -> None:
+        pass
+
+    def __contains__(self, normalized_url: object) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM queue_entries WHERE queue = ? AND normalized_url = ?", (self.name, normalized_url)
+            ).fetchone() is not None
+
+    def __len__(self) -> int:
+        """Entries not yet acked, including ones leased by other workers."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM queue_entries WHERE queue = ?", (self.name,)
+            ).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        """Queued entries per priority class, leased ones included."""
+        with self._lock:
+            found = dict(self._conn.execute(
+                "SELECT priority, COUNT(*) FROM queue_entries WHERE queue = ? GROUP BY priority", (self.name,)
+            ).fetchall())
+        return {priority: found.get(priority, 0) for priority in PRIORITIES}
+
+    def as_list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT entry FROM queue_entries WHERE queue = ? ORDER BY {self._PRIORITY_ORDER}, stale_key, seq",
+                (self.name,),
+            ).fetchall()
+        return [json.loads(entry) for entry, in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Auto-Discovery API Usage
+
+Tests that --auto-discover fetches a category page once, links only, and
+scrapes each discovered product exactly once; and that product data fetched
+along with a category page is reused from the response cache instead of
+scraped again (unless the cache is off).
+
+Usage:
+    python3 tests/test_auto_discover.py
+"""
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from rate_limiter import TokenBucketRateLimiter
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+CATEGORY_URL = "https://example.com/collections/widgets"
+PRODUCT_URLS = [f"https://example.com/products/widget-{i}" for i in range(3)]
+
+
+class FakeFirecrawl:
+    """Answers /scrape calls for one category page and its products, recording each payload."""
+
+    def __init__(self):
+        self.payloads = []
+
+    def __call__(self, method, url, timeout=None, json=None, **kwargs):
+        self.payloads.append(json)
+        formats = json["formats"]
+        if json["url"].startswith(CATEGORY_URL):
+            data = {"markdown": "\n".join(f"+[Widget]({u})" for u in PRODUCT_URLS)}
+            if "links" in formats:
+                data["links"] = PRODUCT_URLS + ["https://example.com/pages/about"]
+        else:
+            name = json["url"].split("?", 1)[0].rsplit("/", 1)[-1]
+            data = {"json": {"product_name": name}}
+        return FakeResponse({"success": True, "data": data})
+
+    def product_scrapes(self):
+        return [p["url"] for p in self.payloads if not p["url"].startswith(CATEGORY_URL)]
+
+    def category_scrapes(self):
+        return [p for p in self.payloads if p["url"].startswith(CATEGORY_URL)]
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def make_updater(output_dir, cache_mode="off"):
+    updater = AgnosticLLMsUpdater(
+        firecrawl_api_key="auto-discover-test-key",
+        domain="example.com",
+        output_dir=output_dir,
+        cache_mode=cache_mode
+    )
+    updater.rate_limiter = TokenBucketRateLimiter(requests_per_second=100, burst=10, max_in_flight=5)
+    return updater
+
+
+def test_products_scraped_once():
+    """Test that auto-discovery makes one links fetch plus one scrape per product."""
+    print("Test 1: Auto-discovery scrapes each product once")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp)
+        fake = FakeFirecrawl()
+        with mock.patch.object(updater.firecrawl_http.session, "request", side_effect=fake):
+            result = updater.auto_discover_products(CATEGORY_URL, max_products=10)
+
+        print(f"Category fetches: {len(fake.category_scrapes())}, product scrapes: {len(fake.product_scrapes())}")
+        assert result["processed_urls"] == 3
+        assert len(fake.category_scrapes()) == 1, "Category page should be fetched once"
+        assert "links" in fake.category_scrapes()[0]["formats"]
+        assert fake.category_scrapes()[0]["url"] == updater._ensure_eur_currency(CATEGORY_URL)
+        assert len(fake.product_scrapes()) == 3, "Each product should be scraped exactly once"
+        assert len(set(fake.product_scrapes())) == 3
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_category_page_products_reused():
+    """Test that products scraped with a category page are not scraped again."""
+    print("Test 2: Product data fetched with a category page is reused")
+    print("-" * 80)
+
+    # refresh mode reuses what this run stored; with the cache off nothing is kept
+    for cache_mode, expected_scrapes in (("use", 3), ("refresh", 3), ("off", 4)):
+        with tempfile.TemporaryDirectory() as tmp:
+            updater = make_updater(tmp, cache_mode)
+            fake = FakeFirecrawl()
+            with mock.patch.object(updater.firecrawl_http.session, "request", side_effect=fake):
+                category = updater._scrape_url(CATEGORY_URL)
+                assert category["product_count"] == 3
+                scraped = updater._scrape_url(PRODUCT_URLS[0])
+
+            assert len(fake.product_scrapes()) == expected_scrapes, f"Unexpected product scrapes ({cache_mode})"
+            assert json.loads(scraped["content"])["product_name"] == "widget-0"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("AUTO-DISCOVERY TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_products_scraped_once,
+        test_category_page_products_reused
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Firecrawl Batch-Scrape Engine
+
+Runs process_queue_batch with --scrape-engine batch against a local mock of
+the Firecrawl batch/scrape endpoints: one job per queue batch, polled until
+done, results paged via `next`, and failures routed to the retry queue.
+Also checks that a job interrupted mid-run is collected on the next run,
+that earlier batches are on disk before a job is submitted, and that a
+cached response that cannot be parsed only fails its own URL.
+
+Usage:
+    python3 tests/test_batch_scrape.py
+"""
+
+import sys
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from rate_limiter import TokenBucketRateLimiter
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+
+class MockFirecrawl:
+    """Minimal in-process Firecrawl batch/scrape server."""
+
+    def __init__(self, failing_urls=None, polls_before_done=1, page_size=2):
+        self.failing_urls = set(failing_urls or [])
+        self.polls_before_done = polls_before_done
+        self.page_size = page_size
+        self.jobs = {}
+        self.submissions = []
+        self.single_scrapes = 0
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.endswith("/batch/scrape"):
+                    job_id = f"job-{len(mock.jobs) + 1}"
+                    mock.jobs[job_id] = {"urls": payload["urls"], "polls": 0}
+                    mock.submissions.append(payload)
+                    self._send({"success": True, "id": job_id, "url": f"{mock.base_url}/batch/scrape/{job_id}"})
+                else:
+                    mock.single_scrapes += 1
+                    self._send({"success": False})
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                job_id = path.rsplit("/", 1)[-1]
+                job = mock.jobs[job_id]
+                job["polls"] += 1
+                if job["polls"] <= mock.polls_before_done:
+                    self._send({"status": "scraping", "total": len(job["urls"]), "completed": 0})
+                    return
+
+                documents = []
+                for url in job["urls"]:
+                    if url.split("?", 1)[0] in mock.failing_urls:
+                        documents.append({"metadata": {"sourceURL": url, "statusCode": 500}})
+                    else:
+                        documents.append({
+                            "json": {"product_name": url.rsplit("/", 1)[-1]},
+                            "metadata": {"sourceURL": url, "statusCode": 200}
+                        })
+                skip = int(query.split("=", 1)[1]) if query.startswith("skip=") else 0
+                page = documents[skip:skip + mock.page_size]
+                response = {"status": "completed", "total": len(documents), "completed": len(documents), "data": page}
+                if skip + mock.page_size < len(documents):
+                    response["next"] = f"{mock.base_url}/batch/scrape/{job_id}?skip={skip + mock.page_size}"
+                self._send(response)
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v2"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_updater(output_dir, mock):
+    """Create a batch-engine updater pointed at the mock server."""
+    updater = AgnosticLLMsUpdater(
+        firecrawl_api_key="batch-scrape-test-key",
+        domain="example.com",
+        output_dir=output_dir,
+        batch_size=10,
+        scrape_engine="batch"
+    )
+    updater.rate_limiter = TokenBucketRateLimiter(requests_per_second=100, burst=10, max_in_flight=5)
+    updater.firecrawl_base_url = mock.base_url
+    updater.firecrawl_http.base_url = mock.base_url
+    updater.batch_poll_interval = 0.01
+    return updater
+
+
+def queue_urls(updater, urls, category="widgets"):
+    for url in urls:
+        updater._enqueue_for_batch(url, category, "https://example.com/categories/widgets")
+
+
+def test_batch_job_scrapes_queue():
+    """Test that a queue batch is scraped by one job, with paged results applied in order."""
+    print("Test 1: One batch-scrape job per queue batch")
+    print("-" * 80)
+
+    urls = [f"https://example.com/products/item-{i}" for i in range(5)]
+    with tempfile.TemporaryDirectory() as tmp, MockFirecrawl() as mock:
+        updater = make_updater(tmp, mock)
+        queue_urls(updater, urls)
+
+        result = updater.process_queue_batch()
+
+        print(f"Submissions: {len(mock.submissions)}, processed: {result['processed_urls']}")
+        assert len(mock.submissions) == 1, "Expected a single batch job"
+        assert mock.single_scrapes == 0, "Product URLs should not be scraped one by one"
+        assert result["processed_urls"] == 5
+        assert result["pending_batch_job"] is None
+        assert len(updater.manifest["widgets"]) == 5
+        assert not Path(updater.batch_job_path).exists(), "Finished job file should be cleared"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_failed_documents_route_to_retry_queue():
+    """Test that URLs with an error status in the job go to the retry queue."""
+    print("Test 2: Failed batch documents are moved to the retry queue")
+    print("-" * 80)
+
+    failing = "https://example.com/products/broken"
+    with tempfile.TemporaryDirectory() as tmp, MockFirecrawl(failing_urls=[failing]) as mock:
+        updater = make_updater(tmp, mock)
+        queue_urls(updater, ["https://example.com/products/ok-1", failing])
+
+        result = updater.process_queue_batch()
+
+        assert result["processed_urls"] == 1
+        assert result["failed_urls"] == [failing]
+        retry_items = updater.retry_queue.as_list()
+        assert len(retry_items) == 1 and retry_items[0]["url"] == failing
+        assert retry_items[0]["metadata"]["attempts"] == 1
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_interrupted_job_resumes():
+    """Test that a job still running at max_wait is collected by the next run."""
+    print("Test 3: Interrupted batch job is collected on resume")
+    print("-" * 80)
+
+    urls = [f"https://example.com/products/item-{i}" for i in range(3)]
+    with tempfile.TemporaryDirectory() as tmp, MockFirecrawl(polls_before_done=3) as mock:
+        updater = make_updater(tmp, mock)
+        updater.batch_max_wait = 0
+        queue_urls(updater, urls)
+
+        first = updater.process_queue_batch()
+        assert first["processed_urls"] == 0
+        assert first["pending_batch_job"] == "job-1"
+        assert Path(updater.batch_job_path).exists(), "Running job should be persisted"
+        assert len(updater.pending_queue) == 0, "Submitted URLs leave the pending queue"
+
+        resumed = make_updater(tmp, mock)
+        second = resumed.process_queue_batch()
+
+        print(f"Resumed run processed {second['processed_urls']} URLs")
+        assert len(mock.submissions) == 1, "Resume must not resubmit the job"
+        assert second["processed_urls"] == 3
+        assert second["pending_batch_job"] is None
+        assert len(resumed.manifest["widgets"]) == 3
+        assert not Path(resumed.batch_job_path).exists()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_earlier_batches_persisted_before_submit():
+    """Test that a run killed during its second job loses neither batch, with and without --pipeline."""
+    print("Test 4: Earlier batches are persisted before the next job is submitted")
+    print("-" * 80)
+
+    retry_url = "https://example.com/products/retry-0"
+    urls = [f"https://example.com/products/item-{i}" for i in range(3)]
+    for pipeline in (False, True):
+        with tempfile.TemporaryDirectory() as tmp, MockFirecrawl() as mock:
+            updater = make_updater(tmp, mock)
+            updater.pipeline = pipeline
+            updater.batch_size = 2
+            updater.max_batches = 2
+            queue_urls(updater, [retry_url])
+            updater.retry_queue.enqueue_entry(updater.pending_queue.dequeue_batch(1)[0])
+            updater.retry_queue.save()
+            queue_urls(updater, urls)
+
+            collect = updater._collect_batch_job
+            on_disk = {}
+
+            def killed_during_second_job(job):
+                if job["id"] == "job-2":
+                    # What a fresh process would find if this one died now
+                    reloaded = make_updater(tmp, mock)
+                    on_disk["products"] = sorted(reloaded.manifest["widgets"])
+                    on_disk["queued"] = len(reloaded.pending_queue) + len(reloaded.retry_queue)
+                    on_disk["job"] = reloaded._load_batch_job()["id"]
+                    raise SystemExit("killed")
+                return collect(job)
+
+            updater._collect_batch_job = killed_during_second_job
+            try:
+                updater.process_queue_batch()
+                assert False, "The run should have been killed"
+            except SystemExit:
+                pass
+
+            # Batch 1 (one due retry + one pending URL) is on disk; batch 2 is owned by the job file
+            print(f"pipeline={pipeline}: on disk at job-2 {on_disk}")
+            assert on_disk == {"products": [urls[0], retry_url], "queued": 0, "job": "job-2"}
+
+            resumed = make_updater(tmp, mock)
+            result = resumed.process_queue_batch()
+            assert result["processed_urls"] == 2
+            assert len(mock.submissions) == 2, "Resume must not resubmit the job"
+            assert sorted(resumed.manifest["widgets"]) == sorted(urls + [retry_url])
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_unparseable_cached_result_fails_its_url():
+    """Test that a cached response that fails to parse is treated like a failed scrape."""
+    print("Test 5: Unparseable cached results go to the retry queue")
+    print("-" * 80)
+
+    cached_url = "https://example.com/products/cached"
+    other_url = "https://example.com/products/fresh"
+    with tempfile.TemporaryDirectory() as tmp, MockFirecrawl() as mock:
+        updater = make_updater(tmp, mock)
+        payload = updater._product_scrape_payload(updater._ensure_eur_currency(cached_url))
+        updater.response_cache.put(payload, {"success": True, "data": {"json": {"product_name": "cached"}}})
+        build = updater._build_product_result
+
+        def build_or_fail(url, eur_url, response_data):
+            if url == cached_url:
+                raise ValueError("bad cached document")
+            return build(url, eur_url, response_data)
+
+        updater._build_product_result = build_or_fail
+        queue_urls(updater, [cached_url, other_url])
+
+        result = updater.process_queue_batch()
+
+        assert result["processed_urls"] == 1
+        assert result["failed_urls"] == [cached_url]
+        assert [s["urls"] for s in mock.submissions] == [[updater._ensure_eur_currency(other_url)]]
+        assert [e["url"] for e in updater.retry_queue.as_list()] == [cached_url]
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("BATCH SCRAPE ENGINE TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_batch_job_scrapes_queue,
+        test_failed_documents_route_to_retry_queue,
+        test_interrupted_job_resumes,
+        test_earlier_batches_persisted_before_submit,
+        test_unparseable_cached_result_fails_its_url
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
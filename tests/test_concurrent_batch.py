@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Concurrent Queue Processing
+
+Tests that process_queue_batch keeps several scrapes in flight when
+--concurrency is set, while index/manifest updates, retry-queue routing and
+shard writing behave exactly as in sequential mode, and that duplicate
+entries in a batch are scraped once.
+
+Usage:
+    python3 tests/test_concurrent_batch.py
+"""
+
+import sys
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+
+def make_updater(output_dir, concurrency):
+    """Create an updater writing into a throwaway output directory."""
+    return AgnosticLLMsUpdater(
+        firecrawl_api_key="test_key",
+        domain="example.com",
+        output_dir=output_dir,
+        batch_size=10,
+        concurrency=concurrency
+    )
+
+
+class FakeScraper:
+    """Stand-in for _scrape_url that records how many calls overlap."""
+
+    def __init__(self, failing_urls=None, delay=0.05):
+        self.failing_urls = set(failing_urls or [])
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.threads = set()
+        self.calls = []
+
+    def __call__(self, url, pre_scraped_content=None, is_diff=False):
+        with self.lock:
+            self.calls.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if url in self.failing_urls:
+            return None
+        return {
+            "url": url,
+            "content": json.dumps({"product_name": url.rsplit('/', 1)[-1]}),
+            "title": url.rsplit('/', 1)[-1],
+            "scraped_at": "2025-10-08T00:00:00"
+        }
+
+
+def queue_urls(updater, urls, category="widgets"):
+    for url in urls:
+        updater._enqueue_for_batch(url, category, "https://example.com/categories/widgets")
+
+
+def test_concurrent_scrapes_in_flight():
+    """Test that several scrapes overlap when concurrency > 1."""
+    print("Test 1: Concurrent scrapes stay within the worker bound")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp, concurrency=4)
+        fake = FakeScraper()
+        updater._scrape_url = fake
+        queue_urls(updater, [f"https://example.com/products/item-{i}" for i in range(8)])
+
+        result = updater.process_queue_batch()
+
+        print(f"Max in flight: {fake.max_in_flight}")
+        assert result["processed_urls"] == 8, f"Expected 8 processed, got {result['processed_urls']}"
+        assert 1 < fake.max_in_flight <= 4, f"Expected 2-4 scrapes in flight, got {fake.max_in_flight}"
+        assert len(updater.manifest["widgets"]) == 8
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_failures_route_to_retry_queue():
+    """Test that failed scrapes still land in the retry queue with attempts bumped."""
+    print("Test 2: Failed scrapes are moved to the retry queue")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp, concurrency=3)
+        failing = "https://example.com/products/broken"
+        updater._scrape_url = FakeScraper(failing_urls=[failing])
+        queue_urls(updater, [
+            "https://example.com/products/ok-1",
+            failing,
+            "https://example.com/products/ok-2",
+        ])
+
+        result = updater.process_queue_batch()
+
+        print(f"Failed URLs: {result['failed_urls']}")
+        assert result["failed_urls"] == [failing]
+        assert result["processed_urls"] == 2
+        retry_items = updater.retry_queue.as_list()
+        assert len(retry_items) == 1
+        assert retry_items[0]["url"] == failing
+        assert retry_items[0]["metadata"]["attempts"] == 1
+        assert failing not in updater.url_index
+        assert len(updater.pending_queue) == 0
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_matches_sequential_output():
+    """Test that concurrent and sequential runs produce identical shard files."""
+    print("Test 3: Concurrent output matches sequential output")
+    print("-" * 80)
+
+    urls = [f"https://example.com/products/item-{i}" for i in range(6)]
+    outputs = []
+
+    for concurrency in (1, 4):
+        with tempfile.TemporaryDirectory() as tmp:
+            updater = make_updater(tmp, concurrency=concurrency)
+            updater._scrape_url = FakeScraper(delay=0.01)
+            queue_urls(updater, urls)
+            result = updater.process_queue_batch()
+
+            files = {}
+            for path in result["written_files"]:
+                files[Path(path).name] = Path(path).read_text(encoding='utf-8')
+            outputs.append((files, dict(updater.manifest)))
+
+    assert outputs[0] == outputs[1], "Shard files or manifest differ between modes"
+    print(f"Compared {len(outputs[0][0])} shard file(s)")
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_duplicate_entries_scraped_once():
+    """Test that entries sharing a normalized URL within one batch are scraped once."""
+    print("Test 4: Duplicate entries in a batch are scraped once")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp, concurrency=3)
+        fake = FakeScraper(delay=0.01)
+        updater._scrape_url = fake
+        url = "https://example.com/products/item-1"
+        entries = [
+            {"url": url, "normalized_url": updater._normalize_url(url), "metadata": {}},
+            {"url": "https://example.com/products/item-2", "normalized_url": "https://example.com/products/item-2",
+             "metadata": {}},
+            {"url": url + "?ref=retry", "normalized_url": updater._normalize_url(url), "metadata": {}},
+        ]
+
+        results = list(updater._scrape_entries(entries))
+        assert [entry["url"] for entry, _ in results] == [url, "https://example.com/products/item-2"]
+        assert sorted(fake.calls) == [url, "https://example.com/products/item-2"]
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("CONCURRENT BATCH PROCESSING TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_concurrent_scrapes_in_flight,
+        test_failures_route_to_retry_queue,
+        test_matches_sequential_output,
+        test_duplicate_entries_scraped_once
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
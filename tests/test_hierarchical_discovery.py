@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Parallel Hierarchical Discovery
+
+Tests that hierarchical_discovery fetches level 2/3 pages concurrently,
+dedupes categories and products through one visited set, feeds the pending
+queue, and only scrapes once discovery has finished. Also tests that the
+persisted discovery frontier lets runs resume and revisit stale pages.
+
+Usage:
+    python3 tests/test_hierarchical_discovery.py
+"""
+
+import sys
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from update_llms_agnostic import AgnosticLLMsUpdater, DiscoveryFrontier
+
+MAIN = "https://example.com/collections/tools"
+
+# subcategory -> product categories ("drills" is listed under both subcategories)
+SITE = {
+    f"{MAIN}/power": [f"{MAIN}/power/drills", f"{MAIN}/power/saws"],
+    f"{MAIN}/hand": [f"{MAIN}/power/drills", f"{MAIN}/hand/hammers"],
+    f"{MAIN}/garden": [],
+}
+# category page -> product URLs ("drill-1" is also listed under saws)
+PRODUCTS = {
+    f"{MAIN}/power/drills": ["https://example.com/products/drill-1", "https://example.com/products/drill-2"],
+    f"{MAIN}/power/saws": ["https://example.com/products/saw-1", "https://example.com/products/drill-1"],
+    f"{MAIN}/hand/hammers": ["https://example.com/products/hammer-1"],
+    f"{MAIN}/garden": ["https://example.com/products/rake-1"],
+}
+
+
+class FakeSite:
+    """Stand-in for the discovery fetches that records calls and overlap."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fetched = []
+        self.scraped = []
+
+    def _fetch(self, url, result):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.fetched.append(url)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return result
+
+    def install(self, updater):
+        updater._discover_subcategories = lambda url: self._fetch(url, list(SITE))
+        updater._discover_product_categories = lambda url: self._fetch(url, SITE[url])
+        updater._discover_category_products = lambda url, limit: self._fetch(url, PRODUCTS.get(url, []))
+        updater._scrape_url = self.scrape
+
+    def scrape(self, url, pre_scraped_content=None, is_diff=False):
+        self.scraped.append(url)
+        return {
+            "url": url,
+            "content": json.dumps({"product_name": url.rsplit('/', 1)[-1]}),
+            "title": url.rsplit('/', 1)[-1],
+            "scraped_at": "2025-10-08T00:00:00"
+        }
+
+
+def make_updater(output_dir, **kwargs):
+    return AgnosticLLMsUpdater(
+        firecrawl_api_key="hierarchical-test-key",
+        domain="example.com",
+        output_dir=output_dir,
+        concurrency=4,
+        **kwargs
+    )
+
+
+def test_discovery_fans_out_and_dedupes():
+    """Test concurrent fetches, one fetch per category and one queue entry per product."""
+    print("Test 1: Concurrent discovery with a shared visited set")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp, batch_size=50, discovery_only=True)
+        site = FakeSite()
+        site.install(updater)
+
+        result = updater.hierarchical_discovery(MAIN, max_products_per_category=50, max_categories=10)
+
+        print(f"Pages fetched: {len(site.fetched)}, max in flight: {site.max_in_flight}")
+        assert site.max_in_flight > 1, "Level 2/3 pages should be fetched concurrently"
+        assert site.fetched.count(f"{MAIN}/power/drills") == 1, "Shared category fetched twice"
+        assert result["discovered_total"] == 5
+        assert result["queued_new"] == 5
+        assert len(updater.pending_queue) == 5
+        assert site.scraped == [], "Discovery-only must not scrape"
+
+        # The queue was persisted as discovery finished
+        saved = json.loads(Path(updater.pending_queue_path).read_text(encoding='utf-8'))
+        assert len(saved["pending"]) == 5
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_queue_drained_after_discovery():
+    """Test that discovered products are scraped from the queue once discovery completes."""
+    print("Test 2: Discovered products are scraped from the pending queue")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp)
+        site = FakeSite(delay=0.01)
+        site.install(updater)
+
+        result = updater.hierarchical_discovery(MAIN, max_products_per_category=50, max_categories=10)
+
+        assert result["processed_urls"] == 5, f"Expected 5 processed, got {result['processed_urls']}"
+        assert sorted(set(site.scraped)) == sorted(site.scraped), "A product was scraped twice"
+        assert len(updater.pending_queue) == 0
+        assert result["written_files"], "Shard files should be written"
+        hammer = updater._normalize_url("https://example.com/products/hammer-1")
+        assert hammer in updater.url_index
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_frontier_resumes_across_runs():
+    """Test that max_categories defers work to later runs instead of dropping it."""
+    print("Test 3: Discovery resumes from the persisted frontier")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queued = 0
+        fetched_per_run = []
+        for _ in range(3):
+            updater = make_updater(tmp, batch_size=50, discovery_only=True)
+            site = FakeSite(delay=0.001)
+            site.install(updater)
+            result = updater.hierarchical_discovery(MAIN, max_products_per_category=50, max_categories=2)
+            queued += result["queued_new"]
+            fetched_per_run.append(site.fetched)
+
+        print(f"Pages fetched per run: {[len(f) for f in fetched_per_run]}")
+        assert MAIN in fetched_per_run[0] and MAIN not in fetched_per_run[1], "Level 1 map should not be repeated"
+        assert f"{MAIN}/garden" in fetched_per_run[1], "Deferred subcategory should be visited next run"
+        assert fetched_per_run[2] == [], "A fresh frontier has nothing to revisit"
+        assert queued == 5
+
+        frontier_path = Path(tmp) / "example-com" / "discovery-frontier.json"
+        frontier = DiscoveryFrontier(str(frontier_path))
+        assert frontier.summary() == {"done": len(frontier)}
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_frontier_revisits_stale_and_interrupted():
+    """Test that stale and interrupted pages become due again."""
+    print("Test 4: Stale and interrupted frontier pages are revisited")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "discovery-frontier.json")
+        frontier = DiscoveryFrontier(path, revisit_after_hours=24)
+        frontier.add("https://example.com/a", "https://example.com/a", depth=2)
+        frontier.add("https://example.com/b", "https://example.com/b", depth=2)
+        frontier.add("https://example.com/c", "https://example.com/c", depth=2)
+        frontier.mark("https://example.com/a", "done")
+        frontier.mark("https://example.com/b", "in_progress")
+        frontier.mark("https://example.com/c", "done")
+        frontier.categories["https://example.com/c"]["last_visited"] = "2020-01-01T00:00:00"
+        frontier.save()
+
+        reloaded = DiscoveryFrontier(path, revisit_after_hours=24)
+        due = [entry["url"] for entry in reloaded.due(2)]
+        assert due == ["https://example.com/b", "https://example.com/c"], f"Unexpected due pages: {due}"
+        assert reloaded.get("https://example.com/b")["status"] == "pending"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("HIERARCHICAL DISCOVERY TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_discovery_fans_out_and_dedupes,
+        test_queue_drained_after_discovery,
+        test_frontier_resumes_across_runs,
+        test_frontier_revisits_stale_and_interrupted
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Index Journal
+
+Tests that journaled incremental updates append instead of rewriting the
+index, that the journal is replayed on load (skipping a torn last line),
+that compaction folds it back into the index snapshot, and that replaying
+over a snapshot that already holds the entries is harmless.
+
+Usage:
+    python3 tests/test_index_journal.py
+"""
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from index_journal import IndexJournal
+from product_store import JsonProductStore
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+
+def make_updater(output_dir, journal=True, compact_every=500):
+    updater = AgnosticLLMsUpdater(
+        firecrawl_api_key="test_key",
+        domain="example.com",
+        output_dir=output_dir,
+        journal=journal
+    )
+    updater.journal_config["compact_every"] = compact_every
+    updater._scrape_url = fake_scrape
+    return updater
+
+
+def fake_scrape(url, pre_scraped_content=None, is_diff=False):
+    name = url.rsplit('/', 1)[-1]
+    return {
+        "url": url,
+        "content": json.dumps({"product_name": name}),
+        "title": name,
+        "scraped_at": "2025-10-08T00:00:00"
+    }
+
+
+def product(i):
+    return f"https://example.com/collections/widgets/widget-{i}"
+
+
+def journal_lines(updater):
+    path = Path(updater.journal.path)
+    return path.read_text(encoding='utf-8').splitlines() if path.exists() else []
+
+
+def test_incremental_update_appends():
+    """Test that a journaled add appends one entry and leaves the snapshots alone."""
+    print("Test 1: Journaled updates append instead of rewriting")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp)
+        updater.incremental_update([product(1)], "added")
+        updater.incremental_update([product(2)], "added")
+        updater.incremental_update([product(1)], "removed")
+
+        assert not Path(updater.index_file).exists(), "Index should not be rewritten per update"
+        ops = [json.loads(line)["op"] for line in journal_lines(updater)]
+        assert ops == ["put", "put", "del"], f"Unexpected journal: {ops}"
+
+        reloaded = make_updater(tmp)
+        key = reloaded._normalize_url(product(2))
+        assert list(reloaded.url_index) == [key]
+        assert reloaded.manifest == {"widgets": [key]}
+        assert key in reloaded.existing_urls
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_torn_last_entry_skipped():
+    """Test that a partially written last line loses only that record."""
+    print("Test 2: A torn final journal entry is ignored")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "journal.jsonl")
+        journal = IndexJournal(path)
+        journal.record_put("https://example.com/a", {"title": "A", "shard_key": "widgets"})
+        journal.record_put("https://example.com/b", {"title": "B", "shard_key": "widgets"})
+        journal.close()
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "put", "url": "https://example.com/c", "sha')
+
+        store = JsonProductStore(str(Path(tmp) / "index.json"))
+        applied = IndexJournal(path).replay(store)
+        assert applied == 2
+        assert sorted(store) == ["https://example.com/a", "https://example.com/b"]
+        assert store.manifest == {"widgets": ["https://example.com/a", "https://example.com/b"]}
+
+        # The torn bytes are cut off, so later entries stay readable
+        journal = IndexJournal(path)
+        journal.record_delete("https://example.com/a")
+        journal.close()
+        store = JsonProductStore(str(Path(tmp) / "index.json"))
+        assert IndexJournal(path).replay(store) == 3
+        assert store.manifest == {"widgets": ["https://example.com/b"]}
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_compaction_folds_journal():
+    """Test that reaching compact_every writes the snapshot and drops the journal."""
+    print("Test 3: Compaction folds the journal into the index snapshot")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp, compact_every=3)
+        for i in range(2):
+            updater.incremental_update([product(i)], "added")
+        assert len(journal_lines(updater)) == 2
+        updater.incremental_update([product(2)], "added")
+
+        assert journal_lines(updater) == [], "Journal should be truncated after compaction"
+        index = json.loads(Path(updater.index_file).read_text(encoding='utf-8'))
+        assert len(index) == 3
+        assert len(make_updater(tmp).manifest["widgets"]) == 3
+
+        # A run without journaling folds a leftover journal on its next save
+        updater = make_updater(tmp, compact_every=3)
+        updater.incremental_update([product(3)], "added")
+        assert len(journal_lines(updater)) == 1
+        plain = make_updater(tmp, journal=False)
+        assert len(plain.url_index) == 4
+        plain.incremental_update([product(4)], "added")
+        assert journal_lines(plain) == []
+        assert len(json.loads(Path(plain.index_file).read_text(encoding='utf-8'))) == 5
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_replay_over_saved_snapshot():
+    """Test that a crash between the snapshot save and the truncate is harmless."""
+    print("Test 4: Replay over a snapshot that already holds the entries")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp)
+        for i in range(3):
+            updater.incremental_update([product(i)], "added")
+        updater.incremental_update([product(0)], "removed")
+        # Simulate compaction dying after the snapshot save but before the truncate
+        updater._save_url_index()
+
+        reloaded = make_updater(tmp)
+        assert len(reloaded.url_index) == 2
+        assert sorted(reloaded.manifest["widgets"]) == sorted(reloaded.url_index)
+        assert reloaded.journal.entries == 4
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("INDEX JOURNAL TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_incremental_update_appends,
+        test_torn_last_entry_skipped,
+        test_compaction_folds_journal,
+        test_replay_over_saved_snapshot
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Compressed JSON State Files
+
+Tests gzip round trips and deterministic output, that loading finds
+whichever variant exists and saving removes the others, that the updater
+keeps its index and queues compressed when configured to, and the
+convert_storage_compression.py converter.
+
+Usage:
+    python3 tests/test_json_storage.py
+"""
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import json_storage
+from convert_storage_compression import convert_site
+from product_store import JsonProductStore
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+DATA = {"pending": [{"url": f"https://example.com/products/widget-{i}", "metadata": {"note": "Ø5 €"}} for i in range(50)]}
+
+
+def fake_scrape(url, pre_scraped_content=None, is_diff=False):
+    name = url.rsplit('/', 1)[-1]
+    return {
+        "url": url,
+        "content": json.dumps({"product_name": name}),
+        "title": name,
+        "scraped_at": "2025-10-08T00:00:00"
+    }
+
+
+def test_gzip_round_trip():
+    """Test that gzip files load back unchanged, are smaller and byte-identical on rewrite."""
+    print("Test 1: gzip round trip is lossless and deterministic")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "queue.json")
+        json_storage.write_json_atomic(path, DATA, "none", indent=2)
+        json_storage.write_json_atomic(path, DATA, "gzip", indent=2)
+        assert not Path(path).exists(), "Plain variant should be removed"
+        stored = Path(path + ".gz")
+        first = stored.read_bytes()
+        assert json_storage.read_json(path) == DATA
+        assert len(first) < len(json.dumps(DATA, indent=2))
+
+        json_storage.write_json_atomic(path, DATA, "gzip", indent=2)
+        assert stored.read_bytes() == first, "Unchanged data should compress to identical bytes"
+        assert [p.name for p in Path(tmp).iterdir()] == ["queue.json.gz"]
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_unknown_and_unavailable_compression():
+    """Test that unknown names (and zstd without zstandard) are rejected before writing."""
+    print("Test 2: Unknown or unavailable compression raises ValueError")
+    print("-" * 80)
+
+    names = ["brotli"] + (["zstd"] if json_storage.zstandard is None else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "queue.json")
+        for name in names:
+            try:
+                json_storage.write_json_atomic(path, DATA, name)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"{name} should raise ValueError")
+        assert list(Path(tmp).iterdir()) == []
+        assert not json_storage.exists(path)
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_updater_compressed_storage():
+    """Test that the updater writes .gz index/queue files and reloads them, and reads plain files too."""
+    print("Test 3: Updater keeps index and queues compressed")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(
+            firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=2
+        )
+        updater._scrape_url = fake_scrape
+        for i in range(4):
+            updater._enqueue_for_batch(
+                f"https://example.com/products/widget-{i}", "widgets", "https://example.com/collections/widgets"
+            )
+        updater.process_queue_batch()
+        assert Path(updater.index_file).exists()
+        assert len(updater.pending_queue) == 2
+
+        # Switching an existing plain site to gzip
+        updater = AgnosticLLMsUpdater(
+            firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=2, compression="gzip"
+        )
+        updater._scrape_url = fake_scrape
+        assert len(updater.url_index) == 2
+        assert len(updater.pending_queue) == 2
+        updater.process_queue_batch()
+        updater.export_manifest()
+
+        directory = Path(updater.site_output_dir)
+        assert Path(updater.index_file + ".gz").exists()
+        assert not Path(updater.index_file).exists()
+        assert Path(updater.pending_queue_path + ".gz").exists()
+        assert not Path(updater.pending_queue_path).exists()
+        assert Path(updater.manifest_file + ".gz").exists()
+        assert sorted(p.name for p in directory.glob("llms-*.txt")) == ["llms-example-com-widgets.txt"]
+
+        reloaded = JsonProductStore(updater.index_file)
+        assert len(reloaded) == 4
+        assert json_storage.read_json(updater.manifest_file) == {"widgets": sorted(reloaded)}
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_convert_site():
+    """Test converting a site's files to gzip and back leaves the contents byte-identical."""
+    print("Test 4: convert_storage_compression round trip")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site = Path(tmp) / "example-com"
+        site.mkdir()
+        index = site / "llms-example-com-index.json"
+        queue = site / "pending-queue.json"
+        index.write_text('{\n"https://example.com/a": {"title": "A"}\n}\n', encoding='utf-8')
+        queue.write_text(json.dumps(DATA, indent=2), encoding='utf-8')
+        originals = {index.name: index.read_bytes(), queue.name: queue.read_bytes()}
+
+        assert convert_site("example-com", "gzip", dry_run=True, output_dir=tmp)
+        assert index.exists() and queue.exists()
+
+        assert convert_site("example-com", "gzip", output_dir=tmp)
+        assert sorted(p.name for p in site.iterdir()) == ["llms-example-com-index.json.gz", "pending-queue.json.gz"]
+
+        assert convert_site("example-com", "none", output_dir=tmp)
+        assert {p.name: p.read_bytes() for p in site.iterdir()} == originals
+
+        assert not convert_site("missing-site", "gzip", output_dir=tmp)
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("JSON STORAGE TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_gzip_round_trip,
+        test_unknown_and_unavailable_compression,
+        test_updater_compressed_storage,
+        test_convert_site
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Pending URL Queue
+
+Tests FIFO order and de-duplication, pruning without disturbing order,
+tombstone compaction, that the {"pending": [...]} snapshot format is
+unchanged, the append-only queue journal, and priority scheduling
+(realtime first, weighted classes, stalest refreshes first).
+
+Usage:
+    python3 tests/test_pending_queue.py
+"""
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from queue_priority import plan_batch
+from update_llms_agnostic import AgnosticLLMsUpdater, PendingQueue
+
+
+def url(i):
+    return f"https://example.com/products/widget-{i}"
+
+
+def fake_scrape(url, pre_scraped_content=None, is_diff=False):
+    name = url.rsplit('/', 1)[-1]
+    return {
+        "url": url,
+        "content": json.dumps({"product_name": name}),
+        "title": name,
+        "scraped_at": "2025-10-08T00:00:00"
+    }
+
+
+def test_fifo_and_membership():
+    """Test that entries come out in order, once, and membership tracks dequeues."""
+    print("Test 1: FIFO order, de-duplication and membership")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = PendingQueue(str(Path(tmp) / "pending-queue.json"))
+        for i in range(5):
+            assert queue.enqueue(url(i), url(i), {"category": "widgets"})
+        assert not queue.enqueue(url(2), url(2))
+        assert len(queue) == 5
+        assert url(3) in queue
+
+        assert [e["url"] for e in queue.peek_batch(2, offset=1)] == [url(1), url(2)]
+        batch = queue.dequeue_batch(3)
+        assert [e["url"] for e in batch] == [url(0), url(1), url(2)]
+        assert url(0) not in queue and len(queue) == 2
+
+        # A failed entry goes back to the tail
+        assert queue.enqueue_entry(batch[0])
+        assert not queue.enqueue_entry({"url": "no-normalized-url"})
+        assert [e["url"] for e in queue.dequeue_batch(10)] == [url(3), url(4), url(0)]
+        assert len(queue) == 0 and queue.dequeue_batch(1) == []
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_prune_and_compaction():
+    """Test that pruned URLs are skipped everywhere and tombstones get compacted."""
+    print("Test 2: Prune keeps order and compacts tombstones")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = PendingQueue(str(Path(tmp) / "pending-queue.json"))
+        for i in range(10):
+            queue.enqueue(url(i), url(i))
+
+        assert queue.prune({url(1), url(4), "https://example.com/not-queued"}) == 2
+        assert len(queue) == 8
+        assert url(4) not in queue
+        assert [e["url"] for e in queue.peek_batch(3)] == [url(0), url(2), url(3)]
+        assert [e["url"] for e in queue.dequeue_batch(2)] == [url(0), url(2)]
+
+        # Pruning most of the queue compacts the deque
+        assert queue.prune({url(i) for i in range(3, 9)} | {f"https://example.com/other-{i}" for i in range(20)}) == 5
+        assert queue._tombstones == 0 and len(queue) == 1
+        assert queue.as_list()[0]["url"] == url(9)
+
+        # A pruned URL can be queued again
+        assert queue.enqueue(url(4), url(4))
+        assert [e["url"] for e in queue.dequeue_batch(5)] == [url(9), url(4)]
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_file_format_unchanged():
+    """Test that the queue reads and writes the existing {"pending": [...]} file."""
+    print("Test 3: File format is unchanged")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "pending-queue.json"
+        entries = [
+            {"url": url(i), "normalized_url": url(i), "metadata": {}, "discovered_at": "2025-10-08T00:00:00"}
+            for i in range(4)
+        ]
+        path.write_text(json.dumps({"pending": entries}, ensure_ascii=False, indent=2), encoding='utf-8')
+        original = path.read_bytes()
+
+        queue = PendingQueue(str(path))
+        assert len(queue) == 4
+        queue.save()
+        assert path.read_bytes() == original, "Saving an untouched queue should not change the file"
+
+        queue.prune({url(1)})
+        queue.dequeue_batch(1)
+        queue.save()
+        assert PendingQueue(str(path)).as_list() == [entries[2], entries[3]]
+        queue.compact()
+        assert json.loads(path.read_text(encoding='utf-8')) == {"pending": [entries[2], entries[3]]}
+        assert not Path(queue.journal_path).exists()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_journal_appends_and_replays():
+    """Test that saves append operations instead of rewriting the snapshot, and replay restores them."""
+    print("Test 4: Saves append to the queue journal")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "retry-queue.json"
+        queue = PendingQueue(str(path), compact_every=10)
+        queue.enqueue(url(0), url(0))
+        queue.save()
+        snapshot = path.read_bytes()
+        journal = Path(queue.journal_path)
+        assert journal.name == "retry-queue.journal.jsonl"
+        assert not journal.exists(), "The first save writes the snapshot"
+
+        # One save per failed URL costs one appended line each
+        for i in range(1, 6):
+            queue.enqueue_entry({"url": url(i), "normalized_url": url(i), "metadata": {"attempts": 1}})
+            queue.save()
+        assert path.read_bytes() == snapshot
+        assert [json.loads(line)["op"] for line in journal.read_text(encoding='utf-8').splitlines()] == ["fail"] * 5
+
+        queue.dequeue_batch(2)
+        queue.prune({url(4)})
+        queue.save()
+        reloaded = PendingQueue(str(path), compact_every=10)
+        assert [e["url"] for e in reloaded.as_list()] == [url(2), url(3), url(5)]
+        assert reloaded.as_list()[0]["metadata"] == {"attempts": 1}
+
+        # A torn last line (crash mid-append) loses only that operation
+        with open(journal, 'a', encoding='utf-8') as f:
+            f.write('{"op": "ack", "url": ')
+        reloaded = PendingQueue(str(path), compact_every=10)
+        assert len(reloaded) == 3
+        reloaded.enqueue(url(6), url(6))
+        reloaded.save()
+        assert [e["url"] for e in PendingQueue(str(path)).as_list()] == [url(2), url(3), url(5), url(6)]
+
+        # Past compact_every lines the snapshot is rewritten and the journal restarts
+        for i in range(7, 12):
+            reloaded.enqueue(url(i), url(i))
+            reloaded.save()
+        assert len(json.loads(path.read_text(encoding='utf-8'))["pending"]) == 6
+        assert len(journal.read_text(encoding='utf-8').splitlines()) == 3
+        assert len(PendingQueue(str(path))) == 9
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_priority_scheduling():
+    """Test realtime-first, weighted batch filling and stalest-first refreshes."""
+    print("Test 5: Batches are filled by priority class")
+    print("-" * 80)
+
+    weights = {"discovery": 5, "backfill": 3, "refresh": 2}
+    assert plan_batch(10, {"realtime": 2, "discovery": 20, "backfill": 100, "refresh": 5}, weights) == \
+        {"realtime": 2, "discovery": 4, "backfill": 2, "refresh": 2}
+    # Shares a class cannot fill go to the others; realtime may take the whole batch
+    assert plan_batch(10, {"discovery": 1, "backfill": 100}, weights) == \
+        {"realtime": 0, "discovery": 1, "backfill": 9, "refresh": 0}
+    assert plan_batch(3, {"realtime": 5, "discovery": 5}, weights)["realtime"] == 3
+    assert sum(plan_batch(7, {"discovery": 2}, weights).values()) == 2
+    assert plan_batch(4, {"backfill": 9}, {"discovery": 1})["backfill"] == 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "pending-queue.json"
+        queue = PendingQueue(str(path), weights=weights)
+        for i in range(100):
+            queue.enqueue(url(i), url(i), {"priority": "backfill"})
+        # Entries queued before priority classes existed
+        queue.enqueue(url(100), url(100), {"source_category": "site_map_discovery"})
+        for i in range(200, 220):
+            queue.enqueue(url(i), url(i), {})
+        for i, updated in zip(range(300, 305), ["2025-06-01", "2025-01-01", "", "2025-03-01", "2025-09-01"]):
+            queue.enqueue(url(i), url(i), {"priority": "refresh", "last_updated": updated})
+        queue.enqueue(url(400), url(400), {"priority": "realtime"})
+        queue.enqueue(url(401), url(401), {"priority": "realtime"})
+        assert queue.counts() == {"realtime": 2, "discovery": 20, "backfill": 101, "refresh": 5}
+        queue.save()
+
+        # Already-indexed refresh and realtime URLs survive pruning
+        assert queue.prune({url(0), url(300), url(400)}) == 1
+
+        batch = [entry["url"] for entry in queue.dequeue_batch(10)]
+        assert batch[:2] == [url(400), url(401)]
+        assert batch[2:6] == [url(200), url(201), url(202), url(203)]
+        assert batch[6:8] == [url(1), url(2)]
+        # Never-scraped first, then oldest
+        assert batch[8:] == [url(302), url(301)]
+
+        queue.save()
+        reloaded = PendingQueue(str(path), weights=weights)
+        assert reloaded.counts() == {"realtime": 0, "discovery": 16, "backfill": 98, "refresh": 3}
+        assert [entry["url"] for entry in reloaded.dequeue_batch(3) if entry["metadata"].get("priority") == "refresh"] \
+            == [url(303)]
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_realtime_update_jumps_backlog():
+    """Test that webhook URLs queued as realtime are scraped in the next batch despite a backlog."""
+    print("Test 6: Realtime updates and stale refreshes through the updater")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=5)
+        scraped = []
+
+        def recording_scrape(url, pre_scraped_content=None, is_diff=False):
+            scraped.append(url)
+            return fake_scrape(url)
+
+        updater._scrape_url = recording_scrape
+        for i in range(50):
+            updater._enqueue_for_batch(url(i), "widgets", "https://example.com/collections/widgets")
+
+        webhook = ["https://example.com/products/new-widget", "https://example.com/products/widget-0"]
+        result = updater.queue_realtime_update(webhook, "added")
+        assert result["realtime_queued"] == 2
+        assert scraped[:2] == webhook, f"Realtime URLs should lead the batch, got {scraped[:2]}"
+        assert len(scraped) == 5
+        assert all(updater._normalize_url(u) in updater.url_index for u in webhook)
+        assert len(updater.pending_queue) == 46
+
+        # Stale refreshes re-scrape indexed products, oldest first
+        scraped.clear()
+        updater.url_index[updater._normalize_url(url(2))] = dict(
+            updater.url_index[updater._normalize_url(url(2))], updated_at="2020-01-01T00:00:00"
+        )
+        updater.batch_size = 3
+        updater.pending_queue.weights = {"discovery": 1, "backfill": 1, "refresh": 1}
+        refresh = updater.queue_stale_refreshes(2)
+        assert refresh["queued"] == 2
+        updater.process_queue_batch()
+        assert updater._normalize_url(scraped[-1]) == updater._normalize_url(url(2))
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("PENDING QUEUE TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_fifo_and_membership,
+        test_prune_and_compaction,
+        test_file_format_unchanged,
+        test_journal_appends_and_replays,
+        test_priority_scheduling,
+        test_realtime_update_jumps_backlog
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the URL Index Product Store
+
+Tests the SQLite backend's dict behaviour and record layout, the one-time
+import of an existing JSON index, per-shard lookups, and that the updater
+produces the same index and shards with --index-backend sqlite as with the
+JSON backend, and that a backend missing one of the store methods
+cannot be created. Also tests that product JSON is stored as structured fields
+and renders to the same shard text as the older string records.
+
+Usage:
+    python3 tests/test_product_store.py
+"""
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from product_store import (
+    JsonProductStore, ProductStore, SqliteProductStore, changed_fields, content_fields, open_product_store, record_text
+)
+from shard_writer import render_block
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+RECORD = {
+    "title": "Widget",
+    "markdown": "{\"product_name\": \"Widget\"}",
+    "shard_key": "widgets",
+    "source_url": "https://example.com/collections/widgets",
+    "updated_at": "2025-10-08T00:00:00"
+}
+
+
+def fake_scrape(url, pre_scraped_content=None, is_diff=False):
+    name = url.rsplit('/', 1)[-1]
+    return {
+        "url": url,
+        "content": json.dumps({"product_name": name}),
+        "title": name,
+        "scraped_at": "2025-10-08T00:00:00"
+    }
+
+
+def test_sqlite_round_trip():
+    """Test that records survive a reopen unchanged, including key order."""
+    print("Test 1: SQLite store round-trips records")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "index.db")
+        store = SqliteProductStore(path)
+        store["https://example.com/products/widget"] = RECORD
+        store["https://example.com/products/other"] = dict(RECORD, title="Other")
+        del store["https://example.com/products/other"]
+        store.close()
+
+        reopened = SqliteProductStore(path)
+        record = reopened["https://example.com/products/widget"]
+        assert record == RECORD
+        assert list(record) == list(RECORD), f"Key order changed: {list(record)}"
+        assert len(reopened) == 1
+        assert "https://example.com/products/other" not in reopened
+        assert reopened.get("https://example.com/products/other") is None
+        reopened.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_json_index_imported_once():
+    """Test that the first SQLite open imports the JSON index, later opens do not."""
+    print("Test 2: Existing JSON index is imported on first open")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = str(Path(tmp) / "index.json")
+        db_path = str(Path(tmp) / "index.db")
+        legacy = {f"https://example.com/products/widget-{i}": dict(RECORD, title=f"Widget {i}") for i in range(3)}
+        Path(json_path).write_text(json.dumps(legacy), encoding='utf-8')
+
+        store = open_product_store("sqlite", json_path, db_path)
+        assert dict(store.items()) == legacy
+        store.close()
+
+        # The database is now the source of truth
+        Path(json_path).write_text("{}", encoding='utf-8')
+        store = open_product_store("sqlite", json_path, db_path)
+        assert len(store) == 3
+        store.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_by_shard_and_url_set():
+    """Test shard lookups (shard_key or shard), the derived manifest and the store-backed URL set."""
+    print("Test 3: Shard lookups, manifest and known-URL set")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteProductStore(str(Path(tmp) / "index.db"))
+        store["https://example.com/a"] = RECORD
+        store["https://example.com/b"] = {"title": "B", "markdown": "", "shard": "widgets", "updated_at": None}
+        store["https://example.com/c"] = dict(RECORD, shard_key="gadgets")
+
+        assert sorted(store.by_shard("widgets")) == ["https://example.com/a", "https://example.com/b"]
+        assert sorted(store.get_many(["https://example.com/c", "https://example.com/missing"])) == ["https://example.com/c"]
+        assert store.shard_urls("widgets") == ["https://example.com/a", "https://example.com/b"]
+        assert store.has_shard("gadgets") and not store.has_shard("tools")
+        assert store._manifest is None, "Shard lookups should not build the manifest"
+
+        urls = store.url_set()
+        urls.add("https://example.com/queued")
+        assert "https://example.com/a" in urls
+        assert "https://example.com/queued" in urls
+        assert len(urls) == 4
+        urls.discard("https://example.com/queued")
+        assert "https://example.com/queued" not in urls
+
+        assert store.manifest == {
+            "widgets": ["https://example.com/a", "https://example.com/b"],
+            "gadgets": ["https://example.com/c"]
+        }
+        del store["https://example.com/a"]
+        assert store.manifest["widgets"] == ["https://example.com/b"]
+        store.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_updater_backends_match():
+    """Test that the SQLite backend exports the same index and writes the same shards as JSON."""
+    print("Test 4: Updater output is identical for both backends")
+    print("-" * 80)
+
+    outputs = []
+    for backend in ("json", "sqlite"):
+        with tempfile.TemporaryDirectory() as tmp:
+            updater = AgnosticLLMsUpdater(
+                firecrawl_api_key="test_key",
+                domain="example.com",
+                output_dir=tmp,
+                batch_size=50,
+                index_backend=backend
+            )
+            updater._scrape_url = fake_scrape
+            for i in range(6):
+                category = "widgets" if i % 2 else "gadgets"
+                updater._enqueue_for_batch(
+                    f"https://example.com/products/{category}-{i}", category,
+                    f"https://example.com/collections/{category}"
+                )
+            result = updater.process_queue_batch()
+            assert result["processed_urls"] == 6
+
+            if backend == "sqlite":
+                assert updater.url_index._manifest is None, "Shard writes should not build the whole manifest"
+                assert Path(updater.index_db_file).exists()
+                assert not Path(updater.index_file).exists(), "SQLite backend should not rewrite the JSON index"
+                updater.url_index.export_json(updater.index_file)
+
+            directory = Path(updater.site_output_dir)
+            shards = {p.name: p.read_text(encoding='utf-8') for p in directory.glob("llms-*.txt")}
+            index = Path(updater.index_file).read_text(encoding='utf-8')
+            outputs.append((shards, index))
+            updater.url_index.close()
+
+    assert outputs[0] == outputs[1], "SQLite backend output differs from JSON backend"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_json_store_is_default():
+    """Test that the JSON backend remains the default and incomplete backends are rejected."""
+    print("Test 5: JSON backend is the default")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp)
+        assert updater.index_backend == "json"
+        assert isinstance(updater.url_index, JsonProductStore)
+        try:
+            open_product_store("csv", "index.json", "index.db")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Unknown backend should raise ValueError")
+
+    class NoSaveStore(ProductStore):
+        def __init__(self):
+            self._data = {}
+
+        def _put(self, url, record):
+            self._data[url] = record
+
+        def _delete(self, url):
+            del self._data[url]
+
+        def __getitem__(self, url):
+            return self._data[url]
+
+        def __iter__(self):
+            return iter(self._data)
+
+        def __len__(self):
+            return len(self._data)
+
+    try:
+        NoSaveStore()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("A backend without save() should fail when it is created")
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_structured_product_records():
+    """Test that product JSON is stored structured and renders as before."""
+    print("Test 6: Product fields are stored as structured data")
+    print("-" * 80)
+
+    product = {"product_name": "Bohrer Ø5", "price": "€4.99", "availability": "In stock",
+               "specifications": {"diameter": "5 mm"}}
+    content = json.dumps(product, indent=2, ensure_ascii=False)
+    assert content_fields(content) == {"product": product}
+    assert content_fields(content + "\n\n") == {"product": product}
+    # Anything that would not render back byte-for-byte stays text
+    assert content_fields('{"price": "4.99"}') == {"markdown": '{"price": "4.99"}'}
+    assert content_fields("# Widget") == {"markdown": "# Widget"}
+
+    url = "https://example.com/products/drill"
+    legacy = {"title": "Drill", "markdown": content, "shard_key": "drills"}
+    structured = {"title": "Drill", "product": product, "shard_key": "drills"}
+    assert record_text(structured) == content
+    assert render_block(url, structured) == render_block(url, legacy)
+
+    assert changed_fields(structured, dict(structured, product=dict(product, price="€5.49"))) == ["price"]
+    assert changed_fields(legacy, structured) == []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp)
+        updater._update_url_data(
+            "https://example.com/collections/drills/drill",
+            {"title": "Drill", "content": content, "scraped_at": "2025-10-08T00:00:00"}
+        )
+        updater._save_url_index()
+        text = Path(updater.index_file).read_text(encoding='utf-8')
+        record = json.loads(text)[updater._normalize_url("https://example.com/collections/drills/drill")]
+        assert list(record) == ["title", "product", "shard_key", "updated_at"]
+        assert record["product"]["price"] == "€4.99"
+        assert len(text.splitlines()) == 3, "Index should hold one record per line"
+
+        store = SqliteProductStore(str(Path(tmp) / "index.db"))
+        store[url] = dict(structured, updated_at=None)
+        store.close()
+        store = SqliteProductStore(str(Path(tmp) / "index.db"))
+        assert store[url] == dict(structured, updated_at=None)
+        assert "markdown" not in store[url]
+        store.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("PRODUCT STORE TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_sqlite_round_trip,
+        test_json_index_imported_once,
+        test_by_shard_and_url_set,
+        test_updater_backends_match,
+        test_json_store_is_default,
+        test_structured_product_records
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Firecrawl Rate Limiting
+
+Tests the shared token-bucket limiter that paces every Firecrawl call,
+including its adaptive (AIMD) response to 429 / Retry-After, where
+simultaneous 429s count as one throttling event.
+
+Usage:
+    python3 tests/test_rate_limiter.py
+"""
+
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from rate_limiter import TokenBucketRateLimiter, get_rate_limiter, parse_retry_after
+import update_llms_agnostic
+
+
+def test_burst_then_paced():
+    """Test that a full bucket allows a burst, then requests are paced."""
+    print("Test 1: Burst followed by steady-rate pacing")
+    print("-" * 80)
+
+    limiter = TokenBucketRateLimiter(requests_per_second=20, burst=3, max_in_flight=10)
+
+    start = time.monotonic()
+    for _ in range(3):
+        with limiter:
+            pass
+    burst_elapsed = time.monotonic() - start
+
+    start = time.monotonic()
+    for _ in range(4):
+        with limiter:
+            pass
+    paced_elapsed = time.monotonic() - start
+
+    print(f"Burst of 3: {burst_elapsed:.3f}s, next 4: {paced_elapsed:.3f}s")
+    assert burst_elapsed < 0.05, "Burst should not wait"
+    assert paced_elapsed >= 0.15, "Requests beyond the burst should be paced at 20 req/s"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_max_in_flight():
+    """Test that concurrent callers never exceed max_in_flight."""
+    print("Test 2: In-flight cap across threads")
+    print("-" * 80)
+
+    limiter = TokenBucketRateLimiter(requests_per_second=1000, burst=100, max_in_flight=2)
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def worker():
+        with limiter:
+            with lock:
+                state["current"] += 1
+                state["peak"] = max(state["peak"], state["current"])
+            time.sleep(0.02)
+            with lock:
+                state["current"] -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"Peak in flight: {state['peak']}")
+    assert state["peak"] == 2, f"Expected peak of 2, got {state['peak']}"
+    assert limiter.in_flight == 0
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_shared_per_api_key():
+    """Test that limiters are shared per API key."""
+    print("Test 3: One limiter per API key")
+    print("-" * 80)
+
+    first = get_rate_limiter("key-a", {"requests_per_second": 5})
+    second = get_rate_limiter("key-a", {"requests_per_second": 50})
+    other = get_rate_limiter("key-b")
+
+    assert first is second, "Same key should share a limiter"
+    assert first is not other, "Different keys should not share a limiter"
+    assert first.requests_per_second == 5, "First configuration should win"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_parse_retry_after():
+    """Test Retry-After and X-RateLimit header parsing."""
+    print("Test 4: Retry-After / rate-limit header parsing")
+    print("-" * 80)
+
+    now = 1_700_000_000.0
+    assert parse_retry_after({"Retry-After": "7"}, now) == 7.0
+    assert parse_retry_after({"Retry-After": "Tue, 14 Nov 2023 22:13:30 GMT"}, now) == 10.0
+    assert parse_retry_after({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "12"}, now) == 12.0
+    assert parse_retry_after({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(now + 3)}, now) == 3.0
+    assert parse_retry_after({"X-RateLimit-Remaining": "4", "X-RateLimit-Reset": "12"}, now) is None
+    assert parse_retry_after({}, now) is None
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_aimd_adjustment():
+    """Test multiplicative decrease on 429 and additive increase on success."""
+    print("Test 5: AIMD rate adjustment")
+    print("-" * 80)
+
+    limiter = TokenBucketRateLimiter(
+        requests_per_second=8, burst=5, max_in_flight=5,
+        min_requests_per_second=1, decrease_factor=0.5,
+        increase_step=1, success_threshold=3
+    )
+
+    limiter.observe_response(429, {"Retry-After": "0"})
+    assert limiter.current_rate == 4, f"Expected rate 4 after 429, got {limiter.current_rate}"
+    limiter.observe_response(429, {"Retry-After": "0"})
+    limiter.observe_response(429, {"Retry-After": "0"})
+    limiter.observe_response(429, {"Retry-After": "0"})
+    assert limiter.current_rate == 1, "Rate should not drop below the configured floor"
+
+    for _ in range(6):
+        limiter.observe_response(200, {})
+    print(f"Rate after 6 successes: {limiter.current_rate}")
+    assert limiter.current_rate == 3, f"Expected rate 3 after two success runs, got {limiter.current_rate}"
+
+    for _ in range(30):
+        limiter.observe_response(200, {})
+    assert limiter.current_rate == 8, "Rate should recover to, and not exceed, the ceiling"
+
+    # Several in-flight requests throttled at once are one event: the rate is cut once
+    for _ in range(4):
+        limiter.observe_response(429, {"Retry-After": "0.05"})
+    assert limiter.current_rate == 4, f"Expected one decrease for one throttle event, got {limiter.current_rate}"
+    time.sleep(0.06)
+    limiter.observe_response(429, {"Retry-After": "0"})
+    assert limiter.current_rate == 2, "A throttle after the pause ended is a new event"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_firecrawl_post_retries_throttle():
+    """Test that _firecrawl_post absorbs transient 429s instead of failing."""
+    print("Test 6: Throttled Firecrawl calls are retried, not failed")
+    print("-" * 80)
+
+    class FakeResponse:
+        def __init__(self, status_code, headers=None):
+            self.status_code = status_code
+            self.headers = headers or {}
+
+    responses = [
+        FakeResponse(429, {"Retry-After": "0"}),
+        FakeResponse(429, {"Retry-After": "0"}),
+        FakeResponse(200),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = update_llms_agnostic.AgnosticLLMsUpdater(
+            firecrawl_api_key="throttle-test-key",
+            domain="example.com",
+            output_dir=tmp
+        )
+        updater.rate_limiter = TokenBucketRateLimiter(requests_per_second=100, burst=5, max_in_flight=5)
+        with mock.patch.object(updater.firecrawl_http.session, "request", side_effect=responses) as post:
+            response = updater._firecrawl_post("scrape", {"url": "https://example.com"})
+
+        assert post.call_count == 3, f"Expected 3 calls, got {post.call_count}"
+        assert response.status_code == 200
+        assert post.call_args.kwargs["timeout"] == 60, "Scrape calls should use the scrape timeout"
+        assert updater.rate_limiter.current_rate < updater.rate_limiter.requests_per_second
+
+        # Persistent throttling is eventually surfaced to the caller
+        updater.max_throttle_retries = 1
+        with mock.patch.object(updater.firecrawl_http.session, "request",
+                               return_value=FakeResponse(429, {"Retry-After": "0"})) as post:
+            response = updater._firecrawl_post("scrape", {"url": "https://example.com"})
+        assert post.call_count == 2
+        assert response.status_code == 429
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("RATE LIMITER TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_burst_then_paced,
+        test_max_in_flight,
+        test_shared_per_api_key,
+        test_parse_retry_after,
+        test_aimd_adjustment,
+        test_firecrawl_post_retries_throttle
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
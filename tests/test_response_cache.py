@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Firecrawl Response Cache
+
+Tests cache keys (URL + formats + schema), TTL expiry, size-bounded LRU
+eviction, the use/refresh/off modes, and that repeated product scrapes are
+served from out/<site>/.cache/ instead of hitting Firecrawl again.
+
+Usage:
+    python3 tests/test_response_cache.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from rate_limiter import TokenBucketRateLimiter
+from response_cache import ResponseCache, cache_key
+from update_llms_agnostic import AgnosticLLMsUpdater, PRODUCT_JSON_SCHEMA
+
+
+def product_payload(url, schema=None):
+    return {
+        "url": url,
+        "formats": [{"type": "json", "schema": schema or PRODUCT_JSON_SCHEMA}],
+        "onlyMainContent": False
+    }
+
+
+def test_cache_key_covers_formats_and_schema():
+    """Test that the key changes with the URL, formats and schema, not with key order."""
+    print("Test 1: Cache key covers URL, formats and schema")
+    print("-" * 80)
+
+    base = product_payload("https://example.com/products/a?currency=EUR")
+    reordered = {"onlyMainContent": False, "formats": base["formats"], "url": base["url"]}
+    assert cache_key(base) == cache_key(reordered)
+    assert cache_key(base) != cache_key(product_payload("https://example.com/products/b?currency=EUR"))
+    assert cache_key(base) != cache_key(product_payload(base["url"], schema={"type": "object"}))
+    assert cache_key(base) != cache_key(dict(base, formats=["markdown"]))
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_ttl_and_modes():
+    """Test TTL expiry and the use/refresh/off modes."""
+    print("Test 2: TTL expiry and cache modes")
+    print("-" * 80)
+
+    payload = product_payload("https://example.com/products/a?currency=EUR")
+    response = {"success": True, "data": {"json": {"product_name": "A"}}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, ".cache")
+        cache = ResponseCache(cache_dir, ttl_hours=1)
+        assert not os.path.exists(cache_dir), "Cache directory should be created lazily"
+        assert cache.get(payload) is None
+        cache.put(payload, response)
+        assert cache.get(payload) == response
+
+        # Expired entries are misses
+        expired = ResponseCache(cache_dir, ttl_hours=0)
+        time.sleep(0.01)
+        assert expired.get(payload) is None
+
+        refresh = ResponseCache(cache_dir, mode="refresh")
+        assert refresh.get(payload) is None, "refresh mode must not read earlier entries"
+        refresh.put(payload, {"success": True, "data": {"json": {"product_name": "A2"}}})
+        assert cache.get(payload)["data"]["json"]["product_name"] == "A2", "refresh mode still writes"
+        assert refresh.get(payload)["data"]["json"]["product_name"] == "A2", "refresh mode reads its own entries"
+
+        off = ResponseCache(os.path.join(tmp, "off-cache"), mode="off")
+        off.put(payload, response)
+        assert off.get(payload) is None
+        assert not os.path.exists(os.path.join(tmp, "off-cache"))
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_lru_eviction():
+    """Test that the least recently used entries are evicted past max_size_mb."""
+    print("Test 3: Size-bounded LRU eviction")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Room for roughly two ~1KB entries
+        cache = ResponseCache(os.path.join(tmp, ".cache"), max_size_mb=2500 / (1024 * 1024))
+        payloads = [product_payload(f"https://example.com/products/{i}") for i in range(3)]
+        body = {"success": True, "data": {"markdown": "x" * 1000}}
+
+        cache.put(payloads[0], body)
+        time.sleep(0.01)
+        cache.put(payloads[1], body)
+        time.sleep(0.01)
+        assert cache.get(payloads[0]) is not None  # 0 is now more recent than 1
+        time.sleep(0.01)
+        cache.put(payloads[2], body)
+
+        assert cache.get(payloads[1]) is None, "Least recently used entry should be evicted"
+        assert cache.get(payloads[0]) is not None
+        assert cache.get(payloads[2]) is not None
+        assert cache.stats()["entries"] == 2
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_repeated_scrapes_served_from_cache():
+    """Test that scraping the same product twice only calls Firecrawl once."""
+    print("Test 4: Repeated product scrapes hit the cache")
+    print("-" * 80)
+
+    class FakeResponse:
+        status_code = 200
+        headers = {}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"success": True, "data": {"json": {"product_name": "Widget"}}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(
+            firecrawl_api_key="response-cache-test-key",
+            domain="example.com",
+            output_dir=tmp
+        )
+        updater.rate_limiter = TokenBucketRateLimiter(requests_per_second=100, burst=5, max_in_flight=5)
+        url = "https://example.com/products/widget"
+
+        with mock.patch.object(updater.firecrawl_http.session, "request", return_value=FakeResponse()) as post:
+            first = updater._extract_product_data(url)
+            second = updater._extract_product_data(url)
+        assert post.call_count == 1, f"Expected 1 Firecrawl call, got {post.call_count}"
+        assert first["content"] == second["content"]
+        assert first["title"] == "Widget"
+        assert os.path.isdir(os.path.join(updater.site_output_dir, ".cache"))
+
+        # A new run within the TTL is also free; refresh mode pays again
+        rerun = AgnosticLLMsUpdater(
+            firecrawl_api_key="response-cache-test-key", domain="example.com", output_dir=tmp
+        )
+        refresh = AgnosticLLMsUpdater(
+            firecrawl_api_key="response-cache-test-key", domain="example.com", output_dir=tmp,
+            cache_mode="refresh"
+        )
+        with mock.patch.object(rerun.firecrawl_http.session, "request", return_value=FakeResponse()) as post:
+            rerun._extract_product_data(url)
+        assert post.call_count == 0
+        with mock.patch.object(refresh.firecrawl_http.session, "request", return_value=FakeResponse()) as post:
+            refresh._extract_product_data(url)
+        assert post.call_count == 1
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("RESPONSE CACHE TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_cache_key_covers_formats_and_schema,
+        test_ttl_and_modes,
+        test_lru_eviction,
+        test_repeated_scrapes_served_from_cache
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
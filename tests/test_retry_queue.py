@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Scheduled Retry Queue
+
+Tests the backoff schedule per error class, that both queue backends only
+hand out retry entries whose not_before has passed, and that the updater
+classifies failures, drains due retries in normal batch runs and
+dead-letters URLs that keep failing, and that an interrupted batch hands
+its unprocessed entries back to the queues on disk.
+
+Usage:
+    python3 tests/test_retry_queue.py
+"""
+
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from retry_policy import RetryPolicy, error_class_for_exception
+from update_llms_agnostic import AgnosticLLMsUpdater, PendingQueue
+from work_queue import SqliteWorkQueue
+
+
+def url(i):
+    return f"https://example.com/products/widget-{i}"
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f"{status_code} error", response=response)
+
+
+def test_backoff_schedule():
+    """Test exponential delays, the cap, per-class overrides and dead-lettering."""
+    print("Test 1: Backoff schedule per error class")
+    print("-" * 80)
+
+    now = datetime(2025, 10, 8, 12, 0, 0)
+    policy = RetryPolicy({"base_delay_minutes": 60, "max_delay_hours": 6})
+    assert policy.next_attempt(1, "no_data", now) == now + timedelta(hours=1)
+    assert policy.next_attempt(3, "no_data", now) == now + timedelta(hours=4)
+    assert policy.next_attempt(4, "no_data", now) == now + timedelta(hours=6), "Delays are capped"
+    assert policy.next_attempt(5, "no_data", now) is None, "Dead-lettered after max_attempts"
+    # Class defaults still apply unless overridden
+    assert policy.next_attempt(1, "timeout", now) == now + timedelta(minutes=10)
+    assert policy.next_attempt(2, "not_found", now) is None
+
+    policy = RetryPolicy({"error_classes": {"not_found": {"max_attempts": 4}}, "batch_share": 0})
+    assert policy.next_attempt(2, "not_found", now) == now + timedelta(hours=24)
+    assert policy.setting("not_found", "base_delay_minutes") == 720
+    assert policy.retry_slots(10) == 0 and RetryPolicy().retry_slots(10) == 2
+
+    assert error_class_for_exception(http_error(404)) == "not_found"
+    assert error_class_for_exception(http_error(503)) == "server_error"
+    assert error_class_for_exception(http_error(429)) == "throttled"
+    assert error_class_for_exception(requests.exceptions.ReadTimeout()) == "timeout"
+    assert error_class_for_exception(requests.exceptions.ConnectionError()) == "network"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_dequeue_due_both_backends():
+    """Test that only due entries are handed out, earliest first, on both queue backends."""
+    print("Test 2: Only due retries are dequeued")
+    print("-" * 80)
+
+    now = datetime(2025, 10, 8, 12, 0, 0)
+    schedule = [
+        (0, (now + timedelta(hours=1)).isoformat()),
+        (1, (now - timedelta(hours=1)).isoformat()),
+        (2, None),  # queued before backoff existed
+        (3, (now - timedelta(hours=2)).isoformat()),
+        (4, (now + timedelta(minutes=1)).isoformat()),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queues = [
+            PendingQueue(str(Path(tmp) / "retry-queue.json")),
+            SqliteWorkQueue(str(Path(tmp) / "work-queue.db"), "retry"),
+        ]
+        for queue in queues:
+            for i, not_before in schedule:
+                metadata = {"attempts": 1}
+                if not_before:
+                    metadata["not_before"] = not_before
+                queue.enqueue_entry({"url": url(i), "normalized_url": url(i), "metadata": metadata})
+
+            assert [e["url"] for e in queue.dequeue_due(2, now)] == [url(2), url(3)]
+            assert [e["url"] for e in queue.dequeue_due(5, now)] == [url(1)]
+            assert queue.dequeue_due(5, now) == []
+            later = queue.dequeue_due(5, now + timedelta(hours=2))
+            assert [e["url"] for e in later] == [url(4), url(0)]
+            queue.ack(later)
+
+        queues[0].save()
+        assert len(PendingQueue(str(Path(tmp) / "retry-queue.json"))) == 0
+        assert len(queues[1]) == 3, "Claimed sqlite entries stay until acked"
+        queues[1].close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_updater_drains_and_dead_letters():
+    """Test that failures are scheduled by class, drained when due and dead-lettered at the limit."""
+    print("Test 3: Batch runs drain due retries and dead-letter repeat failures")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=5)
+        broken = {url(0): http_error(404), url(1): requests.exceptions.ReadTimeout()}
+        scraped = []
+
+        def fake_firecrawl_scrape(payload):
+            page = payload["url"].split('?')[0]
+            scraped.append(page)
+            if page in broken:
+                raise broken[page]
+            name = page.rsplit('/', 1)[-1]
+            return {"success": True, "data": {"json": {"product_name": name, "description": name, "price": "€1"}}}
+
+        updater._firecrawl_scrape = fake_firecrawl_scrape
+        for i in range(2):
+            updater._enqueue_for_batch(url(i), "widgets", "https://example.com/collections/widgets")
+        result = updater.process_queue_batch()
+        assert result["failed_urls"] == [url(0), url(1)]
+
+        entries = {e["url"]: e["metadata"] for e in updater.retry_queue.as_list()}
+        assert entries[url(0)]["error_class"] == "not_found"
+        assert entries[url(1)]["error_class"] == "timeout"
+        assert entries[url(1)]["not_before"] > datetime.now().isoformat()
+
+        # Not due yet: the next run leaves the retries alone
+        scraped.clear()
+        for i in range(2, 4):
+            updater._enqueue_for_batch(url(i), "widgets", "https://example.com/collections/widgets")
+        updater.process_queue_batch()
+        assert sorted(scraped) == [url(2), url(3)]
+
+        # Once due, a normal run picks them up; the second 404 dead-letters url 0
+        for entry in updater.retry_queue.as_list():
+            entry["metadata"]["not_before"] = "2000-01-01T00:00:00"
+        del broken[url(1)]
+        scraped.clear()
+        result = updater.process_queue_batch()
+        assert result["retried_urls"] == 2 and result["processed_urls"] == 1
+        assert updater._normalize_url(url(1)) in updater.url_index
+        assert len(updater.retry_queue) == 0
+        dead = updater.dead_letter_queue.as_list()
+        assert [e["url"] for e in dead] == [url(0)] and dead[0]["metadata"]["attempts"] == 2
+
+        # Dead letters survive a restart and are never retried automatically
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=5)
+        assert len(updater.dead_letter_queue) == 1 and len(updater.retry_queue) == 0
+        assert updater.requeue_dead_letters()["requeued"] == 1
+        requeued = updater.retry_queue.as_list()[0]["metadata"]
+        assert "attempts" not in requeued and "not_before" not in requeued
+        assert requeued["error_class"] == "not_found"
+        assert len(updater.dead_letter_queue) == 0
+        assert len(PendingQueue(updater.dead_letter_queue_path)) == 0
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_interrupted_batch_keeps_due_retries():
+    """Test that entries handed back by an interrupted batch are saved, even after a mid-batch retry save."""
+    print("Test 4: An interrupted batch saves the entries it hands back")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=5)
+        updater.retry_queue.enqueue_entry({
+            "url": url(0), "normalized_url": url(0),
+            "metadata": {"attempts": 1, "not_before": "2000-01-01T00:00:00", "category_shard_key": "widgets"}
+        })
+        updater.retry_queue.save()
+        for i in (1, 2, 3):
+            updater._enqueue_for_batch(url(i), "widgets", "https://example.com/collections/widgets")
+
+        def interrupted_scrape(page_url, pre_scraped_content=None, is_diff=False):
+            if page_url == url(1):
+                return {"url": page_url, "content": "{}", "title": "W1", "scraped_at": "2025-10-08T00:00:00"}
+            if page_url == url(2):
+                return None  # queued for retry, which saves the retry queue mid-batch
+            raise KeyboardInterrupt
+
+        updater._scrape_url = interrupted_scrape
+        try:
+            updater.process_queue_batch()
+            assert False, "The batch should have been interrupted"
+        except KeyboardInterrupt:
+            pass
+
+        reloaded = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=5)
+        assert url(0) in reloaded.retry_queue, "The unprocessed due retry must survive on disk"
+        assert url(2) in reloaded.retry_queue
+        assert url(3) in reloaded.pending_queue
+        assert reloaded._normalize_url(url(1)) in reloaded.url_index, "Results before the interrupt are kept"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("RETRY QUEUE TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_backoff_schedule,
+        test_dequeue_due_both_backends,
+        test_updater_drains_and_dead_letters,
+        test_interrupted_batch_keeps_due_retries
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Set-Backed Shard Manifest
+
+Tests that ShardUrls keeps list semantics (order, append, remove), that the
+manifest is derived from the index, follows shard changes and is written
+only on export, and that bulk adds and removals in one large shard run in
+linear time.
+
+Usage:
+    python3 tests/test_shard_manifest.py
+"""
+
+import sys
+import json
+import time
+import tempfile
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from shard_manifest import ShardManifest, ShardUrls
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+
+def test_shard_urls_behaves_like_list():
+    """Test ordering, duplicate appends and list-style removal."""
+    print("Test 1: ShardUrls keeps list semantics")
+    print("-" * 80)
+
+    urls = ShardUrls(["b", "a"])
+    urls.append("c")
+    urls.append("a")
+    assert list(urls) == ["b", "a", "c"], "Duplicates must keep their original position"
+    assert urls == ["b", "a", "c"]
+    assert "a" in urls and "z" not in urls
+
+    urls.remove("a")
+    assert urls == ["b", "c"]
+    try:
+        urls.remove("a")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Removing a missing URL should raise ValueError")
+
+    manifest = ShardManifest()
+    manifest["widgets"] = []
+    manifest["widgets"].append("https://example.com/a")
+    manifest.setdefault("gadgets", []).append("https://example.com/b")
+    assert isinstance(manifest["widgets"], ShardUrls)
+    assert manifest == {"widgets": ["https://example.com/a"], "gadgets": ["https://example.com/b"]}
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_manifest_derived_from_index():
+    """Test that the manifest comes from the index and is only written on export."""
+    print("Test 2: Manifest is derived from the index and exported on demand")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp)
+        index = {
+            "https://example.com/z": {"title": "Z", "markdown": "", "shard_key": "widgets"},
+            "https://example.com/m": {"title": "M", "markdown": "", "shard": "gadgets"},
+            "https://example.com/a": {"title": "A", "markdown": "", "shard_key": "widgets"}
+        }
+        Path(updater.index_file).write_text(json.dumps(index), encoding='utf-8')
+        # A stale manifest file is not read
+        Path(updater.manifest_file).write_text(json.dumps({"old": ["https://example.com/z"]}), encoding='utf-8')
+
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp)
+        assert isinstance(updater.manifest, ShardManifest)
+        assert updater.manifest == {
+            "widgets": ["https://example.com/z", "https://example.com/a"],
+            "gadgets": ["https://example.com/m"]
+        }
+
+        updater.export_manifest()
+        exported = Path(updater.manifest_file).read_text(encoding='utf-8')
+        assert exported == json.dumps(updater.manifest.to_dict(), indent=2, ensure_ascii=False, sort_keys=True)
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_shard_change_moves_url():
+    """Test that re-assigning a URL's shard moves it instead of listing it twice."""
+    print("Test 3: Changing a record's shard moves it in the manifest")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp)
+        scraped = {"title": "Item", "content": "{}", "scraped_at": "2025-10-08T00:00:00"}
+        url = "https://example.com/products/item"
+        key = updater._normalize_url(url)
+
+        updater._update_url_data_with_category(url, scraped, "widgets")
+        updater._update_url_data_with_category(url, scraped, "gadgets")
+        assert updater.manifest == {"gadgets": [key]}
+        assert updater.manifest.shard_of(key) == "gadgets"
+
+        updater._remove_url_data(url)
+        assert updater.manifest == {}
+        assert not Path(updater.manifest_file).exists(), "Manifest file is only written on export"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_bulk_operations_scale_linearly():
+    """Test that adding then removing many URLs in one shard stays fast."""
+    print("Test 4: Bulk adds and removals in one shard are linear")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp)
+        count = 20000
+        scraped = {"title": "Item", "content": "{}", "scraped_at": "2025-10-08T00:00:00"}
+
+        start = time.monotonic()
+        for i in range(count):
+            updater._update_url_data(f"https://example.com/collections/uncategorized/item-{i}", scraped)
+        for i in range(0, count, 2):
+            updater._remove_url_data(f"https://example.com/collections/uncategorized/item-{i}")
+        elapsed = time.monotonic() - start
+
+        print(f"{count} adds + {count // 2} removals in {elapsed:.2f}s")
+        assert len(updater.manifest["uncategorized"]) == count // 2
+        assert list(updater.manifest["uncategorized"])[0] == updater._normalize_url("https://example.com/collections/uncategorized/item-1")
+        assert elapsed < 10, "Bulk manifest updates should not be quadratic"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("SHARD MANIFEST TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_shard_urls_behaves_like_list,
+        test_manifest_derived_from_index,
+        test_shard_change_moves_url,
+        test_bulk_operations_scale_linearly
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
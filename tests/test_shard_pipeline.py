@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Streaming Shard Pipeline
+
+Tests that --pipeline writes the same shards/index/manifest as the
+write-at-the-end path, that progress reaches disk while scraping is still
+running, that a slow writer applies backpressure instead of queueing
+unbounded snapshots, and that the writer thread only works from snapshots.
+
+Usage:
+    python3 tests/test_shard_pipeline.py
+"""
+
+import sys
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from shard_pipeline import ShardPipeline
+from shard_writer import ShardChanges
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+
+def make_updater(output_dir, pipeline, concurrency=1):
+    updater = AgnosticLLMsUpdater(
+        firecrawl_api_key="test_key",
+        domain="example.com",
+        output_dir=output_dir,
+        batch_size=50,
+        concurrency=concurrency,
+        pipeline=pipeline
+    )
+    updater.pipeline_config.update({"flush_every": 2, "checkpoint_every": 3, "max_pending": 2})
+    return updater
+
+
+def fake_scrape(url, pre_scraped_content=None, is_diff=False):
+    name = url.rsplit('/', 1)[-1]
+    return {
+        "url": url,
+        "content": json.dumps({"product_name": name}),
+        "title": name,
+        "scraped_at": "2025-10-08T00:00:00"
+    }
+
+
+def queue_urls(updater, count):
+    for i in range(count):
+        category = "widgets" if i % 2 else "gadgets"
+        updater._enqueue_for_batch(
+            f"https://example.com/products/{category}-{i}", category,
+            f"https://example.com/collections/{category}"
+        )
+
+
+def read_outputs(updater):
+    directory = Path(updater.site_output_dir)
+    shards = {p.name: p.read_text(encoding='utf-8') for p in directory.glob("llms-*.txt")}
+    index = json.loads(Path(updater.index_file).read_text(encoding='utf-8'))
+    return shards, index, updater.manifest.to_dict()
+
+
+def test_pipeline_matches_batch_output():
+    """Test that pipelined and end-of-run writing produce identical files."""
+    print("Test 1: Pipelined output matches end-of-run output")
+    print("-" * 80)
+
+    outputs = []
+    for pipeline in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            updater = make_updater(tmp, pipeline, concurrency=3)
+            updater._scrape_url = fake_scrape
+            queue_urls(updater, 11)
+            result = updater.process_queue_batch()
+            assert result["processed_urls"] == 11
+            shards, index, manifest = read_outputs(updater)
+            written = sorted(Path(p).name for p in result["written_files"])
+            assert written == sorted(shards), f"written_files out of sync: {written}"
+            outputs.append((shards, index, manifest))
+
+    assert outputs[0] == outputs[1], "Pipelined output differs from end-of-run output"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_progress_visible_during_run():
+    """Test that shards and index checkpoints hit disk before the run finishes."""
+    print("Test 2: Partial progress is written while scraping continues")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp, pipeline=True)
+        seen = {}
+
+        def scrape(url, pre_scraped_content=None, is_diff=False):
+            if url.endswith("-9"):
+                # Give the writer a moment, then look at what is already on disk
+                deadline = time.monotonic() + 2
+                while time.monotonic() < deadline:
+                    if Path(updater.index_file).exists() and list(Path(tmp).rglob("llms-*-gadgets.txt")):
+                        break
+                    time.sleep(0.01)
+                seen["index"] = Path(updater.index_file).exists()
+                seen["shards"] = len(list(Path(tmp).rglob("llms-*-gadgets.txt")))
+                if seen["index"]:
+                    seen["indexed"] = len(json.loads(Path(updater.index_file).read_text(encoding='utf-8')))
+            return fake_scrape(url)
+
+        updater._scrape_url = scrape
+        queue_urls(updater, 12)
+        result = updater.process_queue_batch()
+
+        print(f"On disk mid-run: {seen}")
+        assert seen["index"], "Index checkpoint should exist mid-run"
+        assert seen["indexed"] >= 3
+        assert seen["shards"] == 1, "A shard should have been flushed mid-run"
+        assert result["processed_urls"] == 12
+        assert len(read_outputs(updater)[1]) == 12
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_backpressure_bounds_pending_jobs():
+    """Test that a slow writer blocks the producer at max_pending queued jobs."""
+    print("Test 3: Slow writer applies backpressure")
+    print("-" * 80)
+
+    lock = threading.Lock()
+    state = {"written": []}
+
+    def write_shard(shard_key, urls, entries):
+        time.sleep(0.03)
+        with lock:
+            state["written"].append(shard_key)
+        return ShardChanges()
+
+    pipeline = ShardPipeline(
+        snapshot_shard=lambda key: ([key], {}),
+        write_shard=write_shard,
+        snapshot_index=lambda: {},
+        save_index=lambda index: None,
+        flush_every=1,
+        checkpoint_every=1000,
+        max_pending=1,
+    )
+
+    peak = 0
+    start = time.monotonic()
+    for i in range(10):
+        pipeline.record(f"shard-{i}")
+        peak = max(peak, pipeline._jobs.qsize())
+    produce_elapsed = time.monotonic() - start
+    pipeline.finish()
+
+    print(f"Producer time: {produce_elapsed:.2f}s, peak queued jobs: {peak}")
+    assert peak <= 1, f"Queue grew beyond max_pending: {peak}"
+    assert produce_elapsed >= 0.2, "Producer should have been throttled by the writer"
+    assert state["written"] == [f"shard-{i}" for i in range(10)]
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_writer_errors_surface():
+    """Test that a failure on the writer thread is raised to the caller."""
+    print("Test 4: Background write errors are raised")
+    print("-" * 80)
+
+    def write_shard(shard_key, urls, entries):
+        raise OSError("disk full")
+
+    pipeline = ShardPipeline(
+        snapshot_shard=lambda key: ([key], {}),
+        write_shard=write_shard,
+        snapshot_index=lambda: {},
+        save_index=lambda index: None,
+        flush_every=1,
+    )
+    pipeline.record("gadgets")
+    try:
+        pipeline.finish()
+    except RuntimeError as e:
+        assert isinstance(e.__cause__, OSError)
+    else:
+        raise AssertionError("finish() should raise the writer's error")
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_writer_uses_snapshots():
+    """Test that the writer thread gets a fixed exclude set and never reads the live index."""
+    print("Test 5: The background writer only sees snapshots")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = make_updater(tmp, pipeline=True)
+        updater._scrape_url = fake_scrape
+        lookups = []
+        writes = []
+        excluded_shards = updater._excluded_shards
+        write_shard_file = updater._write_shard_file
+
+        def recording_excluded_shards(shard_key):
+            lookups.append(threading.current_thread().name)
+            return excluded_shards(shard_key)
+
+        def recording_write(shard_key, urls, url_index=None, exclude=None):
+            writes.append((threading.current_thread().name, exclude))
+            return write_shard_file(shard_key, urls, url_index, exclude)
+
+        updater._excluded_shards = recording_excluded_shards
+        updater._write_shard_file = recording_write
+        queue_urls(updater, 8)
+        updater.process_queue_batch()
+
+        assert writes and all(thread == "shard-writer" for thread, _ in writes)
+        assert all(isinstance(exclude, frozenset) for _, exclude in writes)
+        assert lookups and "shard-writer" not in lookups, "Exclude sets are taken when a flush is submitted"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("SHARD PIPELINE TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_pipeline_matches_batch_output,
+        test_progress_visible_during_run,
+        test_backpressure_bounds_pending_jobs,
+        test_writer_errors_surface,
+        test_writer_uses_snapshots
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
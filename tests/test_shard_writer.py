@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Incremental Shard Writer
+
+Tests that a shard write rewrites only the chunk files whose products
+changed, that an insert which splits a chunk renumbers the files without
+losing or duplicating products, that products found only in legacy shard
+files are adopted into the index without touching shards that share a
+name prefix (but products removed in the same run are not), and that a shard emptied by removals loses its files.
+Content-defined chunking is tested for bounded chunk sizes and for edits
+that leave the other chunk files untouched. Byte-identical rewrites are
+tested to leave files alone and to report precise written/added/deleted
+lists, and the .idx sidecars to locate every block by byte offset.
+
+Usage:
+    python3 tests/test_shard_writer.py
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from shard_writer import (
+    LAYOUT_DIR, ShardChanges, ShardWriter, load_sidecar, parse_blocks, read_block, render_block, sidecar_path
+)
+
+CONTENT_DEFINED = {"mode": "content_defined", "min_ratio": 0.25, "target_ratio": 0.5}
+from update_llms_agnostic import AgnosticLLMsUpdater
+
+
+def record(name, size=100):
+    return {"title": name, "markdown": "x" * size, "shard_key": "widgets"}
+
+
+def make_index(count, size=100):
+    return {f"https://example.com/products/w{i:03d}": record(f"W{i}", size) for i in range(count)}
+
+
+def file_state(directory):
+    """name -> (mtime_ns, inode) for every shard file."""
+    return {p.name: (p.stat().st_mtime_ns, p.stat().st_ino) for p in Path(directory).glob("llms-*.txt")}
+
+
+def all_products(directory):
+    products = []
+    for path in sorted(Path(directory).glob("llms-*.txt")):
+        products.extend(parse_blocks(path.read_text(encoding='utf-8')))
+    return products
+
+
+def test_only_changed_chunk_rewritten():
+    """Test that updating one product rewrites only the chunk holding it."""
+    print("Test 1: Only the changed chunk file is rewritten")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ShardWriter(tmp, "example-com", max_characters=1000)
+        index = make_index(30)
+        urls = list(index)
+        changes = writer.write("widgets", urls, index)
+        assert len(changes.added) > 3, f"Expected several chunks, got {changes.added}"
+        before = file_state(tmp)
+
+        # Same content: nothing is written
+        assert not writer.write("widgets", urls, index)
+        assert file_state(tmp) == before
+
+        index[urls[-1]] = dict(index[urls[-1]], title="Renamed")
+        changes = writer.write("widgets", urls, index)
+        written = changes.written
+        assert not changes.added and not changes.deleted
+        after = file_state(tmp)
+        assert len(written) == 1, f"Expected one rewritten chunk, got {written}"
+        changed = [name for name in after if after[name] != before.get(name)]
+        assert changed == [os.path.basename(written[0])], f"Unexpected rewrites: {changed}"
+        assert "## Renamed" in Path(written[0]).read_text(encoding='utf-8')
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_insert_split_renumbers_files():
+    """Test that a chunk split renames later chunks and keeps every product once."""
+    print("Test 2: A split chunk renumbers the files after it")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ShardWriter(tmp, "example-com", max_characters=1000)
+        index = make_index(30)
+        writer.write("widgets", list(index), index)
+        before = file_state(tmp)
+        last_name = f"llms-example-com-widgets_{len(before)}.txt"
+        last_text = (Path(tmp) / last_name).read_text(encoding='utf-8')
+
+        # Grow a product in the first chunk so it no longer fits
+        first = "https://example.com/products/w000"
+        index[first] = record("Big", 600)
+        written = writer.write("widgets", list(index), index).paths
+
+        after = file_state(tmp)
+        assert len(after) == len(before) + 1
+        moved_name = f"llms-example-com-widgets_{len(after)}.txt"
+        assert (Path(tmp) / moved_name).read_text(encoding='utf-8') == last_text
+        assert after[moved_name][1] == before[last_name][1], "Unchanged chunk should be renamed, not rewritten"
+        assert str(Path(tmp) / moved_name) in written
+
+        products = all_products(tmp)
+        assert sorted(products) == sorted(index), "Every product must appear exactly once"
+        assert len(products) == len(set(products))
+        assert not list(Path(tmp).glob("*.moving")) and not list(Path(tmp).glob("*.tmp"))
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_legacy_products_adopted():
+    """Test that file-only products are adopted and prefix-sibling shards left alone."""
+    print("Test 3: Legacy shard files are adopted into the index")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp)
+        directory = Path(updater.site_output_dir)
+        legacy_url = "https://example.com/products/legacy-drill"
+        sibling_url = "https://example.com/products/metal-drill"
+        (directory / "llms-example-com-drill_bits.txt").write_text(
+            render_block(legacy_url, {"title": "Legacy Drill", "markdown": "{\"sku\": 1}"}), encoding='utf-8'
+        )
+        sibling = directory / "llms-example-com-drill_bits___metal.txt"
+        sibling.write_text(render_block(sibling_url, {"title": "Metal Drill", "markdown": "{}"}), encoding='utf-8')
+        sibling_state = file_state(directory)[sibling.name]
+        # "drill_bits_2" is a shard of its own; "drill_bits_3" is a numbered part of drill_bits
+        numbered_url = "https://example.com/products/numbered-drill"
+        updater.url_index[numbered_url] = {"title": "Numbered", "markdown": "{}", "shard_key": "drill_bits_2"}
+        numbered = directory / "llms-example-com-drill_bits_2.txt"
+        numbered.write_text(render_block(numbered_url, {"title": "Numbered", "markdown": "{}"}), encoding='utf-8')
+        part_url = "https://example.com/products/part-drill"
+        (directory / "llms-example-com-drill_bits_3.txt").write_text(
+            render_block(part_url, {"title": "Part Drill", "markdown": "{}"}), encoding='utf-8'
+        )
+
+        scraped = {"title": "New Drill", "content": "{\"sku\": 2}", "scraped_at": "2025-10-08T00:00:00"}
+        updater._update_url_data_with_category("https://example.com/products/new-drill", scraped, "drill_bits")
+        updater._write_shard_file("drill_bits", updater.manifest["drill_bits"])
+
+        assert legacy_url in updater.url_index
+        assert updater.url_index[legacy_url]["title"] == "Legacy Drill"
+        assert sorted(updater.manifest["drill_bits"]) == [
+            "https://example.com/products/legacy-drill", "https://example.com/products/new-drill", part_url
+        ]
+        assert updater.manifest["drill_bits_2"] == [numbered_url]
+        assert numbered.exists() and not (directory / "llms-example-com-drill_bits_3.txt").exists()
+        shard_products = parse_blocks((directory / "llms-example-com-drill_bits.txt").read_text(encoding='utf-8'))
+        assert shard_products[legacy_url] == ("Legacy Drill", "{\"sku\": 1}\n\n")
+        assert sibling_url not in shard_products
+        assert sibling_url not in updater.url_index
+        assert file_state(directory)[sibling.name] == sibling_state, "Sibling shard must be untouched"
+
+        # Removing a product from a shard written before the layout existed must not re-adopt it
+        kept_url = "https://example.com/products/kept-saw"
+        removed_url = "https://example.com/products/removed-saw"
+        (directory / "llms-example-com-saws.txt").write_text(
+            render_block(kept_url, {"title": "Kept", "markdown": "{}"})
+            + render_block(removed_url, {"title": "Removed", "markdown": "{}"}),
+            encoding='utf-8'
+        )
+        for url in (kept_url, removed_url):
+            updater.url_index[url] = {"title": "Saw", "markdown": "{}", "shard_key": "saws"}
+        result = updater.incremental_update([removed_url], "removed")
+        assert [Path(p).name for p in result["written_files"]] == ["llms-example-com-saws.txt"]
+        assert removed_url not in updater.url_index and kept_url in updater.url_index
+        saw_products = parse_blocks((directory / "llms-example-com-saws.txt").read_text(encoding='utf-8'))
+        assert list(saw_products) == [kept_url]
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_removals_and_emptied_shard():
+    """Test that a removal rewrites its chunk and an emptied shard loses its files."""
+    print("Test 4: Removals rewrite one chunk; an emptied shard is deleted")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        updater = AgnosticLLMsUpdater(
+            firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, max_characters=1000
+        )
+        directory = Path(updater.site_output_dir)
+        scraped = {"title": "Item", "content": "y" * 100, "scraped_at": "2025-10-08T00:00:00"}
+        urls = [f"https://example.com/products/item-{i:02d}" for i in range(20)]
+        for url in urls:
+            updater._update_url_data_with_category(url, scraped, "widgets")
+        updater._write_shard_file("widgets", updater.manifest["widgets"])
+        before = file_state(directory)
+
+        updater._remove_url_data(urls[0])
+        written = updater._write_shard_file("widgets", updater.manifest.get("widgets", [])).paths
+        after = file_state(directory)
+        changed = [name for name in after if after[name] != before.get(name)]
+        assert changed == [os.path.basename(p) for p in written] and len(written) == 1, f"Rewrote {changed}"
+        assert urls[0] not in all_products(directory)
+
+        for url in urls[1:]:
+            updater._remove_url_data(url)
+        changes = updater._write_shard_file("widgets", updater.manifest.get("widgets", []))
+        assert changes.paths == [] and len(changes.deleted) == len(before)
+        assert not list(directory.glob("llms-example-com-widgets*.txt")), "Emptied shard should have no files"
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_content_defined_chunk_sizes():
+    """Test that content-defined chunks stay within min/max and match a fresh write."""
+    print("Test 5: Content-defined chunks respect min/max sizes")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory() as fresh:
+        writer = ShardWriter(tmp, "example-com", max_characters=4000, chunking=CONTENT_DEFINED)
+        index = make_index(400)
+        writer.write("widgets", list(index), index)
+        sizes = [p.stat().st_size for p in Path(tmp).glob("llms-*.txt")]
+        assert len(sizes) > 10, f"Expected many chunks, got {len(sizes)}"
+        assert max(sizes) <= 4000
+        assert sorted(sizes)[1] >= 1000, "Only the last chunk may fall below min_characters"
+        assert sorted(all_products(tmp)) == sorted(index)
+
+        # Boundaries depend only on content: an incremental write lands on the same chunks as a fresh one
+        del index["https://example.com/products/w123"]
+        index["https://example.com/products/w123a"] = record("W123a")
+        writer.write("widgets", list(index), index)
+        ShardWriter(fresh, "example-com", max_characters=4000, chunking=CONTENT_DEFINED).write(
+            "widgets", list(index), index
+        )
+        chunks = sorted(p.read_text(encoding='utf-8') for p in Path(tmp).glob("llms-*.txt"))
+        assert chunks == sorted(p.read_text(encoding='utf-8') for p in Path(fresh).glob("llms-*.txt"))
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_content_defined_insert_is_local():
+    """Test that an insert near the start touches one or two files and renames none."""
+    print("Test 6: Content-defined insert leaves other chunk files alone")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ShardWriter(tmp, "example-com", max_characters=4000, chunking=CONTENT_DEFINED)
+        index = make_index(400)
+        writer.write("widgets", list(index), index)
+        before = file_state(tmp)
+
+        for i in range(5):
+            index[f"https://example.com/products/w001-new-{i}"] = record(f"New {i}", 300)
+        written = writer.write("widgets", list(index), index).paths
+        after = file_state(tmp)
+
+        changed = sorted(name for name in after if after[name] != before.get(name))
+        assert 1 <= len(changed) <= 2, f"Insert touched {changed}"
+        assert sorted(os.path.basename(p) for p in written) == changed
+        assert all(name in after for name in before), "No existing chunk file may be renamed or removed"
+        assert sorted(all_products(tmp)) == sorted(index)
+
+        # Greedy packing for comparison: the same insert rewrites or renames many files
+        with tempfile.TemporaryDirectory() as greedy_dir:
+            greedy = ShardWriter(greedy_dir, "example-com", max_characters=4000)
+            index = make_index(400)
+            greedy.write("widgets", list(index), index)
+            before = file_state(greedy_dir)
+            for i in range(5):
+                index[f"https://example.com/products/w001-new-{i}"] = record(f"New {i}", 300)
+            greedy_written = greedy.write("widgets", list(index), index).paths
+            print(f"Content-defined: {len(written)} files written, greedy: {len(greedy_written)} of {len(before)}")
+            assert len(greedy_written) > len(written)
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_identical_content_not_rewritten():
+    """Test that byte-identical chunks are left alone, even without a layout."""
+    print("Test 7: Byte-identical shard files are not rewritten")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ShardWriter(tmp, "example-com", max_characters=1000)
+        index = make_index(30)
+        writer.write("widgets", list(index), index)
+        before = file_state(tmp)
+
+        # Lost layout (e.g. first run after an upgrade): files are compared byte for byte
+        shutil.rmtree(Path(tmp) / LAYOUT_DIR)
+        assert not writer.write("widgets", list(index), index)
+        assert file_state(tmp) == before
+        assert writer.has_layout("widgets")
+
+        # A re-scrape returning the same product JSON only updates the index
+        updater = AgnosticLLMsUpdater(firecrawl_api_key="test_key", domain="example.com", output_dir=tmp)
+        updater._scrape_url = lambda url, pre_scraped_content=None, is_diff=False: {
+            "url": url, "content": json.dumps({"product_name": "widget"}), "title": "Widget",
+            "scraped_at": "2025-10-08T00:00:00"
+        }
+        url = "https://example.com/collections/widgets/widget"
+        result = updater.incremental_update([url], "added")
+        assert [Path(p).name for p in result["added_files"]] == ["llms-example-com-widgets.txt"]
+        shard_state = file_state(updater.site_output_dir)
+        result = updater.incremental_update([url], "changed")
+        assert result["written_files"] == [] and result["added_files"] == [] and result["deleted_files"] == []
+        assert file_state(updater.site_output_dir) == shard_state
+
+        result = updater.incremental_update([url], "removed")
+        assert [Path(p).name for p in result["deleted_files"]] == ["llms-example-com-widgets.txt"]
+
+        # Records from before "shard_key" are removed from their shard too
+        updater.url_index[updater._normalize_url(url)] = {
+            "title": "Widget", "markdown": json.dumps({"product_name": "widget"}), "shard": "widgets",
+            "updated_at": "2025-10-08T00:00:00"
+        }
+        result = updater.incremental_update([url], "removed")
+        assert result["touched_shards"] == ["widgets"]
+        assert updater._normalize_url(url) not in updater.url_index
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_changes_merge():
+    """Test that merged changes net out adds, rewrites and deletes of the same file."""
+    print("Test 8: ShardChanges merges writes and deletes per file")
+    print("-" * 80)
+
+    first = ShardChanges()
+    first.record_write("a.txt", existed=False)
+    first.record_write("b.txt")
+    first.record_delete("c.txt")
+    second = ShardChanges()
+    second.record_delete("a.txt")
+    second.record_delete("b.txt")
+    second.record_write("c.txt", existed=False)
+    second.record_write("d.txt", existed=False)
+    merged = ShardChanges().merge(first).merge(second)
+
+    assert merged.added == ["d.txt"]
+    assert merged.written == ["c.txt"], "A deleted file written again is a rewrite"
+    assert merged.deleted == ["b.txt"], "A file added then deleted in one run is not reported"
+    assert ShardChanges.from_dict(merged.to_dict()).to_dict() == merged.to_dict()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_sidecar_locates_blocks():
+    """Test that every chunk's .idx maps each URL to its exact block, across splits and removals."""
+    print("Test 9: Sidecar indexes locate product blocks by byte offset")
+    print("-" * 80)
+
+    def check_sidecars(directory, index):
+        for path in Path(directory).glob("llms-*.txt"):
+            sidecar = load_sidecar(str(path))
+            assert sidecar is not None, f"Missing sidecar for {path.name}"
+            assert sorted(sidecar) == sorted(parse_blocks(path.read_text(encoding='utf-8')))
+            for url in sidecar:
+                assert read_block(str(path), url, sidecar) == render_block(url, index[url])
+        idx_names = {Path(p).stem for p in Path(directory).glob("llms-*.idx")}
+        assert idx_names == {p.stem for p in Path(directory).glob("llms-*.txt")}, "Orphaned sidecar left behind"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ShardWriter(tmp, "example-com", max_characters=1000)
+        index = make_index(30)
+        # Non-ASCII titles make byte offsets differ from character offsets
+        index["https://example.com/products/w005"] = record("Bohrer Ø5 – Größe", 100)
+        writer.write("widgets", list(index), index)
+        check_sidecars(tmp, index)
+
+        index["https://example.com/products/w000"] = record("Big", 600)
+        for i in range(20, 30):
+            del index[f"https://example.com/products/w{i:03d}"]
+        writer.write("widgets", list(index), index)
+        check_sidecars(tmp, index)
+
+        url = "https://example.com/products/w005"
+        assert writer.read_product("widgets", url) == render_block(url, index[url])
+        assert writer.read_product("widgets", "https://example.com/products/w025") is None
+
+        # A sidecar no longer matching its file (hand edit) is ignored
+        path, _, _ = writer.locate("widgets", url)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("\n")
+        assert load_sidecar(path) is None
+        assert os.path.exists(sidecar_path(path))
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("SHARD WRITER TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_only_changed_chunk_rewritten,
+        test_insert_split_renumbers_files,
+        test_legacy_products_adopted,
+        test_removals_and_emptied_shard,
+        test_content_defined_chunk_sizes,
+        test_content_defined_insert_is_local,
+        test_identical_content_not_rewritten,
+        test_changes_merge,
+        test_sidecar_locates_blocks
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the SQLite Work Queue
+
+Tests lease semantics (disjoint claims, ack, fail, expiry, stale acks),
+that several processes draining one queue scrape every entry exactly once,
+the updater's --queue-backend sqlite path including the one-time
+import of the JSON queue, priority-class claims, and that a batch that
+outlives lease_seconds keeps its leases.
+
+Usage:
+    python3 tests/test_work_queue.py
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from update_llms_agnostic import AgnosticLLMsUpdater, PendingQueue
+from work_queue import SqliteWorkQueue
+
+
+def url(i):
+    return f"https://example.com/products/widget-{i}"
+
+
+def fake_scrape(url, pre_scraped_content=None, is_diff=False):
+    name = url.rsplit('/', 1)[-1]
+    return {
+        "url": url,
+        "content": json.dumps({"product_name": name}),
+        "title": name,
+        "scraped_at": "2025-10-08T00:00:00"
+    }
+
+
+def drain_worker(path, results_path):
+    """Worker process: claim, 'scrape' and ack until the queue is empty."""
+    queue = SqliteWorkQueue(path, lease_seconds=60)
+    claimed = []
+    while True:
+        batch = queue.dequeue_batch(7)
+        if not batch:
+            break
+        claimed.extend(entry["normalized_url"] for entry in batch)
+        time.sleep(0.001)
+        queue.ack(batch)
+    Path(results_path).write_text(json.dumps(claimed), encoding='utf-8')
+
+
+def test_lease_semantics():
+    """Test claims are disjoint and that ack, fail and lease expiry behave."""
+    print("Test 1: Leases, ack, fail and expiry")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "work-queue.db")
+        worker_a = SqliteWorkQueue(path, lease_seconds=60)
+        worker_b = SqliteWorkQueue(path, lease_seconds=60)
+        for i in range(6):
+            assert worker_a.enqueue(url(i), url(i), {"category": "widgets"})
+        assert not worker_b.enqueue(url(0), url(0))
+        assert len(worker_b) == 6 and url(5) in worker_b
+
+        batch_a = worker_a.dequeue_batch(2)
+        batch_b = worker_b.dequeue_batch(2)
+        assert [e["url"] for e in batch_a] == [url(0), url(1)]
+        assert [e["url"] for e in batch_b] == [url(2), url(3)]
+        assert [e["url"] for e in worker_a.peek_batch(10)] == [url(4), url(5)]
+
+        # Only the lease holder can ack
+        assert worker_b.ack(batch_a) == 0
+        assert worker_a.ack(batch_a) == 2
+        # A failed entry goes back to the tail with its updated data
+        batch_b[0]["metadata"]["attempts"] = 1
+        assert worker_b.fail(batch_b[:1]) == 1
+        assert [e["url"] for e in worker_b.as_list()] == [url(3), url(4), url(5), url(2)]
+        assert worker_a.as_list()[-1]["metadata"]["attempts"] == 1
+
+        # A worker that dies leaves leases that expire back into the queue, in place
+        dying = SqliteWorkQueue(path, lease_seconds=0.05)
+        assert [e["url"] for e in dying.dequeue_batch(2)] == [url(4), url(5)]
+        assert worker_a.dequeue_batch(2)[0]["url"] == url(2)
+        time.sleep(0.1)
+        rescued = worker_b.dequeue_batch(5)
+        assert [e["url"] for e in rescued] == [url(4), url(5)]
+        # The expired holder's late ack does not remove the new holder's entries
+        assert dying.ack(rescued) == 0
+        assert worker_b.ack(rescued) == 2
+        assert len(worker_a) == 2  # url 3 (worker B) and url 2 (worker A) are still leased
+
+        for queue in (worker_a, worker_b, dying):
+            queue.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_parallel_workers_drain_once():
+    """Test that four processes draining one queue take every entry exactly once."""
+    print("Test 2: Parallel worker processes never double-claim")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "work-queue.db")
+        queue = SqliteWorkQueue(path)
+        queue.import_entries(
+            {"url": url(i), "normalized_url": url(i), "metadata": {}} for i in range(300)
+        )
+
+        context = multiprocessing.get_context("spawn")
+        workers = []
+        for n in range(4):
+            process = context.Process(target=drain_worker, args=(path, str(Path(tmp) / f"worker-{n}.json")))
+            process.start()
+            workers.append(process)
+        for process in workers:
+            process.join(60)
+            assert process.exitcode == 0
+
+        claimed = []
+        for n in range(4):
+            claimed.extend(json.loads((Path(tmp) / f"worker-{n}.json").read_text(encoding='utf-8')))
+        print(f"Claims per worker: {[len(json.loads((Path(tmp) / f'worker-{n}.json').read_text())) for n in range(4)]}")
+        assert len(claimed) == 300, f"{len(claimed) - len(set(claimed))} entries were claimed twice"
+        assert set(claimed) == {url(i) for i in range(300)}
+        assert len(queue) == 0
+        queue.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_updater_sqlite_queue():
+    """Test that the updater imports the JSON queue once and workers share the sqlite queue."""
+    print("Test 3: Updater drains the shared sqlite queue")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Backlog left in the JSON queue by an earlier run
+        site_dir = Path(tmp) / "example-com"
+        json_queue = PendingQueue(str(site_dir / "pending-queue.json"))
+        for i in range(5):
+            json_queue.enqueue(url(i), url(i), {"category_shard_key": "widgets"})
+        json_queue.save()
+
+        def make_worker():
+            updater = AgnosticLLMsUpdater(
+                firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=2,
+                index_backend="sqlite", queue_backend="sqlite"
+            )
+            updater._scrape_url = fake_scrape
+            return updater
+
+        worker_a = make_worker()
+        worker_b = make_worker()
+        assert isinstance(worker_a.pending_queue, SqliteWorkQueue)
+        assert len(worker_b.pending_queue) == 5, "The JSON queue should be imported exactly once"
+
+        # Worker A holds a batch while worker B works through the rest
+        held = worker_a.pending_queue.dequeue_batch(2)
+        while len(worker_b.pending_queue.peek_batch(1)):
+            worker_b.process_queue_batch()
+        assert len(worker_b.pending_queue) == 2
+        worker_a.pending_queue.fail(held)
+        worker_a.process_queue_batch()
+
+        assert len(worker_a.pending_queue) == 0
+        assert sorted(worker_a.url_index) == sorted(worker_a._normalize_url(url(i)) for i in range(5))
+
+        # Failed scrapes land in the shared retry queue
+        worker_b._scrape_url = lambda *args, **kwargs: None
+        worker_b.pending_queue.enqueue(url(9), url(9))
+        worker_b.process_queue_batch()
+        assert [e["url"] for e in worker_a.retry_queue.as_list()] == [url(9)]
+        assert len(worker_a.pending_queue) == 0
+
+        for worker in (worker_a, worker_b):
+            worker.url_index.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def test_priority_claims_and_migration():
+    """Test that claims follow priority classes and older queue files gain the class columns."""
+    print("Test 4: Priority classes in the sqlite queue")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "work-queue.db")
+        # A queue file from before priority classes
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE queue_entries (seq INTEGER PRIMARY KEY AUTOINCREMENT, queue TEXT NOT NULL, "
+            "normalized_url TEXT NOT NULL, entry TEXT NOT NULL, lease_owner TEXT, lease_expires REAL, "
+            "UNIQUE (queue, normalized_url))"
+        )
+        for i in range(6):
+            metadata = {"source_category": "site_map_discovery"} if i < 4 else {}
+            conn.execute(
+                "INSERT INTO queue_entries (queue, normalized_url, entry) VALUES ('pending', ?, ?)",
+                (url(i), json.dumps({"url": url(i), "normalized_url": url(i), "metadata": metadata})),
+            )
+        conn.commit()
+        conn.close()
+
+        queue = SqliteWorkQueue(path, weights={"discovery": 1, "backfill": 1, "refresh": 1})
+        assert queue.counts() == {"realtime": 0, "discovery": 2, "backfill": 4, "refresh": 0}
+        queue.enqueue(url(10), url(10), {"priority": "refresh", "last_updated": "2025-05-01"})
+        queue.enqueue(url(11), url(11), {"priority": "refresh", "last_updated": "2024-05-01"})
+        # A webhook for a URL waiting in the backlog moves it to realtime
+        assert queue.enqueue(url(3), url(3), {"priority": "realtime"})
+        assert not queue.enqueue(url(3), url(3), {"priority": "backfill"})
+        assert queue.counts()["realtime"] == 1 and queue.counts()["backfill"] == 3
+
+        batch = [entry["url"] for entry in queue.dequeue_batch(4)]
+        assert batch == [url(3), url(4), url(0), url(11)]
+        assert queue.prune({url(10), url(5)}) == 1, "Refresh entries are kept when pruning"
+        assert [entry["url"] for entry in queue.peek_batch(5)] == [url(1), url(2), url(10)]
+        queue.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+class FakeStatusResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def test_leases_renewed_during_long_batch():
+    """Test that slow scrapes and batch-job polls renew the batch's leases before they expire."""
+    print("Test 5: Leases are renewed while a long batch runs")
+    print("-" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in ("scrape", "batch"):
+            updater = AgnosticLLMsUpdater(
+                firecrawl_api_key="test_key", domain="example.com", output_dir=tmp, batch_size=10,
+                index_backend="sqlite", queue_backend="sqlite", scrape_engine=engine
+            )
+            updater.concurrency = 1
+            updater.queue_config["lease_seconds"] = 0.3
+            updater.pending_queue.lease_seconds = 0.3
+            other_worker = SqliteWorkQueue(updater.work_queue_db, lease_seconds=60)
+            urls = [url(i) for i in range(4)] if engine == "scrape" else [url(i) for i in range(4, 8)]
+            for u in urls:
+                updater.pending_queue.enqueue(u, updater._normalize_url(u), {"category_shard_key": "widgets"})
+            stolen = []
+
+            # Each step takes half a lease; the other worker tries to claim once the lease would have expired
+            def slow_scrape(page_url, pre_scraped_content=None, is_diff=False):
+                time.sleep(0.15)
+                if page_url == urls[-1]:
+                    stolen.extend(other_worker.dequeue_batch(10))
+                return fake_scrape(page_url)
+
+            polls = []
+
+            def slow_poll(path):
+                time.sleep(0.15)
+                polls.append(path)
+                if len(polls) < 4:
+                    return FakeStatusResponse({"status": "scraping"})
+                stolen.extend(other_worker.dequeue_batch(10))
+                documents = [
+                    {"json": {"product_name": u.rsplit('/', 1)[-1]},
+                     "metadata": {"sourceURL": updater._ensure_eur_currency(u), "statusCode": 200}}
+                    for u in urls
+                ]
+                return FakeStatusResponse({"status": "completed", "data": documents})
+
+            updater._scrape_url = slow_scrape
+            updater._firecrawl_get = slow_poll
+            updater._submit_batch_scrape = lambda entries: {"id": "job-1", "entries": entries}
+            updater.batch_poll_interval = 0.01
+
+            result = updater.process_queue_batch()
+
+            assert stolen == [], f"Another worker claimed leased entries ({engine})"
+            assert result["processed_urls"] == 4
+            assert len(updater.pending_queue) == 0, f"Every ack should land ({engine})"
+            other_worker.close()
+            updater.url_index.close()
+
+    print("✓ PASSED")
+    print()
+    return True
+
+
+def run_all_tests():
+    """Run all tests."""
+    print("=" * 80)
+    print("WORK QUEUE TESTS")
+    print("=" * 80)
+    print()
+
+    tests = [
+        test_lease_semantics,
+        test_parallel_workers_drain_once,
+        test_updater_sqlite_queue,
+        test_priority_claims_and_migration,
+        test_leases_renewed_during_long_batch
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"✗ FAILED: {e}")
+            print()
+            failed += 1
+        except Exception as e:
+            print(f"✗ ERROR: {e}")
+            print()
+            failed += 1
+
+    print("=" * 80)
+    print(f"RESULTS: {passed} passed, {failed} failed out of {len(tests)} tests")
+    print("=" * 80)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)